@@ -10,7 +10,12 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # 客户端用不到、但会被 pandas 等的可选依赖带入的包; 单文件版每次启动都要
+    # 解压全部内容, 包越小启动越快 (图表只保存为文件, 不需要 tkinter)
+    excludes=[
+        'sqlalchemy', 'psycopg2', 'psycopg', 'psycopg_binary',
+        'IPython', 'jedi', 'tkinter',
+    ],
     noarchive=False,
     optimize=0,
 )
@@ -1,19 +1,25 @@
 import io
 import matplotlib.pyplot as plt
 import pandas as pd
-from fastapi import Depends, APIRouter, Response
+from fastapi import Depends, APIRouter, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import text, inspect
-from database import get_db
+from sqlalchemy import text, inspect, func
+from database import get_read_db
+import etag
 import models
+import profiling
+import refcache
+import schemas
 import matplotlib
 from matplotlib import font_manager
 from matplotlib.font_manager import FontProperties
 import os
 import seaborn as sns
 from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
 
-router = APIRouter()
+router = APIRouter(route_class=profiling.TimedRoute)
 
 # 自动检测/下载并强制使用SimHei等中文字体
 font_path = None
@@ -39,6 +45,80 @@ matplotlib.rcParams['font.sans-serif'] = [font_prop.get_name()]
 matplotlib.rcParams['axes.unicode_minus'] = False
 
 
+def _resolve_as_of(as_of: Optional[datetime]) -> datetime:
+    """
+    将分析的截止时间统一为不带时区的UTC时间 (与数据库时间列一致)。
+    未指定时取当前时间并截断到分钟, 使同一分钟内的结果保持一致、可缓存。
+    """
+    if as_of is None:
+        return datetime.utcnow().replace(second=0, microsecond=0)
+    return schemas.to_naive_utc(as_of)
+
+
+# 分析结果依赖的表, 任一表有写入即视为结果变化
+ANALYSIS_TABLES = (
+    "users", "rooms", "devices", "device_usages", "security_events",
+)
+
+
+def analysis_etag(request: Request, db: Session = Depends(get_read_db)):
+    """
+    分析接口的 ETag: 路径与查询参数、相关表的版本, 未指定 as_of 时还包括
+    当前分钟 (默认截止时间)。与 If-None-Match 匹配时返回 304, 不再查询与绘图。
+    """
+    as_of = None
+    if "as_of" not in request.query_params:
+        as_of = _resolve_as_of(None)
+    versions = etag.table_versions(db, ANALYSIS_TABLES)
+    etag.check_not_modified(request, etag.weak_etag(
+        request.url.path, str(request.query_params), versions, as_of
+    ))
+
+
+def _usages_in_window(
+    db: Session, start: Optional[datetime], as_of: Optional[datetime]
+):
+    # 条件都作用在分区键 start_time 上, 分区表可据此裁剪分区
+    query = db.query(models.DeviceUsage)
+    if start is not None:
+        query = query.filter(
+            models.DeviceUsage.start_time >= schemas.to_naive_utc(start))
+    # 与 user_habits 相同的半开区间 [start, as_of); 未指定 as_of 时同样截止到
+    # 当前分钟, 与 analysis_etag 中的默认截止时间一致
+    return query.filter(models.DeviceUsage.start_time < _resolve_as_of(as_of))
+
+
+def _events_in_window(
+    db: Session, start: Optional[datetime], as_of: Optional[datetime]
+):
+    query = db.query(models.SecurityEvent)
+    if start is not None:
+        query = query.filter(
+            models.SecurityEvent.timestamp >= schemas.to_naive_utc(start))
+    # 半开区间, 同 _usages_in_window
+    return query.filter(models.SecurityEvent.timestamp < _resolve_as_of(as_of))
+
+
+def _usage_counts_by(
+    db: Session,
+    column,
+    owner,
+    start: Optional[datetime],
+    as_of: Optional[datetime]
+) -> pd.Series:
+    """
+    按 device_usages 上的冗余列 (device_type / user_name) 在SQL中分组计数,
+    无需再关联 devices / users 表。结果按次数降序。
+    owner 为该列来源的外键列 (device_id / user_id); 为空表示设备或用户已删除,
+    这些记录不计入 (与按 id 关联时的结果一致)。
+    """
+    rows = _usages_in_window(db, start, as_of).with_entities(
+        column, func.count()
+    ).filter(column.isnot(None), owner.isnot(None)).group_by(column).all()
+    counts = pd.Series(dict(rows), dtype="int64")
+    return counts.sort_values(ascending=False)
+
+
 class SemanticSearchRequest(BaseModel):
     query: str
 
@@ -46,7 +126,7 @@ class SemanticSearchRequest(BaseModel):
 @router.post("/db_semantic_search")
 def db_semantic_search(
     request: SemanticSearchRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     一个简单的占位符，用于未来的语义搜索。
@@ -60,9 +140,13 @@ def db_semantic_search(
     return {"results": results}
 
 
-@router.get("/device_usage_frequency")
-def device_usage_frequency(db: Session = Depends(get_db)):
-    records = db.query(models.DeviceUsage).all()
+@router.get("/device_usage_frequency", dependencies=[Depends(analysis_etag)])
+def device_usage_frequency(
+    start: Optional[datetime] = None,
+    as_of: Optional[datetime] = None,
+    db: Session = Depends(get_read_db)
+):
+    records = _usages_in_window(db, start, as_of).all()
     if not records:
         return {"error": "No device usage data."}
     df = pd.DataFrame([{
@@ -71,96 +155,117 @@ def device_usage_frequency(db: Session = Depends(get_db)):
         "end_time": r.end_time
     } for r in records])
     freq = df["device_id"].value_counts().sort_index()
-    device_map = {d.id: d.name for d in db.query(models.Device).all()}
+    device_map = {i: d.name for i, d in refcache.devices(db).items()}
     freq.index = [device_map.get(i, f"设备{i}") for i in freq.index]
     n = len(freq)
-    plt.figure(figsize=(max(8, 0.5 * n), 5))
-    bars = plt.bar(
-        freq.index,
-        freq.values,
-        color="#36b9cc",
-        edgecolor="#1890ff",
-        linewidth=1.5
-    )
-    plt.title(
-        "设备使用频率",
-        fontsize=18,
-        color="#17a673",
-        weight="bold",
-        fontproperties=font_prop
-    )
-    plt.xlabel("设备", fontsize=14, fontproperties=font_prop)
-    plt.ylabel("使用次数", fontsize=14, fontproperties=font_prop)
-    plt.grid(axis="y", linestyle="--", alpha=0.5)
-    plt.xticks(rotation=60, fontsize=10, fontproperties=font_prop)
-    for bar, label in zip(bars, freq.index):
-        plt.text(
-            bar.get_x() + bar.get_width() / 2,
-            bar.get_height(),
-            int(bar.get_height()),
-            ha='center',
-            va='bottom',
-            fontsize=10,
-            color="#333",
+    with profiling.mark_phase("render"):
+        plt.figure(figsize=(max(8, 0.5 * n), 5))
+        bars = plt.bar(
+            freq.index,
+            freq.values,
+            color="#36b9cc",
+            edgecolor="#1890ff",
+            linewidth=1.5
+        )
+        plt.title(
+            "设备使用频率",
+            fontsize=18,
+            color="#17a673",
+            weight="bold",
             fontproperties=font_prop
         )
-    plt.tight_layout()
-    plt.gca().spines['top'].set_visible(False)
-    plt.gca().spines['right'].set_visible(False)
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
-    plt.close()
+        plt.xlabel("设备", fontsize=14, fontproperties=font_prop)
+        plt.ylabel("使用次数", fontsize=14, fontproperties=font_prop)
+        plt.grid(axis="y", linestyle="--", alpha=0.5)
+        plt.xticks(rotation=60, fontsize=10, fontproperties=font_prop)
+        for bar, label in zip(bars, freq.index):
+            plt.text(
+                bar.get_x() + bar.get_width() / 2,
+                bar.get_height(),
+                int(bar.get_height()),
+                ha='center',
+                va='bottom',
+                fontsize=10,
+                color="#333",
+                fontproperties=font_prop
+            )
+        plt.tight_layout()
+        plt.gca().spines['top'].set_visible(False)
+        plt.gca().spines['right'].set_visible(False)
+        buf = io.BytesIO()
+        plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
+        plt.close()
     buf.seek(0)
     return Response(content=buf.read(), media_type="image/png")
 
 
-@router.get("/user_habits")
-def user_habits(db: Session = Depends(get_db)):
+@router.get("/user_habits", dependencies=[Depends(analysis_etag)])
+def user_habits(
+    start: Optional[datetime] = None,
+    as_of: Optional[datetime] = None,
+    db: Session = Depends(get_read_db)
+):
     """
     分析设备同时使用的情况。
     通过SQL查询高效计算重叠时间，并根据结果的复杂度返回JSON表格或PNG热力图。
+    未结束的使用记录视为持续到 as_of (默认当前时间截断到分钟), 结果只取决于 as_of。
+    指定 start 时只统计 start 之后开始的使用记录。
     """
+    # 先在CTE中把区间截断到 as_of, 避免在连接条件里逐行 COALESCE(..., NOW())；
+    # start_time < :as_of 可以直接利用 start_time 上的索引
     sql_query = """
+    WITH sessions AS (
+        SELECT
+            id,
+            user_id,
+            device_id,
+            start_time,
+            CASE
+                WHEN end_time IS NULL OR end_time > :as_of THEN :as_of
+                ELSE end_time
+            END AS end_time
+        FROM device_usages
+        WHERE start_time < :as_of {start_filter}
+    )
     SELECT
         LEAST(t1.device_id, t2.device_id) AS device_a_id,
         GREATEST(t1.device_id, t2.device_id) AS device_b_id,
         SUM(
             EXTRACT(EPOCH FROM (
-                LEAST(COALESCE(t1.end_time, NOW() at time zone 'utc'),
-                      COALESCE(t2.end_time, NOW() at time zone 'utc')) -
+                LEAST(t1.end_time, t2.end_time) -
                 GREATEST(t1.start_time, t2.start_time)
             )) / 60
         ) AS total_overlap_minutes
     FROM
-        device_usages t1
+        sessions t1
     JOIN
-        device_usages t2 ON t1.user_id = t2.user_id AND t1.id < t2.id
+        sessions t2 ON t1.user_id = t2.user_id AND t1.id < t2.id
     WHERE
-        t1.start_time < COALESCE(t2.end_time, NOW() at time zone 'utc')
-        AND t2.start_time < COALESCE(t1.end_time, NOW() at time zone 'utc')
+        t1.start_time < t2.end_time
+        AND t2.start_time < t1.end_time
         AND t1.device_id != t2.device_id
     GROUP BY
         device_a_id,
         device_b_id
-    HAVING
-        SUM(EXTRACT(EPOCH FROM (
-            LEAST(COALESCE(t1.end_time, NOW() at time zone 'utc'),
-                  COALESCE(t2.end_time, NOW() at time zone 'utc')) -
-            GREATEST(t1.start_time, t2.start_time)
-        ))) > 0
     ORDER BY
         total_overlap_minutes DESC
     LIMIT 20;
     """
+    params = {"as_of": _resolve_as_of(as_of)}
+    start_filter = ""
+    if start is not None:
+        start_filter = "AND start_time >= :start"
+        params["start"] = schemas.to_naive_utc(start)
+    sql_query = sql_query.format(start_filter=start_filter)
     try:
-        results = db.execute(text(sql_query)).mappings().all()
+        results = db.execute(text(sql_query), params).mappings().all()
     except Exception as e:
         return {"error": f"数据库查询失败: {e}"}
 
     if not results:
         return {"error": "未发现任何设备存在同时使用的情况。"}
 
-    device_map = {d.id: d.name for d in db.query(models.Device).all()}
+    device_map = {i: d.name for i, d in refcache.devices(db).items()}
 
     # 如果结果较少，直接返回JSON表格，信息更清晰
     if len(results) <= 6:
@@ -193,45 +298,50 @@ def user_habits(db: Session = Depends(get_db)):
     matrix.index = [device_map.get(i, f"设备{i}") for i in matrix.index]
     matrix.columns = [device_map.get(i, f"设备{i}") for i in matrix.columns]
 
-    plt.figure(figsize=(10, 8))
-    # 使用 set_theme 并传入字体参数，避免全局设置被覆盖
-    sns.set_theme(style="whitegrid", font=font_prop.get_name())
-    # 使用 .1f 格式化浮点数，显示一位小数
-    sns.heatmap(
-        matrix,
-        annot=True,
-        fmt=".1f",
-        cmap="YlGnBu",
-        linewidths=.5,
-        cbar_kws={"shrink": .8}
-    )
-    plt.title(
-        "设备同时使用总时长热力图 (分钟)",
-        fontsize=18,
-        color="#17a673",
-        weight="bold",
-        fontproperties=font_prop
-    )
-    plt.xlabel("设备", fontsize=14, fontproperties=font_prop)
-    plt.ylabel("设备", fontsize=14, fontproperties=font_prop)
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
-    plt.close()
+    with profiling.mark_phase("render"):
+        plt.figure(figsize=(10, 8))
+        # 使用 set_theme 并传入字体参数，避免全局设置被覆盖
+        sns.set_theme(style="whitegrid", font=font_prop.get_name())
+        # 使用 .1f 格式化浮点数，显示一位小数
+        sns.heatmap(
+            matrix,
+            annot=True,
+            fmt=".1f",
+            cmap="YlGnBu",
+            linewidths=.5,
+            cbar_kws={"shrink": .8}
+        )
+        plt.title(
+            "设备同时使用总时长热力图 (分钟)",
+            fontsize=18,
+            color="#17a673",
+            weight="bold",
+            fontproperties=font_prop
+        )
+        plt.xlabel("设备", fontsize=14, fontproperties=font_prop)
+        plt.ylabel("设备", fontsize=14, fontproperties=font_prop)
+        plt.tight_layout()
+        buf = io.BytesIO()
+        plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
+        plt.close()
     buf.seek(0)
     return Response(content=buf.read(), media_type="image/png")
 
 
-@router.get("/area_impact")
-def area_impact(db: Session = Depends(get_db)):
-    users = db.query(models.User).all()
-    records = db.query(models.DeviceUsage).all()
+@router.get("/area_impact", dependencies=[Depends(analysis_etag)])
+def area_impact(
+    start: Optional[datetime] = None,
+    as_of: Optional[datetime] = None,
+    db: Session = Depends(get_read_db)
+):
+    users = refcache.users(db)
+    records = _usages_in_window(db, start, as_of).all()
     if not users or not records:
         return {"error": "No user or device usage data."}
     user_df = pd.DataFrame([{
         "user_id": u.id,
         "house_area": u.house_area
-    } for u in users])
+    } for u in users.values()])
     usage_df = pd.DataFrame([{
         "user_id": r.user_id,
         "device_id": r.device_id
@@ -242,109 +352,113 @@ def area_impact(db: Session = Depends(get_db)):
     df["area_group"] = pd.cut(
         df["house_area"], bins=bins, labels=labels, right=False)
     area_usage = df.groupby("area_group").size()
-    plt.figure(figsize=(7, 4.5))
-    bars = plt.bar(
-        area_usage.index,
-        area_usage.values,
-        color=[
-            "#36b9cc",
-            "#17a673",
-            "#f6c23e"],
-        edgecolor="#1890ff",
-        linewidth=1.5)
-    plt.title(
-        "房屋面积对设备使用次数的影响",
-        fontsize=18,
-        color="#17a673",
-        weight="bold",
-        fontproperties=font_prop
-    )
-    plt.xlabel("房屋面积分组", fontsize=14, fontproperties=font_prop)
-    plt.ylabel("设备使用次数", fontsize=14, fontproperties=font_prop)
-    plt.grid(axis="y", linestyle="--", alpha=0.5)
-    for bar in bars:
-        plt.text(
-            bar.get_x() + bar.get_width() / 2,
-            bar.get_height(),
-            int(bar.get_height()),
-            ha='center',
-            va='bottom',
-            fontsize=12,
-            color="#333",
+    with profiling.mark_phase("render"):
+        plt.figure(figsize=(7, 4.5))
+        bars = plt.bar(
+            area_usage.index,
+            area_usage.values,
+            color=[
+                "#36b9cc",
+                "#17a673",
+                "#f6c23e"],
+            edgecolor="#1890ff",
+            linewidth=1.5)
+        plt.title(
+            "房屋面积对设备使用次数的影响",
+            fontsize=18,
+            color="#17a673",
+            weight="bold",
             fontproperties=font_prop
         )
-    plt.tight_layout()
-    plt.gca().spines['top'].set_visible(False)
-    plt.gca().spines['right'].set_visible(False)
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
-    plt.close()
+        plt.xlabel("房屋面积分组", fontsize=14, fontproperties=font_prop)
+        plt.ylabel("设备使用次数", fontsize=14, fontproperties=font_prop)
+        plt.grid(axis="y", linestyle="--", alpha=0.5)
+        for bar in bars:
+            plt.text(
+                bar.get_x() + bar.get_width() / 2,
+                bar.get_height(),
+                int(bar.get_height()),
+                ha='center',
+                va='bottom',
+                fontsize=12,
+                color="#333",
+                fontproperties=font_prop
+            )
+        plt.tight_layout()
+        plt.gca().spines['top'].set_visible(False)
+        plt.gca().spines['right'].set_visible(False)
+        buf = io.BytesIO()
+        plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
+        plt.close()
     buf.seek(0)
     return Response(content=buf.read(), media_type="image/png")
 
 # 各设备类型的使用次数统计
 
 
-@router.get("/device_type_usage")
-def device_type_usage(db: Session = Depends(get_db)):
-    records = db.query(models.DeviceUsage).all()
-    devices = db.query(models.Device).all()
-    if not records or not devices:
-        return {"error": "No device usage or device data."}
-    device_map = {d.id: d.type for d in db.query(
-        models.Device).filter(models.Device.type.isnot(None)).all()}
-    if not device_map:
-        return {"error": "No devices with specified types found."}
-
-    df = pd.DataFrame([{"device_id": r.device_id} for r in records])
-    df["type"] = df["device_id"].map(device_map)
-    type_usage = df["type"].value_counts().sort_values(ascending=False)
-    plt.figure(figsize=(8, 5))
-    bars = plt.bar(
-        type_usage.index,
-        type_usage.values,
-        color="#f6c23e",
-        edgecolor="#1890ff",
-        linewidth=1.5
-    )
-    plt.title(
-        "各设备类型的使用次数统计",
-        fontsize=18,
-        color="#e67e22",
-        weight="bold",
-        fontproperties=font_prop
+@router.get("/device_type_usage", dependencies=[Depends(analysis_etag)])
+def device_type_usage(
+    start: Optional[datetime] = None,
+    as_of: Optional[datetime] = None,
+    db: Session = Depends(get_read_db)
+):
+    type_usage = _usage_counts_by(
+        db, models.DeviceUsage.device_type, models.DeviceUsage.device_id,
+        start, as_of
     )
-    plt.xlabel("设备类型", fontsize=14, fontproperties=font_prop)
-    plt.ylabel("使用次数", fontsize=14, fontproperties=font_prop)
-    plt.grid(axis="y", linestyle="--", alpha=0.5)
-    for bar in bars:
-        plt.text(
-            bar.get_x() + bar.get_width() / 2,
-            bar.get_height(),
-            int(bar.get_height()),
-            ha='center',
-            va='bottom',
-            fontsize=12,
-            color="#333",
+    if type_usage.empty:
+        return {"error": "No device usage with specified device types."}
+    with profiling.mark_phase("render"):
+        plt.figure(figsize=(8, 5))
+        bars = plt.bar(
+            type_usage.index,
+            type_usage.values,
+            color="#f6c23e",
+            edgecolor="#1890ff",
+            linewidth=1.5
+        )
+        plt.title(
+            "各设备类型的使用次数统计",
+            fontsize=18,
+            color="#e67e22",
+            weight="bold",
             fontproperties=font_prop
         )
-    plt.tight_layout()
-    plt.gca().spines['top'].set_visible(False)
-    plt.gca().spines['right'].set_visible(False)
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
-    plt.close()
+        plt.xlabel("设备类型", fontsize=14, fontproperties=font_prop)
+        plt.ylabel("使用次数", fontsize=14, fontproperties=font_prop)
+        plt.grid(axis="y", linestyle="--", alpha=0.5)
+        for bar in bars:
+            plt.text(
+                bar.get_x() + bar.get_width() / 2,
+                bar.get_height(),
+                int(bar.get_height()),
+                ha='center',
+                va='bottom',
+                fontsize=12,
+                color="#333",
+                fontproperties=font_prop
+            )
+        plt.tight_layout()
+        plt.gca().spines['top'].set_visible(False)
+        plt.gca().spines['right'].set_visible(False)
+        buf = io.BytesIO()
+        plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
+        plt.close()
     buf.seek(0)
     return Response(content=buf.read(), media_type="image/png")
 
 # 每个房间下设备的总能耗分布
 
 
-@router.get("/room_energy")
-def room_energy(db: Session = Depends(get_db)):
-    usages = db.query(models.DeviceUsage).all()
-    devices = db.query(models.Device).all()
-    rooms = db.query(models.Room).all()
+@router.get("/room_energy", dependencies=[Depends(analysis_etag)])
+def room_energy(
+    start: Optional[datetime] = None,
+    as_of: Optional[datetime] = None,
+    db: Session = Depends(get_read_db)
+):
+    usages = _usages_in_window(db, start, as_of).all()
+    devices = refcache.devices(db)
+    rooms = refcache.rooms(db)
     if not usages or not devices or not rooms:
         return {"error": "No usage, device or room data."}
     usage_list = [
@@ -352,163 +466,179 @@ def room_energy(db: Session = Depends(get_db)):
         for u in usages
     ]
     usage_df = pd.DataFrame(usage_list)
-    device_map = {d.id: d.room_id for d in devices}
-    room_map = {r.id: r.name for r in rooms}
+    device_map = {i: d.room_id for i, d in devices.items()}
+    room_map = {i: r.name for i, r in rooms.items()}
     usage_df["room_id"] = usage_df["device_id"].map(device_map)
     usage_df["room_name"] = usage_df["room_id"].map(room_map)
     room_energy = usage_df.groupby(
         "room_name")["energy"].sum().sort_values(ascending=False)
-    plt.figure(figsize=(8, 5))
-    bars = plt.bar(
-        room_energy.index,
-        room_energy.values,
-        color="#17a673",
-        edgecolor="#1890ff",
-        linewidth=1.5
-    )
-    plt.title(
-        "每个房间下设备的总能耗分布",
-        fontsize=18,
-        color="#17a673",
-        weight="bold",
-        fontproperties=font_prop
-    )
-    plt.xlabel("房间", fontsize=14, fontproperties=font_prop)
-    plt.ylabel("总能耗 (kWh)", fontsize=14, fontproperties=font_prop)
-    plt.grid(axis="y", linestyle="--", alpha=0.5)
-    for bar in bars:
-        plt.text(
-            bar.get_x() + bar.get_width() / 2,
-            bar.get_height(),
-            f"{bar.get_height():.2f}",
-            ha='center',
-            va='bottom',
-            fontsize=12,
-            color="#333",
+    with profiling.mark_phase("render"):
+        plt.figure(figsize=(8, 5))
+        bars = plt.bar(
+            room_energy.index,
+            room_energy.values,
+            color="#17a673",
+            edgecolor="#1890ff",
+            linewidth=1.5
+        )
+        plt.title(
+            "每个房间下设备的总能耗分布",
+            fontsize=18,
+            color="#17a673",
+            weight="bold",
             fontproperties=font_prop
         )
-    plt.tight_layout()
-    plt.gca().spines['top'].set_visible(False)
-    plt.gca().spines['right'].set_visible(False)
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
-    plt.close()
+        plt.xlabel("房间", fontsize=14, fontproperties=font_prop)
+        plt.ylabel("总能耗 (kWh)", fontsize=14, fontproperties=font_prop)
+        plt.grid(axis="y", linestyle="--", alpha=0.5)
+        for bar in bars:
+            plt.text(
+                bar.get_x() + bar.get_width() / 2,
+                bar.get_height(),
+                f"{bar.get_height():.2f}",
+                ha='center',
+                va='bottom',
+                fontsize=12,
+                color="#333",
+                fontproperties=font_prop
+            )
+        plt.tight_layout()
+        plt.gca().spines['top'].set_visible(False)
+        plt.gca().spines['right'].set_visible(False)
+        buf = io.BytesIO()
+        plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
+        plt.close()
     buf.seek(0)
     return Response(content=buf.read(), media_type="image/png")
 
 # 用户活跃度排行
 
 
-@router.get("/user_activity")
-def user_activity(db: Session = Depends(get_db)):
-    usages = db.query(models.DeviceUsage).all()
-    users = db.query(models.User).all()
-    if not usages or not users:
-        return {"error": "No usage or user data."}
-    usage_df = pd.DataFrame([{"user_id": u.user_id} for u in usages])
-    user_map = {u.id: u.name for u in users}
-    usage_df["user_name"] = usage_df["user_id"].map(user_map)
-    activity = usage_df["user_name"].value_counts(
-    ).sort_values(ascending=False)
-    plt.figure(figsize=(8, 5))
-    bars = plt.bar(
-        activity.index,
-        activity.values,
-        color="#36b9cc",
-        edgecolor="#1890ff",
-        linewidth=1.5
-    )
-    plt.title(
-        "用户活跃度排行",
-        fontsize=18,
-        color="#36b9cc",
-        weight="bold",
-        fontproperties=font_prop
+@router.get("/user_activity", dependencies=[Depends(analysis_etag)])
+def user_activity(
+    start: Optional[datetime] = None,
+    as_of: Optional[datetime] = None,
+    db: Session = Depends(get_read_db)
+):
+    activity = _usage_counts_by(
+        db, models.DeviceUsage.user_name, models.DeviceUsage.user_id,
+        start, as_of
     )
-    plt.xlabel("用户", fontsize=14, fontproperties=font_prop)
-    plt.ylabel("使用次数", fontsize=14, fontproperties=font_prop)
-    plt.grid(axis="y", linestyle="--", alpha=0.5)
-    for bar in bars:
-        plt.text(
-            bar.get_x() + bar.get_width() / 2,
-            bar.get_height(),
-            int(bar.get_height()),
-            ha='center',
-            va='bottom',
-            fontsize=12,
-            color="#333",
+    if activity.empty:
+        return {"error": "No usage or user data."}
+    with profiling.mark_phase("render"):
+        plt.figure(figsize=(8, 5))
+        bars = plt.bar(
+            activity.index,
+            activity.values,
+            color="#36b9cc",
+            edgecolor="#1890ff",
+            linewidth=1.5
+        )
+        plt.title(
+            "用户活跃度排行",
+            fontsize=18,
+            color="#36b9cc",
+            weight="bold",
             fontproperties=font_prop
         )
-    plt.tight_layout()
-    plt.gca().spines['top'].set_visible(False)
-    plt.gca().spines['right'].set_visible(False)
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
-    plt.close()
+        plt.xlabel("用户", fontsize=14, fontproperties=font_prop)
+        plt.ylabel("使用次数", fontsize=14, fontproperties=font_prop)
+        plt.grid(axis="y", linestyle="--", alpha=0.5)
+        for bar in bars:
+            plt.text(
+                bar.get_x() + bar.get_width() / 2,
+                bar.get_height(),
+                int(bar.get_height()),
+                ha='center',
+                va='bottom',
+                fontsize=12,
+                color="#333",
+                fontproperties=font_prop
+            )
+        plt.tight_layout()
+        plt.gca().spines['top'].set_visible(False)
+        plt.gca().spines['right'].set_visible(False)
+        buf = io.BytesIO()
+        plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
+        plt.close()
     buf.seek(0)
     return Response(content=buf.read(), media_type="image/png")
 
 # 各房间安防事件数量分布
 
 
-@router.get("/room_event_count")
-def room_event_count(db: Session = Depends(get_db)):
-    events = db.query(models.SecurityEvent).all()
-    devices = db.query(models.Device).all()
-    rooms = db.query(models.Room).all()
+@router.get("/room_event_count", dependencies=[Depends(analysis_etag)])
+def room_event_count(
+    start: Optional[datetime] = None,
+    as_of: Optional[datetime] = None,
+    db: Session = Depends(get_read_db)
+):
+    events = _events_in_window(db, start, as_of).all()
+    devices = refcache.devices(db)
+    rooms = refcache.rooms(db)
     if not events or not devices or not rooms:
         return {"error": "No event, device or room data."}
     event_df = pd.DataFrame([{"device_id": e.device_id} for e in events])
-    device_map = {d.id: d.room_id for d in devices}
-    room_map = {r.id: r.name for r in rooms}
+    device_map = {i: d.room_id for i, d in devices.items()}
+    room_map = {i: r.name for i, r in rooms.items()}
     event_df["room_id"] = event_df["device_id"].map(device_map)
     event_df["room_name"] = event_df["room_id"].map(room_map)
     room_event = event_df["room_name"].value_counts(
     ).sort_values(ascending=False)
-    plt.figure(figsize=(8, 5))
-    bars = plt.bar(
-        room_event.index,
-        room_event.values,
-        color="#e74c3c",
-        edgecolor="#1890ff",
-        linewidth=1.5
-    )
-    plt.title(
-        "各房间安防事件数量分布",
-        fontsize=18,
-        color="#e74c3c",
-        weight="bold",
-        fontproperties=font_prop
-    )
-    plt.xlabel("房间", fontsize=14, fontproperties=font_prop)
-    plt.ylabel("事件数量", fontsize=14, fontproperties=font_prop)
-    plt.grid(axis="y", linestyle="--", alpha=0.5)
-    for bar in bars:
-        plt.text(
-            bar.get_x() + bar.get_width() / 2,
-            bar.get_height(),
-            int(bar.get_height()),
-            ha='center',
-            va='bottom',
-            fontsize=12,
-            color="#333",
+    with profiling.mark_phase("render"):
+        plt.figure(figsize=(8, 5))
+        bars = plt.bar(
+            room_event.index,
+            room_event.values,
+            color="#e74c3c",
+            edgecolor="#1890ff",
+            linewidth=1.5
+        )
+        plt.title(
+            "各房间安防事件数量分布",
+            fontsize=18,
+            color="#e74c3c",
+            weight="bold",
             fontproperties=font_prop
         )
-    plt.tight_layout()
-    plt.gca().spines['top'].set_visible(False)
-    plt.gca().spines['right'].set_visible(False)
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
-    plt.close()
+        plt.xlabel("房间", fontsize=14, fontproperties=font_prop)
+        plt.ylabel("事件数量", fontsize=14, fontproperties=font_prop)
+        plt.grid(axis="y", linestyle="--", alpha=0.5)
+        for bar in bars:
+            plt.text(
+                bar.get_x() + bar.get_width() / 2,
+                bar.get_height(),
+                int(bar.get_height()),
+                ha='center',
+                va='bottom',
+                fontsize=12,
+                color="#333",
+                fontproperties=font_prop
+            )
+        plt.tight_layout()
+        plt.gca().spines['top'].set_visible(False)
+        plt.gca().spines['right'].set_visible(False)
+        buf = io.BytesIO()
+        plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
+        plt.close()
     buf.seek(0)
     return Response(content=buf.read(), media_type="image/png")
 
 # 2024年6月每天的设备使用次数趋势
 
 
-@router.get("/daily_device_usage")
-def daily_device_usage(db: Session = Depends(get_db)):
-    usages = db.query(models.DeviceUsage).all()
+@router.get("/daily_device_usage", dependencies=[Depends(analysis_etag)])
+def daily_device_usage(
+    start: Optional[datetime] = None,
+    as_of: Optional[datetime] = None,
+    db: Session = Depends(get_read_db)
+):
+    # 只统计2024年6月, 在SQL中过滤以便裁剪分区
+    usages = _usages_in_window(db, start, as_of).filter(
+        models.DeviceUsage.start_time >= datetime(2024, 6, 1),
+        models.DeviceUsage.start_time < datetime(2024, 7, 1),
+    ).all()
     if not usages:
         return {"error": "No device usage data."}
     df = pd.DataFrame([{"start_time": u.start_time}
@@ -516,42 +646,40 @@ def daily_device_usage(db: Session = Depends(get_db)):
     if df.empty:
         return {"error": "No valid usage data."}
     df["date"] = pd.to_datetime(df["start_time"]).dt.date
-    # 仅统计2024年6月
-    df = df[(df["date"] >= pd.to_datetime("2024-06-01").date()) &
-            (df["date"] <= pd.to_datetime("2024-06-30").date())]
     daily = df["date"].value_counts().sort_index()
-    plt.figure(figsize=(10, 5))
-    plt.plot(
-        daily.index.astype(str),
-        daily.values,
-        marker="o",
-        color="#1890ff",
-        linewidth=2
-    )
-    plt.title(
-        "2024年6月每天的设备使用次数趋势",
-        fontsize=18,
-        color="#1890ff",
-        weight="bold",
-        fontproperties=font_prop
-    )
-    plt.xlabel("日期", fontsize=14, fontproperties=font_prop)
-    plt.ylabel("使用次数", fontsize=14, fontproperties=font_prop)
-    plt.grid(axis="y", linestyle="--", alpha=0.5)
-    for x, y in zip(daily.index, daily.values):
-        plt.text(
-            str(x), y, int(y),
-            ha='center',
-            va='bottom',
-            fontsize=12,
-            color="#333",
+    with profiling.mark_phase("render"):
+        plt.figure(figsize=(10, 5))
+        plt.plot(
+            daily.index.astype(str),
+            daily.values,
+            marker="o",
+            color="#1890ff",
+            linewidth=2
+        )
+        plt.title(
+            "2024年6月每天的设备使用次数趋势",
+            fontsize=18,
+            color="#1890ff",
+            weight="bold",
             fontproperties=font_prop
         )
-    plt.tight_layout()
-    plt.gca().spines['top'].set_visible(False)
-    plt.gca().spines['right'].set_visible(False)
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
-    plt.close()
+        plt.xlabel("日期", fontsize=14, fontproperties=font_prop)
+        plt.ylabel("使用次数", fontsize=14, fontproperties=font_prop)
+        plt.grid(axis="y", linestyle="--", alpha=0.5)
+        for x, y in zip(daily.index, daily.values):
+            plt.text(
+                str(x), y, int(y),
+                ha='center',
+                va='bottom',
+                fontsize=12,
+                color="#333",
+                fontproperties=font_prop
+            )
+        plt.tight_layout()
+        plt.gca().spines['top'].set_visible(False)
+        plt.gca().spines['right'].set_visible(False)
+        buf = io.BytesIO()
+        plt.savefig(buf, format="png", dpi=120, bbox_inches="tight")
+        plt.close()
     buf.seek(0)
     return Response(content=buf.read(), media_type="image/png")
@@ -0,0 +1,93 @@
+"""
+命令行客户端访问服务端 API 的 HTTP 客户端。
+
+所有请求共用一个 requests.Session: 连接池复用 TCP 连接 (keep-alive),
+统一的超时, 以及带指数退避的自动重试:
+- 连接失败: 任何方法都会重试 (请求尚未发出)
+- 502 / 503 / 504: 只重试幂等方法 (GET / PUT / DELETE 等)
+- 429: 服务端在处理前就拒绝了请求, 任何方法都会重试, 并遵守 Retry-After
+
+自行处理 429 等状态码的调用方 (如有总时限的重试循环) 传 retry_status=False,
+此时只重试连接失败, 响应原样返回, 避免两层重试叠加。
+"""
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_BASE_URL = os.getenv("SMARTHOME_API_URL", "http://127.0.0.1:8000")
+# (连接超时, 读取超时), 单位秒
+DEFAULT_TIMEOUT = (
+    float(os.getenv("SMARTHOME_CONNECT_TIMEOUT", "3.05")),
+    float(os.getenv("SMARTHOME_READ_TIMEOUT", "30")),
+)
+RETRIES = int(os.getenv("SMARTHOME_RETRIES", "3"))
+POOL_SIZE = 10
+
+
+class _Retry(Retry):
+    def is_retry(self, method, status_code, has_retry_after=False):
+        # 429 表示请求未被处理, 非幂等方法 (POST) 重试也是安全的
+        if (status_code == 429 and self.total
+                and status_code in (self.status_forcelist or ())):
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class ApiClient:
+    def __init__(self, base_url: str = DEFAULT_BASE_URL,
+                 timeout=DEFAULT_TIMEOUT, retries: int = RETRIES):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = self._session(retries, status_retries=retries)
+        self.connect_retry_session = self._session(retries, status_retries=0)
+
+    @staticmethod
+    def _session(retries: int, status_retries: int) -> requests.Session:
+        session = requests.Session()
+        retry = _Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=status_retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 502, 503, 504) if status_retries else (),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE,
+            max_retries=retry,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def request(self, method: str, path: str, timeout=None,
+                retry_status: bool = True, **kwargs):
+        """
+        path 为以 / 开头的接口路径; 返回 requests.Response, 不检查状态码。
+        retry_status=False 时不按状态码 (429 / 5xx) 重试。
+        """
+        session = self.session if retry_status else self.connect_retry_session
+        return session.request(
+            method, self.base_url + path,
+            timeout=self.timeout if timeout is None else timeout, **kwargs
+        )
+
+    def get(self, path: str, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path: str, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+        self.connect_retry_session.close()
@@ -0,0 +1,93 @@
+"""
+命令行客户端的启动时间: 从启动进程到出现菜单提示 ("请选择操作") 的时间。
+
+每次启动一个新进程, stdin 为空 (提示出现后读到 EOF, 客户端随即退出),
+报告多次运行的最小值 / 中位数 / 最大值。
+
+用法 (在项目根目录):
+    python -m benchmarks.cli_startup --runs 10
+    python -m benchmarks.cli_startup --command dist/SmartHomeCLI   # 打包版本
+    python -m benchmarks.cli_startup --importtime   # 另外列出耗时最多的导入
+"""
+import argparse
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+PROMPT_MARKER = "请选择操作".encode("utf-8")
+
+
+def time_to_prompt(command, env) -> float:
+    began = time.perf_counter()
+    proc = subprocess.Popen(
+        command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, env=env,
+    )
+    output = b""
+    elapsed = None
+    while True:
+        chunk = proc.stdout.read1(65536)
+        if not chunk:
+            break
+        output += chunk
+        if elapsed is None and PROMPT_MARKER in output:
+            elapsed = time.perf_counter() - began
+    proc.wait()
+    if elapsed is None:
+        raise RuntimeError(f"没有出现菜单提示: {output[-500:]!r}")
+    return elapsed
+
+
+def slowest_imports(limit: int):
+    """python -X importtime 中 client_cli 直接导入的模块, 按累计耗时排序。"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import client_cli"],
+        capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # 名称前每一层嵌套缩进两个空格, 深度 1 即 client_cli 直接导入的模块
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if cumulative.strip().isdigit() and depth == 1:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--command", help="启动命令 (默认: 当前解释器运行 client_cli.py)"
+    )
+    parser.add_argument("--importtime", action="store_true")
+    args = parser.parse_args()
+
+    if args.command:
+        command = shlex.split(args.command)
+    else:
+        command = [sys.executable, "client_cli.py"]
+    # 不清屏, 避免 clear 命令的开销计入启动时间
+    env = {**os.environ, "TERM": "dumb", "PYTHONIOENCODING": "utf-8"}
+
+    time_to_prompt(command, env)  # 预热文件系统缓存
+    times = [time_to_prompt(command, env) for _ in range(args.runs)]
+    print(f"command: {' '.join(command)}")
+    print(f"time to menu prompt over {args.runs} runs: "
+          f"min {min(times) * 1000:.0f} ms, "
+          f"median {statistics.median(times) * 1000:.0f} ms, "
+          f"max {max(times) * 1000:.0f} ms")
+
+    if args.importtime:
+        print(f"{'cumulative ms':>14}  module")
+        for cumulative, name in slowest_imports(15):
+            print(f"{cumulative / 1000:>14.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
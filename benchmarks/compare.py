@@ -0,0 +1,102 @@
+"""
+比较两次压测 (benchmarks.loadtest) 的 JSON 结果, 列出每个路由的变化。
+
+延迟 (p50/p95/p99) 增加或吞吐量下降超过 --threshold 百分比, 或错误率
+上升时标记为回退, 存在回退时以状态码 1 退出 (可用于 CI)。
+两次运行的配置 (请求组合、并发、数据集等) 不同时先给出警告。
+
+用法 (在项目根目录):
+    python -m benchmarks.compare base.json new.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# 比较时忽略的配置项 (每次运行都不同)
+VOLATILE_META = {"timestamp", "git_revision"}
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+# 请求数少于该值的路由百分位数不稳定, 只列出不判定回退
+MIN_REQUESTS = 20
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def change(old: float, new: float) -> float:
+    if not old:
+        return 0.0
+    return (new - old) / old * 100
+
+
+def error_rate(stats: dict) -> float:
+    return stats["errors"] / stats["requests"] if stats["requests"] else 0.0
+
+
+def compare_route(old: dict, new: dict, threshold: float) -> tuple:
+    """返回 (各列文本, 回退原因列表)。"""
+    cells, reasons = [], []
+    for key in LATENCY_KEYS:
+        delta = change(old[key], new[key])
+        cells.append(f"{new[key]:.1f} ({delta:+.0f}%)")
+        if delta > threshold:
+            reasons.append(f"{key} +{delta:.0f}%")
+    delta = change(old["throughput_rps"], new["throughput_rps"])
+    cells.append(f"{new['throughput_rps']:.1f} ({delta:+.0f}%)")
+    if delta < -threshold:
+        reasons.append(f"throughput {delta:.0f}%")
+    if error_rate(new) > error_rate(old):
+        reasons.append(f"errors {error_rate(old):.1%} -> "
+                       f"{error_rate(new):.1%}")
+    if min(old["requests"], new["requests"]) < MIN_REQUESTS:
+        reasons = []
+    return cells, reasons
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10,
+                        help="判定回退的变化百分比")
+    args = parser.parse_args()
+    base, new = load(args.base), load(args.new)
+
+    for key in sorted(set(base["meta"]) | set(new["meta"])):
+        if key in VOLATILE_META:
+            continue
+        if base["meta"].get(key) != new["meta"].get(key):
+            print(f"[WARN] 配置不同 {key}: {base['meta'].get(key)} -> "
+                  f"{new['meta'].get(key)}")
+    print(f"base: {base['meta']['git_revision']} "
+          f"({base['meta']['timestamp']})")
+    print(f"new:  {new['meta']['git_revision']} "
+          f"({new['meta']['timestamp']})")
+
+    print(f"{'route':<42}{'p50 ms':>16}{'p95 ms':>16}{'p99 ms':>16}"
+          f"{'rps':>16}")
+    regressions = []
+    routes = sorted(set(base["routes"]) | set(new["routes"]))
+    rows = [(route, base["routes"].get(route), new["routes"].get(route))
+            for route in routes]
+    rows.append(("(all)", base["summary"], new["summary"]))
+    for route, old, current in rows:
+        if not old or not current:
+            print(f"{route:<42}  只在{'新' if current else '旧'}结果中出现")
+            continue
+        cells, reasons = compare_route(old, current, args.threshold)
+        print(f"{route:<42}" + "".join(f"{cell:>16}" for cell in cells)
+              + ("  <-- " + ", ".join(reasons) if reasons else ""))
+        if reasons:
+            regressions.append(route)
+
+    if regressions:
+        print(f"[WARN] {len(regressions)} 个路由回退超过 "
+              f"{args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"[INFO] 没有超过 {args.threshold:.0f}% 的回退")
+
+
+if __name__ == "__main__":
+    main()
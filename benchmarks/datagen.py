@@ -0,0 +1,539 @@
+"""
+大规模合成数据: 按家庭数与天数生成接近真实分布的数据, 多个进程并行 COPY 写入。
+
+分布:
+  - 家庭: 1~4 名成员共用房屋面积; 客厅、卧室 (1~3 间)、厨房、卫生间必有,
+    书房、玄关按概率出现; 每类房间按概率配置设备 (见 ROOM_DEVICES)
+  - 设备热度偏斜: 家庭内的设备随机排序后按 Zipf 权重 (--zipf) 乘以设备类型的
+    基础热度被使用, 少数设备占大部分会话; 各家庭的活跃度服从 Gamma 分布
+  - 日内规律: 会话开始时间按设备类型的 24 小时曲线抽样 (本地时间,
+    --utc-offset, 数据库中保存 UTC), 周末更活跃
+  - 会话重叠: 同一家庭的会话独立抽样, 晚间高峰多台设备同时使用;
+    时长按设备类型服从对数正态分布, 截止时间 (--end) 时仍未结束的会话
+    end_time 为空 (开放会话)
+  - 安防事件夜间更多, 主要由摄像头与门锁产生; 反馈稀疏
+同一天内的记录按开始时间排序后分配 id, id 顺序与时间一致 (与线上追加写入
+相同, BRIN 索引有效)。
+
+确定性: 家庭结构由 --seed 决定; 每一天的数量与内容由 (seed, 天序号) 派生的
+独立随机数流产生, 各天的 id 由数量的前缀和预先分配, 结果与 worker 数无关。
+
+写入: 清空目标库的业务表; device_usages / security_events 先删除外键与
+模型中声明的索引, 各 worker 按天 COPY, 全部完成后重建索引与外键, 最后
+ANALYZE 并把各表的 id 序列设置为最大 id。
+
+用法 (在项目根目录, 约 5000 万条使用记录):
+    python -m benchmarks.datagen --households 10000 --days 365 --workers 8
+"""
+import argparse
+import datetime
+import io
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+import etag
+import invalidation
+import models
+from benchmarks.seed import (
+    DEFAULT_DATABASE, END, TABLES, create_database, database_url,
+)
+
+# 设备类型: (24 小时的相对活跃度 (本地时间), 时长中位数 (分钟), 时长对数标准差,
+#            功率 kW, 基础热度, (manual, auto, schedule) 概率)
+DEVICE_PROFILES = {
+    "灯": ([.2, .1, .1, .1, .1, .2, 1, 2, 1.5, .4, .3, .3,
+           .3, .3, .3, .3, .5, 1.5, 3, 4, 4, 3.5, 2.5, 1],
+          45, .9, .01, 3.0, (.8, .15, .05)),
+    "空调": ([1.5, 1.5, 1.2, 1, .8, .5, .4, .3, .3, .5, .8, 1.2,
+            1.8, 2, 2, 1.8, 1.5, 1.5, 1.5, 2, 2.5, 3, 3, 2.5],
+           150, .7, 1.2, 1.0, (.5, .1, .4)),
+    "电视": ([.3, .1, .05, .05, .05, .05, .2, .5, .4, .3, .4, .6,
+            1, .8, .5, .5, .6, .8, 1.5, 3, 4, 3.5, 2, .8],
+           100, .6, .12, 1.5, (.95, 0, .05)),
+    "冰箱": ([.1, .05, .05, .05, .05, .2, 1, 2, 1, .5, .6, 1.5,
+            2, .8, .5, .6, 1, 2, 2.5, 1.5, .8, .6, .4, .2],
+           2, .6, .15, 4.0, (1, 0, 0)),
+    "洗衣机": ([0, 0, 0, 0, 0, 0, .2, .8, 1.5, 2, 1.5, 1,
+             .8, .6, .6, .6, .6, .8, 1, 1.5, 1.5, 1, .3, .1],
+            60, .3, .5, .3, (.6, 0, .4)),
+    "热水器": ([.3, .1, .05, .05, .05, .3, 2, 3, 1.5, .5, .3, .3,
+             .3, .2, .2, .2, .3, .5, 1, 2, 3, 3, 2, 1],
+            25, .5, 2.0, 1.2, (.5, .2, .3)),
+    "摄像头": ([1.5, 1.5, 1.5, 1.5, 1.5, 1.5, 1, 1, 1, 1, 1, 1,
+             1, 1, 1, 1, 1, 1, 1, 1, 1, 1.2, 1.5, 1.5],
+            3, .8, .005, 1.0, (0, 1, 0)),
+    "门锁": ([.05, .02, .02, .02, .05, .2, 1, 3, 2.5, .6, .4, .5,
+            .6, .5, .4, .5, .8, 2, 3, 2, 1, .6, .3, .1],
+           1, .3, .001, 1.5, (.9, .1, 0)),
+}
+DEVICE_TYPES = list(DEVICE_PROFILES)
+USAGE_TYPES = np.array(["manual", "auto", "schedule"], dtype=object)
+
+# 房间类型: [(设备类型, 出现概率)], 概率大于 1 的部分表示多台
+ROOM_DEVICES = {
+    "客厅": [("电视", 1), ("空调", .9), ("灯", 2), ("摄像头", .5)],
+    "卧室": [("空调", .8), ("灯", 1.5), ("电视", .2)],
+    "厨房": [("冰箱", 1), ("灯", 1), ("热水器", .3)],
+    "卫生间": [("热水器", .9), ("洗衣机", .7), ("灯", 1)],
+    "书房": [("灯", 1.5), ("空调", .6)],
+    "玄关": [("门锁", 1), ("摄像头", .6), ("灯", .5)],
+}
+# 安防事件: 设备类型 -> [(事件类型, 概率, 级别)]
+EVENT_TYPES = {
+    "摄像头": [("motion", .93, "low"), ("intrusion", .07, "high")],
+    "门锁": [("door_open", .95, "low"), ("intrusion", .05, "high")],
+}
+DEFAULT_EVENTS = [("smoke", .6, "high"), ("power_failure", .4, "medium")]
+# 安防事件的 24 小时曲线: 夜间更多
+EVENT_HOURS = [3, 3, 3, 3, 2.5, 2, 1.5, 2, 2, 1, 1, 1,
+               1, 1, 1, 1, 1, 1.5, 2, 1.5, 1.5, 2, 2.5, 3]
+FEEDBACK_TYPES = ["bug", "suggestion", "praise"]
+FEEDBACK_TEXT = {
+    "bug": "{device}经常无响应, 需要重启才能恢复",
+    "suggestion": "希望{device}支持按场景自动开关",
+    "praise": "{device}很好用, 省电效果明显",
+}
+
+WEEKEND_FACTOR = 1.25
+EVENTS_PER_DAY = .3
+FEEDBACKS_PER_DAY = .005
+SECONDS_PER_DAY = 86400
+
+# 先删除外键与索引、写完后重建的大表
+BULK_TABLES = ("device_usages", "security_events")
+
+
+class Households:
+    """全部家庭的结构 (成员、房间、设备) 及按天抽样所需的数组。"""
+
+    def __init__(self, households: int, sessions_per_day: float,
+                 zipf: float, seed: int):
+        rng = np.random.default_rng([seed, 0])
+        self.count = households
+        self.activity = rng.gamma(2.0, sessions_per_day / 2.0, households)
+
+        user_names, user_areas = [], []
+        room_names, device_names, device_room, device_type = [], [], [], []
+        device_home, weights, security = [], [], []
+        first_user = np.zeros(households, dtype=np.int64)
+        members = rng.integers(1, 5, households)
+        areas = np.round(rng.lognormal(np.log(90), .35, households), 1)
+        bedrooms = rng.integers(1, 4, households)
+        extra = rng.random((households, 2))
+        for h in range(households):
+            first_user[h] = len(user_names)
+            for k in range(members[h]):
+                user_names.append(f"家庭{h + 1}-成员{k + 1}")
+                user_areas.append(areas[h])
+            rooms = ["客厅"] + ["卧室"] * bedrooms[h] + ["厨房", "卫生间"]
+            if extra[h, 0] < .4:
+                rooms.append("书房")
+            if extra[h, 1] < .7:
+                rooms.append("玄关")
+            first_device = len(device_names)
+            for room in rooms:
+                room_id = len(room_names) + 1
+                room_names.append(f"{room}{room_id}")
+                for kind, expected in ROOM_DEVICES[room]:
+                    copies = int(expected) + (rng.random() < expected % 1)
+                    for _ in range(copies):
+                        device_names.append(f"{kind}{len(device_names) + 1}")
+                        device_room.append(room_id)
+                        device_type.append(DEVICE_TYPES.index(kind))
+                        device_home.append(h)
+            # 家庭内设备随机排序, 按 Zipf 权重乘以设备类型的基础热度
+            n = len(device_names) - first_device
+            ranks = rng.permutation(n) + 1
+            types = device_type[first_device:]
+            weights.extend(
+                DEVICE_PROFILES[DEVICE_TYPES[t]][4] / rank ** zipf
+                for t, rank in zip(types, ranks)
+            )
+            security.extend(
+                1.0 if DEVICE_TYPES[t] in EVENT_TYPES else .05 for t in types
+            )
+
+        self.user_names = np.array(user_names, dtype=object)
+        self.user_areas = np.array(user_areas)
+        self.members = members
+        self.first_user = first_user
+        self.room_names = np.array(room_names, dtype=object)
+        self.device_names = np.array(device_names, dtype=object)
+        self.device_room = np.array(device_room)
+        self.device_type = np.array(device_type)
+        self.device_home = np.array(device_home)
+        self.usage_cdf = _household_cdf(self.device_home, np.array(weights))
+        self.event_cdf = _household_cdf(self.device_home, np.array(security))
+        self.feedback_rng = rng
+
+
+def _household_cdf(homes, weights):
+    """
+    各家庭设备权重的累积分布, 第 h 个家庭的取值位于 (h, h + 1]:
+    对家庭 h 与 [0, 1) 内的均匀随机数 u,
+    searchsorted(cdf, h + u, side="right") 即按权重抽到的设备。
+    """
+    totals = np.bincount(homes, weights=weights)
+    cumulative = np.cumsum(weights)
+    before = np.concatenate([[0], np.cumsum(totals)[:-1]])
+    cdf = (cumulative - before[homes]) / totals[homes] + homes
+    # 每个家庭最后一台设备恰好为 h + 1, 消除浮点误差
+    last = np.r_[homes[1:] != homes[:-1], True]
+    cdf[last] = homes[last] + 1
+    return cdf
+
+
+def _hour_cdf(weights):
+    cdf = np.cumsum(weights, dtype=float)
+    return cdf / cdf[-1]
+
+
+class DayPlan:
+    """生成参数与日期; 每一天的数量可以单独计算 (用于预先分配 id)。"""
+
+    def __init__(self, households: Households, days: int, end, utc_offset,
+                 seed: int):
+        self.households = households
+        self.days = days
+        self.end = end
+        self.utc_offset = datetime.timedelta(hours=utc_offset)
+        self.seed = seed
+        local_end = end + self.utc_offset
+        # 第 0 天为最早的一天 (本地日期)
+        self.first_day = (local_end - datetime.timedelta(days=days)).date()
+
+    def local_day(self, day: int) -> datetime.date:
+        return self.first_day + datetime.timedelta(days=day + 1)
+
+    def counts(self, day: int):
+        """(每个家庭的会话数, 每个家庭的安防事件数)。"""
+        rng = np.random.default_rng([self.seed, day, 0])
+        factor = WEEKEND_FACTOR if self.local_day(day).weekday() >= 5 else 1
+        h = self.households
+        sessions = rng.poisson(h.activity * factor)
+        events = rng.poisson(EVENTS_PER_DAY, h.count)
+        return sessions, events
+
+    def day_start_utc(self, day: int) -> np.datetime64:
+        local = datetime.datetime.combine(self.local_day(day),
+                                          datetime.time())
+        return np.datetime64(local - self.utc_offset, "us")
+
+    def usages(self, day: int, first_id: int) -> pd.DataFrame:
+        h = self.households
+        sessions, _ = self.counts(day)
+        rng = np.random.default_rng([self.seed, day, 1])
+        homes = np.repeat(np.arange(h.count), sessions)
+        n = len(homes)
+        devices = np.searchsorted(h.usage_cdf, homes + rng.random(n),
+                                  side="right")
+        users = h.first_user[homes] + (
+            rng.random(n) * h.members[homes]).astype(np.int64)
+        types = h.device_type[devices]
+
+        seconds = np.empty(n)
+        minutes = np.empty(n)
+        power = np.empty(n)
+        usage_type = np.empty(n, dtype=object)
+        for code, kind in enumerate(DEVICE_TYPES):
+            hours, median, sigma, kw, _, mix = DEVICE_PROFILES[kind]
+            mask = types == code
+            m = int(mask.sum())
+            if not m:
+                continue
+            hour = np.searchsorted(_hour_cdf(hours), rng.random(m),
+                                   side="right")
+            seconds[mask] = (hour + rng.random(m)) * 3600
+            minutes[mask] = np.clip(
+                rng.lognormal(np.log(median), sigma, m), .5, 24 * 60)
+            power[mask] = kw
+            usage_type[mask] = USAGE_TYPES[
+                np.searchsorted(np.cumsum(mix), rng.random(m) * sum(mix),
+                                side="right").clip(max=2)]
+
+        start = self.day_start_utc(day) + (seconds * 1e6).astype(
+            "timedelta64[us]")
+        end = start + (minutes * 60e6).astype("timedelta64[us]")
+        energy = np.round(
+            power * minutes / 60 * (.8 + .4 * rng.random(n)), 3)
+        still_open = end > np.datetime64(self.end, "us")
+        end[still_open] = np.datetime64("NaT")
+        energy[still_open] = np.nan
+
+        order = np.argsort(start, kind="stable")
+        frame = pd.DataFrame({
+            "id": np.arange(first_id, first_id + n),
+            "user_id": users[order] + 1,
+            "device_id": devices[order] + 1,
+            "start_time": start[order],
+            "end_time": end[order],
+            "usage_type": usage_type[order],
+            "energy_consumed": energy[order],
+            "device_type": np.array(DEVICE_TYPES, dtype=object)[
+                types[order]],
+            "user_name": h.user_names[users[order]],
+        })
+        return frame[start[order] <= np.datetime64(self.end, "us")]
+
+    def events(self, day: int, first_id: int) -> pd.DataFrame:
+        h = self.households
+        _, counts = self.counts(day)
+        rng = np.random.default_rng([self.seed, day, 2])
+        homes = np.repeat(np.arange(h.count), counts)
+        n = len(homes)
+        devices = np.searchsorted(h.event_cdf, homes + rng.random(n),
+                                  side="right")
+        users = h.first_user[homes] + (
+            rng.random(n) * h.members[homes]).astype(np.int64)
+        hour = np.searchsorted(_hour_cdf(EVENT_HOURS), rng.random(n),
+                               side="right")
+        start = self.day_start_utc(day) + (
+            (hour + rng.random(n)) * 3600e6).astype("timedelta64[us]")
+
+        event_type = np.empty(n, dtype=object)
+        level = np.empty(n, dtype=object)
+        u = rng.random(n)
+        kinds = np.array(DEVICE_TYPES, dtype=object)[h.device_type[devices]]
+        for kind in set(kinds):
+            mask = kinds == kind
+            threshold = 0
+            for name, probability, event_level in EVENT_TYPES.get(
+                    kind, DEFAULT_EVENTS):
+                chosen = mask & (u >= threshold) & (
+                    u < threshold + probability)
+                event_type[chosen] = name
+                level[chosen] = event_level
+                threshold += probability
+        # 两天内的事件有一半仍未处理
+        recent = np.datetime64(self.end, "us") - start < np.timedelta64(
+            2 * SECONDS_PER_DAY, "s")
+        status = np.where(recent & (rng.random(n) < .5), "open", "resolved")
+
+        order = np.argsort(start, kind="stable")
+        frame = pd.DataFrame({
+            "id": np.arange(first_id, first_id + n),
+            "user_id": users[order] + 1,
+            "device_id": devices[order] + 1,
+            "event_type": event_type[order],
+            "event_level": level[order],
+            "location": h.room_names[h.device_room[devices[order]] - 1],
+            "status": status[order],
+            "timestamp": start[order],
+        })
+        return frame[start[order] <= np.datetime64(self.end, "us")]
+
+
+def _copy(conn, table: str, frame: pd.DataFrame):
+    """以 CSV 格式 COPY 写入 (空字段为 NULL)。"""
+    buffer = io.StringIO()
+    frame.to_csv(buffer, header=False, index=False,
+                 date_format="%Y-%m-%d %H:%M:%S.%f")
+    buffer.seek(0)
+    sql = (f'COPY "{table}" ({", ".join(frame.columns)}) '
+           f"FROM STDIN WITH (FORMAT csv)")
+    cursor = conn.cursor()
+    if hasattr(cursor, "copy_expert"):
+        cursor.copy_expert(sql, buffer)
+    else:
+        # psycopg 3
+        with cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+    cursor.close()
+
+
+# ---- worker 进程 ----
+_worker = {}
+
+
+def _init_worker(plan: DayPlan, database: str):
+    _worker["plan"] = plan
+    _worker["engine"] = create_engine(database_url(database), pool_size=1)
+
+
+def _load_day(task):
+    day, usage_id, event_id = task
+    plan = _worker["plan"]
+    usages = plan.usages(day, usage_id)
+    events = plan.events(day, event_id)
+    raw = _worker["engine"].raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("SET synchronous_commit = off")
+        cursor.close()
+        _copy(raw, "device_usages", usages)
+        _copy(raw, "security_events", events)
+        raw.commit()
+    finally:
+        raw.close()
+    return len(usages), len(events)
+
+
+# ---- 主进程 ----
+def _reference_frames(h: Households, plan: DayPlan):
+    users = pd.DataFrame({
+        "id": np.arange(1, len(h.user_names) + 1),
+        "name": h.user_names,
+        "house_area": h.user_areas,
+    })
+    rooms = pd.DataFrame({
+        "id": np.arange(1, len(h.room_names) + 1),
+        "name": h.room_names,
+    })
+    devices = pd.DataFrame({
+        "id": np.arange(1, len(h.device_names) + 1),
+        "name": h.device_names,
+        "type": np.array(DEVICE_TYPES, dtype=object)[h.device_type],
+        "room_id": h.device_room,
+    })
+    rng = h.feedback_rng
+    counts = rng.poisson(FEEDBACKS_PER_DAY * plan.days, h.count)
+    homes = np.repeat(np.arange(h.count), counts)
+    n = len(homes)
+    devices_for = np.searchsorted(h.usage_cdf, homes + rng.random(n),
+                                  side="right")
+    kinds = rng.choice(FEEDBACK_TYPES, n)
+    offsets = (rng.random(n) * plan.days * SECONDS_PER_DAY * 1e6).astype(
+        "timedelta64[us]")
+    feedbacks = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "user_id": h.first_user[homes] + (
+            rng.random(n) * h.members[homes]).astype(np.int64) + 1,
+        "content": [FEEDBACK_TEXT[k].format(device=h.device_names[d])
+                    for k, d in zip(kinds, devices_for)],
+        "feedback_type": kinds,
+        "status": np.where(rng.random(n) < .8, "closed", "open"),
+        "device_id": devices_for + 1,
+        "timestamp": np.datetime64(plan.end, "us") - offsets,
+    })
+    return {"users": users, "rooms": rooms, "devices": devices,
+            "feedbacks": feedbacks}
+
+
+def _drop_bulk_constraints(conn) -> list:
+    """删除大表的外键与模型中声明的索引, 返回需要重建的外键。"""
+    foreign_keys = []
+    for table in BULK_TABLES:
+        rows = conn.execute(text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"
+        ), {"table": table}).all()
+        for name, definition in rows:
+            conn.execute(text(
+                f'ALTER TABLE "{table}" DROP CONSTRAINT "{name}"'))
+            foreign_keys.append((table, name, definition))
+        for index in models.Base.metadata.tables[table].indexes:
+            index.drop(conn, checkfirst=True)
+    return foreign_keys
+
+
+def _restore_bulk_constraints(engine, foreign_keys):
+    with engine.begin() as conn:
+        for table in BULK_TABLES:
+            for index in models.Base.metadata.tables[table].indexes:
+                began = time.perf_counter()
+                index.create(conn, checkfirst=True)
+                print(f"[INFO] 索引 {index.name}: "
+                      f"{time.perf_counter() - began:.1f}s")
+        for table, name, definition in foreign_keys:
+            conn.execute(text(
+                f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}'
+            ))
+
+
+def _finish(engine):
+    with engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT") as conn:
+        for table in TABLES:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"coalesce(max(id), 1), max(id) IS NOT NULL) FROM {table}"
+            ))
+            conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+
+def generate(database: str, households: int, days: int, workers: int,
+             seed: int, sessions_per_day: float, zipf: float,
+             end: datetime.datetime, utc_offset: float):
+    began = time.perf_counter()
+    h = Households(households, sessions_per_day, zipf, seed)
+    plan = DayPlan(h, days, end, utc_offset, seed)
+
+    # 各天的 id 区间: 数量的前缀和
+    tasks, usage_id, event_id = [], 1, 1
+    for day in range(days):
+        sessions, events = plan.counts(day)
+        tasks.append((day, usage_id, event_id))
+        usage_id += int(sessions.sum())
+        event_id += int(events.sum())
+    print(f"[INFO] {households} 个家庭: {len(h.user_names)} 个用户, "
+          f"{len(h.room_names)} 个房间, {len(h.device_names)} 台设备; "
+          f"约 {usage_id - 1} 条使用记录, {event_id - 1} 条安防事件 "
+          f"({time.perf_counter() - began:.1f}s)")
+
+    create_database(database)
+    engine = create_engine(database_url(database))
+    models.Base.metadata.create_all(bind=engine)
+    etag.install_version_triggers(engine)
+    invalidation.install_triggers(engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE"))
+        foreign_keys = _drop_bulk_constraints(conn)
+    raw = engine.raw_connection()
+    try:
+        for table, frame in _reference_frames(h, plan).items():
+            _copy(raw, table, frame)
+        raw.commit()
+    finally:
+        raw.close()
+
+    # 子进程各自建立连接, 不继承主进程连接池中的连接
+    engine.dispose()
+    loaded = time.perf_counter()
+    rows = 0
+    report_every = max(1, days // 20)
+    with multiprocessing.Pool(workers, _init_worker,
+                              (plan, database)) as pool:
+        for done, (usages, events) in enumerate(
+                pool.imap_unordered(_load_day, tasks), 1):
+            rows += usages
+            if done % report_every == 0 or done == days:
+                elapsed = time.perf_counter() - loaded
+                print(f"[INFO] {done}/{days} 天: 累计 {rows} 条使用记录, "
+                      f"{rows / elapsed:.0f} 行/秒")
+
+    _restore_bulk_constraints(engine, foreign_keys)
+    _finish(engine)
+    engine.dispose()
+    print(f"[INFO] 数据库 {database} 已生成, 写入 {rows} 条使用记录, "
+          f"用时 {time.perf_counter() - began:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--households", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sessions-per-day", type=float, default=14,
+                        help="每个家庭平均每天的设备使用次数")
+    parser.add_argument("--zipf", type=float, default=1.2,
+                        help="家庭内设备热度的 Zipf 指数 (越大越集中)")
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat,
+                        default=END, help="数据截止时间 (UTC)")
+    parser.add_argument("--utc-offset", type=float, default=8,
+                        help="家庭所在时区与 UTC 的时差 (小时)")
+    args = parser.parse_args()
+    generate(args.database, args.households, args.days, args.workers,
+             args.seed, args.sessions_per_day, args.zipf, args.end,
+             args.utc_offset)
+
+
+if __name__ == "__main__":
+    main()
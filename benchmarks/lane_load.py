@@ -0,0 +1,164 @@
+"""
+并发分析负载下 ingest 接口的延迟 (优先级通道的效果)。
+
+两个阶段, 各持续 --duration 秒:
+  1. 只有 ingest: 以固定速率 POST /device_usages/ 与 /security_events/
+  2. 同样的 ingest, 同时有 --analysis-clients 个客户端不停请求分析接口与
+     /api/sql_query (收到 429 时按 Retry-After 等待)
+输出两个阶段 ingest 的 p50/p95/p99 与各类状态码数量; 结束后批量删除写入的记录。
+
+需要先启动服务 (压测脚本与服务都在本机时, 所有请求来自同一个客户端,
+应关闭 expensive 通道的按客户端限流, 只观察并发上限与饱和丢弃):
+    LANE_EXPENSIVE_RATE=0 uvicorn main:app --port 8000
+    python -m benchmarks.lane_load --duration 20
+对比关闭中间件的情况:
+    RATE_LIMIT_ENABLED=0 uvicorn main:app --port 8000
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import random
+import time
+
+import httpx
+
+EXPENSIVE_REQUESTS = [
+    ("GET", "/analysis/device_usage_frequency", None),
+    ("GET", "/analysis/user_habits", None),
+    ("GET", "/analysis/area_impact", None),
+    ("POST", "/api/sql_query", {
+        "sql": "SELECT device_id, count(*), sum(energy_consumed) "
+               "FROM device_usages GROUP BY device_id ORDER BY 3 DESC"
+    }),
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = collections.Counter()
+
+
+async def ingest(client, stats, created, rate, duration, user_ids,
+                 device_ids):
+    """按固定速率发出请求 (开环), 不因为响应变慢而降低发送速率。"""
+    rng = random.Random(1)
+    interval = 1 / rate
+    started = time.perf_counter()
+    tasks = []
+
+    async def one(i):
+        body = {"user_id": rng.choice(user_ids),
+                "device_id": rng.choice(device_ids)}
+        if i % 2:
+            path, kind = "/security_events/", "security_events"
+            body.update(event_type="motion", timestamp="2024-06-01T08:00:00")
+        else:
+            path, kind = "/device_usages/", "device_usages"
+            body.update(start_time="2024-06-01T08:00:00",
+                        end_time="2024-06-01T08:30:00", energy_consumed=0.1)
+        began = time.perf_counter()
+        try:
+            response = await client.post(path, json=body)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = "error"
+        stats.latencies.append((time.perf_counter() - began) * 1000)
+        stats.statuses[status] += 1
+        if status == 200:
+            created[kind].append(response.json()["id"])
+
+    for i in itertools.count():
+        delay = started + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if time.perf_counter() - started >= duration:
+            break
+        tasks.append(asyncio.create_task(one(i)))
+    await asyncio.gather(*tasks)
+
+
+async def expensive(client, stats, deadline, worker):
+    for i in itertools.count(worker):
+        if time.perf_counter() >= deadline:
+            return
+        method, path, body = EXPENSIVE_REQUESTS[i % len(EXPENSIVE_REQUESTS)]
+        try:
+            response = await client.request(method, path, json=body)
+            status = response.status_code
+        except httpx.HTTPError:
+            status, response = "error", None
+        stats.statuses[status] += 1
+        if status == 429:
+            await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+
+
+async def run_phase(args, analysis_clients, user_ids, device_ids, created):
+    ingest_stats, expensive_stats = Stats(), Stats()
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60,
+                                 limits=limits) as client:
+        deadline = time.perf_counter() + args.duration
+        workers = [
+            asyncio.create_task(
+                expensive(client, expensive_stats, deadline, worker))
+            for worker in range(analysis_clients)
+        ]
+        await ingest(client, ingest_stats, created, args.ingest_rate,
+                     args.duration, user_ids, device_ids)
+        await asyncio.gather(*workers)
+    return ingest_stats, expensive_stats
+
+
+def report(label, ingest_stats, expensive_stats):
+    lat = ingest_stats.latencies
+    print(f"{label:<28}{percentile(lat, 50):>9.1f}{percentile(lat, 95):>9.1f}"
+          f"{percentile(lat, 99):>9.1f}  ingest {dict(ingest_stats.statuses)}"
+          f"  expensive {dict(expensive_stats.statuses)}")
+
+
+async def cleanup(base_url, created):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        for kind, ids in created.items():
+            for i in range(0, len(ids), 1000):
+                await client.post(f"/{kind}/bulk_delete",
+                                  json={"ids": ids[i:i + 1000]})
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--ingest-rate", type=float, default=50,
+                        help="ingest 请求数/秒")
+    parser.add_argument("--analysis-clients", type=int, default=16)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as c:
+        users = (await c.get("/users/", params={"limit": 50})).json()
+        devices = (await c.get("/devices/", params={"limit": 50})).json()
+    user_ids = [u["id"] for u in users]
+    device_ids = [d["id"] for d in devices]
+    if not user_ids or not device_ids:
+        raise SystemExit("[ERROR] 数据库中需要已有用户和设备")
+
+    created = {"device_usages": [], "security_events": []}
+    print(f"{'phase':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    try:
+        report("ingest only", *await run_phase(
+            args, 0, user_ids, device_ids, created))
+        report(f"ingest + {args.analysis_clients} analysis", *await run_phase(
+            args, args.analysis_clients, user_ids, device_ids, created))
+    finally:
+        await cleanup(args.base_url, created)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
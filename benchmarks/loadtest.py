@@ -0,0 +1,481 @@
+"""
+API 压测: 按请求组合 (mix) 施加负载, 以 JSON 输出每个路由的吞吐量与延迟。
+
+默认启动大模型替身 (benchmarks.stub_llm) 与连接压测数据库的服务
+(POSTGRES_DB=smart_home_bench, 关闭限流), 压测结束后关闭;
+指定 --base-url 时对已运行的服务压测, 不启动任何进程。
+
+负载模型:
+  - 闭环 (默认): --concurrency 个客户端, 每个收到响应后立即发出下一个请求
+  - 开环: --rate 个请求/秒按固定间隔发出, 不因响应变慢而降低速率;
+    延迟从计划发出的时间算起, 排队时间也计入
+前 --warmup 秒的请求不计入结果。写入的记录 (usage_type / event_type /
+feedback_type 为 loadtest) 在结束后删除, 数据集保持不变, 两次运行可以比较。
+
+用法 (在项目根目录):
+    python -m benchmarks.seed                              # 生成压测数据库
+    python -m benchmarks.loadtest --mix mixed --output base.json
+    python -m benchmarks.loadtest --mix mixed --output new.json
+    python -m benchmarks.compare base.json new.json
+    python -m benchmarks.loadtest --mix get_usage=3,create_usage=1 --rate 200
+"""
+import argparse
+import asyncio
+import collections
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.seed import DEFAULT_DATABASE, END
+
+AS_OF = END.isoformat()
+LOADTEST_TAG = "loadtest"
+
+ANALYSIS_ENDPOINTS = [
+    "device_usage_frequency", "user_habits", "area_impact",
+    "device_type_usage", "room_energy", "user_activity", "room_event_count",
+    "daily_device_usage",
+]
+
+SQL_QUERIES = {
+    "sql_aggregate": (
+        "SELECT device_type, count(*), sum(energy_consumed) "
+        "FROM device_usages GROUP BY device_type ORDER BY 2 DESC"
+    ),
+    "sql_lookup": (
+        "SELECT id, device_id, start_time, end_time, energy_consumed "
+        "FROM device_usages WHERE user_id = {user} "
+        "ORDER BY start_time DESC LIMIT 50"
+    ),
+}
+
+
+class Request:
+    """一次请求; route 为结果中的路由名 (路径模板)。"""
+
+    def __init__(self, route, method, path, params=None, body=None):
+        self.route = route
+        self.method = method
+        self.path = path
+        self.params = params
+        self.body = body
+
+
+def _get(route, path, params=None):
+    return Request(f"GET {route}", "GET", path, params)
+
+
+def _post(route, path, body):
+    return Request(f"POST {route}", "POST", path, body=body)
+
+
+def _random_time(rng) -> datetime.datetime:
+    return END - datetime.timedelta(seconds=rng.randrange(180 * 86400))
+
+
+def _create_usage(ids, rng):
+    start = _random_time(rng)
+    return _post("/device_usages/", "/device_usages/", {
+        "user_id": rng.randint(1, ids["users"]),
+        "device_id": rng.randint(1, ids["devices"]),
+        "start_time": start.isoformat(),
+        "end_time": (start + datetime.timedelta(minutes=30)).isoformat(),
+        "usage_type": LOADTEST_TAG,
+        "energy_consumed": 0.5,
+    })
+
+
+def _analysis(ids, rng):
+    name = rng.choice(ANALYSIS_ENDPOINTS)
+    return _get(f"/analysis/{name}", f"/analysis/{name}", {"as_of": AS_OF})
+
+
+# 操作名 -> 生成请求的函数 (ids: 各表的最大 id, rng: 随机数生成器)
+OPERATIONS = {
+    "get_user": lambda ids, rng: _get(
+        "/users/{user_id}", f"/users/{rng.randint(1, ids['users'])}"),
+    "get_device": lambda ids, rng: _get(
+        "/devices/{device_id}", f"/devices/{rng.randint(1, ids['devices'])}"),
+    "get_usage": lambda ids, rng: _get(
+        "/device_usages/{usage_id}",
+        f"/device_usages/{rng.randint(1, ids['device_usages'])}"),
+    "get_event": lambda ids, rng: _get(
+        "/security_events/{event_id}",
+        f"/security_events/{rng.randint(1, ids['security_events'])}"),
+    "list_users": lambda ids, rng: _get(
+        "/users/", "/users/",
+        {"skip": rng.randrange(max(1, ids["users"] - 20)), "limit": 20}),
+    "list_devices": lambda ids, rng: _get(
+        "/devices/", "/devices/",
+        {"skip": rng.randrange(max(1, ids["devices"] - 100)), "limit": 100}),
+    "list_usages": lambda ids, rng: _get(
+        "/device_usages/", "/device_usages/",
+        {"skip": rng.randrange(10000), "limit": 100}),
+    "list_events": lambda ids, rng: _get(
+        "/security_events/", "/security_events/",
+        {"skip": rng.randrange(10000), "limit": 100}),
+    "create_usage": _create_usage,
+    "create_event": lambda ids, rng: _post(
+        "/security_events/", "/security_events/", {
+            "user_id": rng.randint(1, ids["users"]),
+            "device_id": rng.randint(1, ids["devices"]),
+            "event_type": LOADTEST_TAG,
+            "timestamp": _random_time(rng).isoformat(),
+        }),
+    "create_feedback": lambda ids, rng: _post(
+        "/feedbacks/", "/feedbacks/", {
+            "user_id": rng.randint(1, ids["users"]),
+            "device_id": rng.randint(1, ids["devices"]),
+            "content": "load test",
+            "feedback_type": LOADTEST_TAG,
+            "timestamp": _random_time(rng).isoformat(),
+        }),
+    "analysis": _analysis,
+    "sql_aggregate": lambda ids, rng: _post(
+        "/api/sql_query [aggregate]", "/api/sql_query",
+        {"sql": SQL_QUERIES["sql_aggregate"]}),
+    "sql_lookup": lambda ids, rng: _post(
+        "/api/sql_query [lookup]", "/api/sql_query",
+        {"sql": SQL_QUERIES["sql_lookup"].format(
+            user=rng.randint(1, ids["users"]))}),
+    "llm": lambda ids, rng: _post(
+        "/nlp/", "/nlp/",
+        {"question": "各类设备的使用次数", "model": "deepseek"}),
+}
+
+# 预设的请求组合: 操作名 -> 权重
+MIXES = {
+    "read": {
+        "get_user": 1, "get_device": 3, "get_usage": 4, "get_event": 2,
+        "list_users": 1, "list_devices": 1, "list_usages": 2,
+        "list_events": 1,
+    },
+    "crud": {
+        "get_device": 2, "get_usage": 3, "list_usages": 2,
+        "create_usage": 4, "create_event": 2, "create_feedback": 1,
+    },
+    "analysis": {"analysis": 1},
+    "sql": {"sql_aggregate": 1, "sql_lookup": 4},
+    "llm": {"llm": 1},
+    "mixed": {
+        "get_device": 8, "get_usage": 12, "get_event": 4, "get_user": 2,
+        "list_usages": 6, "list_devices": 3, "list_events": 3,
+        "create_usage": 20, "create_event": 8, "create_feedback": 2,
+        "sql_lookup": 6, "sql_aggregate": 1, "analysis": 1, "llm": 2,
+    },
+}
+
+
+def parse_mix(value: str) -> dict:
+    """预设名, 或 "操作=权重,..." 形式的自定义组合。"""
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(
+                f"未知的操作 {name!r}, 可选: {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+        self.statuses = collections.defaultdict(collections.Counter)
+        self.recording = False
+
+    def add(self, route, latency_ms, status):
+        if self.recording:
+            self.latencies[route].append(latency_ms)
+            self.statuses[route][status] += 1
+
+
+async def send(client, recorder, request, began):
+    try:
+        response = await client.request(
+            request.method, request.path, params=request.params,
+            json=request.body)
+        await response.aread()
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    recorder.add(request.route, (time.perf_counter() - began) * 1000,
+                 status)
+
+
+async def closed_loop(client, recorder, mix, ids, args, worker, deadline):
+    rng = random.Random(args.seed * 1000 + worker)
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        request = OPERATIONS[name](ids, rng)
+        await send(client, recorder, request, time.perf_counter())
+
+
+async def open_loop(client, recorder, mix, ids, args, deadline):
+    rng = random.Random(args.seed)
+    names, weights = list(mix), list(mix.values())
+    interval = 1 / args.rate
+    started = time.perf_counter()
+    tasks = set()
+    for i in itertools.count():
+        scheduled = started + i * interval
+        if scheduled >= deadline:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        request = OPERATIONS[rng.choices(names, weights)[0]](ids, rng)
+        task = asyncio.create_task(send(client, recorder, request, scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+
+
+async def max_ids(client) -> dict:
+    tables = ["users", "devices", "device_usages", "security_events"]
+    sql = "SELECT " + ", ".join(
+        f"(SELECT coalesce(max(id), 0) FROM {t}) AS {t}" for t in tables)
+    response = await client.post("/api/sql_query", json={"sql": sql})
+    response.raise_for_status()
+    ids = response.json()["data"][0]
+    if not all(ids.values()):
+        raise SystemExit("[ERROR] 数据库中没有数据, 请先运行 "
+                         "python -m benchmarks.seed")
+    return ids
+
+
+async def cleanup(client):
+    for path, where in [
+        ("/device_usages/bulk_delete", {"usage_type": LOADTEST_TAG}),
+        ("/security_events/bulk_delete", {"event_type": LOADTEST_TAG}),
+        ("/feedbacks/bulk_delete", {"feedback_type": LOADTEST_TAG}),
+    ]:
+        await client.post(path, json=where, timeout=600)
+
+
+async def run(args, mix) -> tuple:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency,
+                          max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout,
+                                 limits=limits) as client:
+        ids = await max_ids(client)
+        deadline = time.perf_counter() + args.warmup + args.duration
+
+        async def start_recording():
+            await asyncio.sleep(args.warmup)
+            recorder.recording = True
+        recording = asyncio.create_task(start_recording())
+
+        try:
+            if args.rate:
+                await open_loop(client, recorder, mix, ids, args, deadline)
+            else:
+                await asyncio.gather(*(
+                    closed_loop(client, recorder, mix, ids, args, worker,
+                                deadline)
+                    for worker in range(args.concurrency)
+                ))
+        finally:
+            recording.cancel()
+            await cleanup(client)
+    return recorder, ids
+
+
+def summarize(latencies, statuses, duration) -> dict:
+    count = len(latencies)
+    errors = sum(n for status, n in statuses.items()
+                 if not (isinstance(status, int) and status < 400))
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / duration, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / count, 2),
+        "max_ms": round(max(latencies), 2),
+        "statuses": {str(k): v for k, v in sorted(
+            statuses.items(), key=lambda item: str(item[0]))},
+    }
+
+
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, text=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def build_report(args, mix, recorder, ids) -> dict:
+    routes = {
+        route: summarize(latencies, recorder.statuses[route], args.duration)
+        for route, latencies in sorted(recorder.latencies.items())
+    }
+    all_latencies = [v for values in recorder.latencies.values()
+                     for v in values]
+    all_statuses = collections.Counter()
+    for statuses in recorder.statuses.values():
+        all_statuses.update(statuses)
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(
+                timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "base_url": args.base_url,
+            "database": None if args.external else args.database,
+            "workers": None if args.external else args.workers,
+            "mix": mix,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "llm_latency": None if args.external else args.llm_latency,
+            "dataset_max_ids": ids,
+        },
+        "summary": summarize(all_latencies, all_statuses, args.duration)
+        if all_latencies else {},
+        "routes": routes,
+    }
+
+
+def print_report(report):
+    print(f"{'route':<42}{'req':>7}{'err':>6}{'rps':>9}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(report["routes"].items())
+    if report["summary"]:
+        rows.append(("(all)", report["summary"]))
+    for route, stats in rows:
+        print(f"{route:<42}{stats['requests']:>7}{stats['errors']:>6}"
+              f"{stats['throughput_rps']:>9.1f}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+
+
+def wait_until_ready(url: str, processes, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for process in processes:
+            if process.poll() is not None:
+                raise SystemExit(f"[ERROR] 进程提前退出: {process.args}")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"[ERROR] 等待服务启动超时: {url}")
+
+
+def start_services(args) -> list:
+    """启动大模型替身与服务端, 返回进程列表。"""
+    stub_url = f"http://127.0.0.1:{args.stub_port}/chat/completions"
+    stub = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.stub_llm",
+        "--port", str(args.stub_port), "--latency", str(args.llm_latency),
+    ])
+    env = {
+        **os.environ,
+        "POSTGRES_DB": args.database,
+        # 压测请求都来自同一个客户端, 按客户端限流会拒绝大部分请求
+        "RATE_LIMIT_ENABLED": "0",
+        "DEEPSEEK_API_URL": stub_url, "DEEPSEEK_API_KEY": "stub",
+        "QWEN_API_URL": stub_url, "QWEN_API_KEY": "stub",
+    }
+    server = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--port", str(args.port), "--workers", str(args.workers),
+        "--log-level", "warning",
+    ], env=env)
+    processes = [stub, server]
+    try:
+        wait_until_ready(f"http://127.0.0.1:{args.stub_port}/docs",
+                         processes)
+        wait_until_ready(f"{args.base_url}/docs", processes)
+    except BaseException:
+        stop_services(processes)
+        raise
+    return processes
+
+
+def stop_services(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--mix", type=parse_mix, default="mixed",
+        help=f"预设 ({', '.join(MIXES)}) 或 操作=权重,... "
+             f"(操作: {', '.join(OPERATIONS)})")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="闭环客户端数 / 开环时的最大连接数")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="开环请求速率 (请求/秒), 0 为闭环")
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--warmup", type=float, default=10)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="JSON 结果文件 (默认只打印)")
+    parser.add_argument("--base-url",
+                        help="对已运行的服务压测, 不启动服务与替身")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="uvicorn worker 进程数")
+    parser.add_argument("--stub-port", type=int, default=8900)
+    parser.add_argument("--llm-latency", type=float, default=0.5,
+                        help="大模型替身每次回答的延迟 (秒)")
+    args = parser.parse_args()
+    args.external = bool(args.base_url)
+    if not args.external:
+        args.base_url = f"http://127.0.0.1:{args.port}"
+
+    processes = [] if args.external else start_services(args)
+    try:
+        recorder, ids = asyncio.run(run(args, args.mix))
+    finally:
+        stop_services(processes)
+
+    report = build_report(args, args.mix, recorder, ids)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[INFO] 结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
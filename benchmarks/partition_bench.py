@@ -0,0 +1,144 @@
+"""
+分区表 vs 普通表: 一周时间窗口查询延迟对比。
+
+在独立的 bench_partition schema 中生成两张结构相同的表 (默认 1000 万行,
+均匀分布在 --months 个月内), 分别查询随机的一周窗口并统计延迟。
+
+用法 (在项目根目录):
+    python -m benchmarks.partition_bench --rows 10000000 --months 24
+"""
+import argparse
+import datetime
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+
+from database import engine
+from partitioning import add_months, partition_name
+
+SCHEMA = "bench_partition"
+START = datetime.date(2023, 1, 1)
+
+WEEK_QUERY = (
+    "SELECT device_id, count(*), sum(energy_consumed) "
+    "FROM {table} WHERE start_time >= :low AND start_time < :high "
+    "GROUP BY device_id"
+)
+
+
+def setup(rows: int, months: int, chunk: int = 1_000_000):
+    end = add_months(START, months)
+    span = (end - START).total_seconds()
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        columns = (
+            "id bigint NOT NULL, user_id int, device_id int, "
+            "start_time timestamp NOT NULL, end_time timestamp, "
+            "energy_consumed float"
+        )
+        conn.execute(text(f"CREATE TABLE {SCHEMA}.plain ({columns})"))
+        conn.execute(text(
+            f"CREATE TABLE {SCHEMA}.part ({columns}) "
+            "PARTITION BY RANGE (start_time)"
+        ))
+        for i in range(months):
+            month = add_months(START, i)
+            conn.execute(text(
+                f"CREATE TABLE {SCHEMA}.{partition_name('part', month)} "
+                f"PARTITION OF {SCHEMA}.part FOR VALUES "
+                f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+            ))
+
+    for table in ("plain", "part"):
+        for low in range(0, rows, chunk):
+            high = min(rows, low + chunk)
+            # 按 id 顺序递增时间, 模拟追加写入的物理顺序
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"INSERT INTO {SCHEMA}.{table} "
+                    "SELECT g, g % 5000, g % 200, "
+                    "  CAST(:start AS timestamp) "
+                    "    + (g * :step) * interval '1 second', "
+                    "  CAST(:start AS timestamp) "
+                    "    + (g * :step + 1800) * interval '1 second', "
+                    "  (g % 97) / 10.0 "
+                    "FROM generate_series(CAST(:low AS bigint), "
+                    "                     CAST(:high AS bigint) - 1) g"
+                ), {"start": START, "step": span / rows,
+                    "low": low, "high": high})
+            print(f"[INFO] {table}: {high}/{rows} 行")
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE INDEX ON {SCHEMA}.{table} (start_time)"
+            ))
+            conn.execute(text(f"ANALYZE {SCHEMA}.{table}"))
+
+
+def run(months: int, repeat: int, seed: int):
+    rng = random.Random(seed)
+    total_days = (add_months(START, months) - START).days - 7
+    windows = [
+        START + datetime.timedelta(days=rng.randrange(total_days))
+        for _ in range(repeat)
+    ]
+    results = {}
+    with engine.connect() as conn:
+        for table in ("plain", "part"):
+            sql = text(WEEK_QUERY.format(table=f"{SCHEMA}.{table}"))
+            # 预热一次, 排除首次读盘的影响
+            conn.execute(sql, {"low": windows[0],
+                               "high": windows[0] + datetime.timedelta(7)})
+            timings = []
+            for low in windows:
+                params = {"low": low, "high": low + datetime.timedelta(7)}
+                began = time.perf_counter()
+                conn.execute(sql, params).all()
+                timings.append((time.perf_counter() - began) * 1000)
+            plan = conn.execute(
+                text("EXPLAIN " + sql.text), {
+                    "low": windows[0],
+                    "high": windows[0] + datetime.timedelta(7)}
+            ).scalars().all()
+            scanned = sum(
+                1 for line in plan if " on " in line and "Scan" in line)
+            timings.sort()
+            results[table] = {
+                "median_ms": statistics.median(timings),
+                "p95_ms": timings[int(len(timings) * 0.95) - 1],
+                "scanned_relations": scanned,
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--skip-setup", action="store_true", help="复用上次生成的数据"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="结束后保留 bench schema"
+    )
+    args = parser.parse_args()
+
+    if not args.skip_setup:
+        setup(args.rows, args.months)
+    results = run(args.months, args.repeat, args.seed)
+    print(f"\n一周窗口查询, {args.rows} 行, {args.months} 个月:")
+    print(f"{'表':<8}{'median(ms)':>12}{'p95(ms)':>12}{'扫描关系数':>12}")
+    for table, r in results.items():
+        print(f"{table:<8}{r['median_ms']:>12.2f}{r['p95_ms']:>12.2f}"
+              f"{r['scanned_relations']:>12}")
+    if not args.keep:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
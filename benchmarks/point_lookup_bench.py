@@ -0,0 +1,72 @@
+"""
+点查询的单次调用开销: 每次调用新建 Session (与一次请求相同), 统计墙钟时间
+与本进程 CPU 时间 (不含等待数据库的时间), 并换算为 10k 次/秒 时所需的 CPU 核数。
+
+用法 (在项目根目录, 数据库中需已有数据):
+    python -m benchmarks.point_lookup_bench --calls 10000
+    POSTGRES_DRIVER=psycopg python -m benchmarks.point_lookup_bench
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+
+import crud
+from database import POSTGRES_DRIVER, SessionLocal, engine
+
+LOOKUPS = {
+    "get_user": (crud.get_user, "users"),
+    "get_device": (crud.get_device, "devices"),
+    "get_device_usage": (crud.get_device_usage, "device_usages"),
+    "get_security_event": (crud.get_security_event, "security_events"),
+    "get_feedback": (crud.get_feedback, "feedbacks"),
+}
+
+TARGET_RATE = 10000
+
+
+def id_range(table: str):
+    with engine.connect() as conn:
+        return conn.execute(
+            text(f"SELECT min(id), max(id) FROM {table}")).one()
+
+
+def run(func, ids):
+    walls = []
+    cpu_began = time.process_time()
+    for row_id in ids:
+        began = time.perf_counter()
+        with SessionLocal() as db:
+            func(db, row_id)
+        walls.append(time.perf_counter() - began)
+    cpu = time.process_time() - cpu_began
+    return walls, cpu / len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"driver: {POSTGRES_DRIVER}")
+    print(f"{'lookup':<22}{'p50 us':>9}{'mean us':>9}{'cpu us':>9}"
+          f"{'cores@10k/s':>13}")
+    for name, (func, table) in LOOKUPS.items():
+        low, high = id_range(table)
+        if low is None:
+            print(f"{name:<22}  (无数据)")
+            continue
+        ids = [rng.randint(low, high) for _ in range(args.calls)]
+        run(func, ids[:200])  # 预热连接池与编译缓存
+        walls, cpu = run(func, ids)
+        print(f"{name:<22}{statistics.median(walls) * 1e6:>9.0f}"
+              f"{statistics.mean(walls) * 1e6:>9.0f}{cpu * 1e6:>9.0f}"
+              f"{cpu * TARGET_RATE:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
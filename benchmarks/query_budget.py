@@ -0,0 +1,76 @@
+"""
+每个请求的 SQL 语句数检查: 超出预算 (出现 N+1 懒加载) 时以非零状态退出。
+
+预算与返回的行数无关, 由响应模型中嵌套的关系决定, 例如 UserOut 包含
+usages / events / feedbacks 及其 device: 1 条查询用户, 另外 3 条
+selectin 查询各自 JOIN 设备, 共 4 条语句。每个读取接口另有 1 条
+读取表版本 (计算 ETag, 见 etag.py) 的查询。
+
+用法 (在项目根目录, 数据库中需已有数据):
+    python -m benchmarks.query_budget
+"""
+import sys
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import main
+from database import engine
+from query_counter import count_queries
+
+# 路径模板 -> 每个请求允许的最大 SQL 语句数
+BUDGETS = {
+    "/users/?limit=100": 5,
+    "/users/{users}": 5,
+    "/rooms/?limit=100": 3,
+    "/rooms/{rooms}": 3,
+    "/devices/?limit=100": 2,
+    "/devices/{devices}": 2,
+    "/device_usages/?limit=100": 2,
+    "/device_usages/{device_usages}": 2,
+    "/security_events/?limit=100": 2,
+    "/security_events/{security_events}": 2,
+    "/feedbacks/?limit=100": 2,
+    "/feedbacks/{feedbacks}": 2,
+}
+
+
+def sample_ids() -> dict:
+    """每张表取一个存在的 id, 用于填充单条查询的路径。"""
+    ids = {}
+    with engine.connect() as conn:
+        for table in ("users", "rooms", "devices", "device_usages",
+                      "security_events", "feedbacks"):
+            ids[table] = conn.execute(
+                text(f"SELECT min(id) FROM {table}")).scalar()
+    return ids
+
+
+def main_():
+    ids = sample_ids()
+    failed = False
+    with TestClient(main.app) as client:
+        # 预热连接池, 避免把首次连接时的方言探测语句计入
+        client.get("/users/?limit=1")
+        print(f"{'endpoint':<40}{'status':>7}{'queries':>9}{'budget':>8}")
+        for template, budget in BUDGETS.items():
+            if any(ids[t] is None for t in ids if "{" + t + "}" in template):
+                print(f"{template:<40}  (无数据, 跳过)")
+                continue
+            path = template.format(**ids)
+            with count_queries(engine) as counter:
+                response = client.get(path)
+            mark = ""
+            if counter.count > budget:
+                failed = True
+                mark = "  <-- 超出预算"
+            print(f"{path:<40}{response.status_code:>7}"
+                  f"{counter.count:>9}{budget:>8}{mark}")
+    if failed:
+        print("[FAIL] 存在超出 SQL 语句预算的接口 (可能是 N+1 懒加载)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_())
@@ -0,0 +1,187 @@
+"""
+压测数据库: 在独立的数据库 (默认 smart_home_bench) 中建表并生成确定的数据。
+
+数据完全在数据库内由 generate_series 生成 (setseed 固定随机序列), 同样的参数
+每次生成相同的数据, 两次压测的结果因此可以比较:
+  users      --users 个, 每个用户 3 个房间, 每个房间 2 个设备
+  usages     --usages 条, 用户与设备均匀分布, 开始时间均匀分布在
+             END 之前的 --days 天内, 时长 5 ~ 120 分钟
+  events     --events 条安防事件, feedbacks --feedbacks 条反馈
+已有的同名数据库会被清空后重新生成。
+
+用法 (在项目根目录):
+    python -m benchmarks.seed --users 1000 --usages 2000000
+"""
+import argparse
+import datetime
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+import etag
+import invalidation
+import models
+from database import SQLALCHEMY_DATABASE_URL
+
+DEFAULT_DATABASE = "smart_home_bench"
+# 数据的截止时间 (固定, 不随运行时间变化)
+END = datetime.datetime(2024, 7, 1)
+ROOMS_PER_USER = 3
+DEVICES_PER_ROOM = 2
+CHUNK_ROWS = 1_000_000
+
+DEVICE_TYPES = [
+    "空调", "灯", "电视", "冰箱", "洗衣机", "热水器", "摄像头", "门锁",
+]
+ROOM_NAMES = ["客厅", "卧室", "厨房", "书房", "卫生间"]
+
+TABLES = (
+    "feedbacks", "security_events", "device_usages", "devices", "rooms",
+    "users",
+)
+
+
+def database_url(name: str):
+    return make_url(SQLALCHEMY_DATABASE_URL).set(database=name)
+
+
+def create_database(name: str):
+    """数据库不存在时创建。"""
+    admin = create_engine(database_url("postgres"),
+                          isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM pg_database WHERE datname = :name"),
+            {"name": name}
+        ).scalar()
+        if not exists:
+            conn.execute(text(f'CREATE DATABASE "{name}"'))
+    admin.dispose()
+
+
+def _pick(values) -> str:
+    """从 SQL 数组中随机取一个元素的表达式。"""
+    array = ", ".join(f"'{v}'" for v in values)
+    return f"(ARRAY[{array}])[1 + floor(random() * {len(values)})::int]"
+
+
+def _random_time(days: int) -> str:
+    return (f"TIMESTAMP '{END:%Y-%m-%d %H:%M:%S}' "
+            f"- random() * interval '{days} days'")
+
+
+def _insert_chunks(conn, label: str, total: int, sql: str, **params):
+    began = time.perf_counter()
+    for low in range(1, total + 1, CHUNK_ROWS):
+        high = min(total, low + CHUNK_ROWS - 1)
+        conn.execute(text(sql), {"low": low, "high": high, **params})
+        print(f"[INFO] {label}: {high}/{total} "
+              f"({time.perf_counter() - began:.1f}s)")
+
+
+def seed(engine, users: int, usages: int, events: int, feedbacks: int,
+         days: int, seed_value: float):
+    rooms = users * ROOMS_PER_USER
+    devices = rooms * DEVICES_PER_ROOM
+    models.Base.metadata.create_all(bind=engine)
+    etag.install_version_triggers(engine)
+    invalidation.install_triggers(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE"
+        ))
+        conn.execute(text("SELECT setseed(:seed)"), {"seed": seed_value})
+        _insert_chunks(conn, "users", users, """
+            INSERT INTO users (name, house_area)
+            SELECT 'user' || i, round((40 + random() * 160)::numeric, 1)
+            FROM generate_series(:low, :high) AS i
+        """)
+        _insert_chunks(conn, "rooms", rooms, f"""
+            INSERT INTO rooms (name)
+            SELECT {_pick(ROOM_NAMES)} || i
+            FROM generate_series(:low, :high) AS i
+        """)
+        _insert_chunks(conn, "devices", devices, f"""
+            INSERT INTO devices (name, type, room_id)
+            SELECT 'device' || i, {_pick(DEVICE_TYPES)},
+                   (i - 1) / {DEVICES_PER_ROOM} + 1
+            FROM generate_series(:low, :high) AS i
+        """)
+        _insert_chunks(conn, "device_usages", usages, f"""
+            INSERT INTO device_usages (
+                user_id, device_id, start_time, end_time, usage_type,
+                energy_consumed, device_type, user_name)
+            SELECT s.user_id, s.device_id, s.start_time,
+                   s.start_time + s.minutes * interval '1 minute',
+                   s.usage_type, round((s.minutes / 60 * 1.5)::numeric, 3),
+                   d.type, u.name
+            FROM (
+                SELECT i,
+                       1 + floor(random() * :users)::int AS user_id,
+                       1 + floor(random() * :devices)::int AS device_id,
+                       {_random_time(days)} AS start_time,
+                       5 + random() * 115 AS minutes,
+                       {_pick(["manual", "auto", "schedule"])} AS usage_type
+                FROM generate_series(:low, :high) AS i
+            ) s
+            JOIN users u ON u.id = s.user_id
+            JOIN devices d ON d.id = s.device_id
+            ORDER BY s.i
+        """, users=users, devices=devices)
+        _insert_chunks(conn, "security_events", events, f"""
+            INSERT INTO security_events (
+                user_id, device_id, event_type, event_level, location,
+                status, timestamp)
+            SELECT 1 + floor(random() * :users)::int,
+                   1 + floor(random() * :devices)::int,
+                   {_pick(["motion", "door_open", "smoke", "intrusion"])},
+                   {_pick(["low", "medium", "high"])},
+                   {_pick(ROOM_NAMES)},
+                   {_pick(["open", "resolved"])},
+                   {_random_time(days)}
+            FROM generate_series(:low, :high) AS i
+        """, users=users, devices=devices)
+        _insert_chunks(conn, "feedbacks", feedbacks, f"""
+            INSERT INTO feedbacks (
+                user_id, content, feedback_type, status, device_id,
+                timestamp)
+            SELECT 1 + floor(random() * :users)::int,
+                   'feedback ' || i,
+                   {_pick(["bug", "suggestion", "praise"])},
+                   {_pick(["open", "closed"])},
+                   1 + floor(random() * :devices)::int,
+                   {_random_time(days)}
+            FROM generate_series(:low, :high) AS i
+        """, users=users, devices=devices)
+
+    with engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT") as conn:
+        for table in TABLES:
+            conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--usages", type=int, default=2_000_000)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--feedbacks", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--seed", type=float, default=0.42,
+                        help="随机种子 (-1 ~ 1)")
+    args = parser.parse_args()
+
+    create_database(args.database)
+    engine = create_engine(database_url(args.database))
+    began = time.perf_counter()
+    seed(engine, args.users, args.usages, args.events, args.feedbacks,
+         args.days, args.seed)
+    print(f"[INFO] 数据库 {args.database} 已生成, "
+          f"用时 {time.perf_counter() - began:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+列表接口序列化吞吐: ORM 实体 + pydantic 校验 + 标准库 json (原路径)
+对比 列元组 + orjson (快速路径), 单位为 行/秒。
+
+两条路径都在进程内直接调用 crud 与编码函数 (不含 HTTP 开销),
+并校验两者输出的 JSON 内容一致。
+
+用法 (在项目根目录, 数据库中需已有数据):
+    python -m benchmarks.serialization_bench --limit 1000 --repeat 20
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import crud
+import schemas
+from database import SessionLocal
+from fast_response import FastJSONResponse
+
+ENDPOINTS = {
+    "/devices/": (
+        crud.get_devices, crud.get_device_rows, schemas.DeviceOut),
+    "/device_usages/": (
+        crud.get_device_usages, crud.get_device_usage_rows,
+        schemas.DeviceUsage),
+    "/security_events/": (
+        crud.get_security_events, crud.get_security_event_rows,
+        schemas.SecurityEvent),
+    "/feedbacks/": (
+        crud.get_feedbacks, crud.get_feedback_rows, schemas.Feedback),
+}
+
+
+def orm_path(db, get_entities, schema, limit):
+    adapter = TypeAdapter(list[schema])
+    entities = get_entities(db, skip=0, limit=limit)
+    validated = adapter.validate_python(entities, from_attributes=True)
+    return json.dumps(
+        jsonable_encoder(validated), ensure_ascii=False,
+        separators=(",", ":")
+    ).encode("utf-8"), len(entities)
+
+
+def fast_path(db, get_rows, limit):
+    rows = get_rows(db, skip=0, limit=limit)
+    return FastJSONResponse(rows).body, len(rows)
+
+
+def measure(func, repeat):
+    best = None
+    count = 0
+    for _ in range(repeat):
+        began = time.perf_counter()
+        _, count = func()
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<20}{'rows':>6}{'orm rows/s':>14}"
+          f"{'fast rows/s':>14}{'speedup':>9}")
+    with SessionLocal() as db:
+        for path, (get_entities, get_rows, schema) in ENDPOINTS.items():
+            old_body, _ = orm_path(db, get_entities, schema, args.limit)
+            db.expunge_all()
+            new_body, _ = fast_path(db, get_rows, args.limit)
+            if json.loads(old_body) != json.loads(new_body):
+                print(f"[WARN] {path}: 快速路径输出与原路径不一致")
+
+            def run_orm():
+                db.expunge_all()
+                return orm_path(db, get_entities, schema, args.limit)
+
+            rows, old = measure(run_orm, args.repeat)
+            _, new = measure(
+                lambda: fast_path(db, get_rows, args.limit), args.repeat)
+            if not rows:
+                print(f"{path:<20}{0:>6}  (无数据)")
+                continue
+            print(f"{path:<20}{rows:>6}{rows / old:>14.0f}"
+                  f"{rows / new:>14.0f}{old / new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
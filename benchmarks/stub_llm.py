@@ -0,0 +1,58 @@
+"""
+压测用的大模型接口替身 (OpenAI 兼容的 /chat/completions)。
+
+等待 --latency 秒 (模拟模型推理时间) 后返回一条包含 SELECT 的回答, 使
+/nlp/query/ 走完整的路径 (调用模型 -> 提取 SQL -> 查询数据库)。
+启动服务端时把 DEEPSEEK_API_URL / QWEN_API_URL 指向本服务。
+
+用法 (在项目根目录):
+    python -m benchmarks.stub_llm --port 8900 --latency 0.5
+"""
+import argparse
+import asyncio
+import itertools
+
+import uvicorn
+from fastapi import FastAPI
+
+ANSWERS = [
+    "各类设备的使用次数:\n```sql\nSELECT device_type, count(*) AS usages "
+    "FROM device_usages GROUP BY device_type ORDER BY usages DESC;\n```",
+    "最近的安防事件:\n```sql\nSELECT id, event_type, event_level, timestamp "
+    "FROM security_events ORDER BY timestamp DESC LIMIT 20;\n```",
+]
+
+app = FastAPI()
+app.state.latency = 0.5
+_counter = itertools.count()
+
+
+@app.post("/chat/completions")
+async def chat_completions(payload: dict):
+    await asyncio.sleep(app.state.latency)
+    answer = ANSWERS[next(_counter) % len(ANSWERS)]
+    return {
+        "id": "stub",
+        "object": "chat.completion",
+        "model": payload.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": answer},
+            "finish_reason": "stop",
+        }],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5,
+                        help="每次回答前等待的秒数")
+    args = parser.parse_args()
+    app.state.latency = args.latency
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
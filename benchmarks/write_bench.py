@@ -0,0 +1,102 @@
+"""
+写接口的数据库往返次数与延迟 (p50 / p99)。
+
+每一轮依次创建 用户 -> 房间 -> 设备 -> 使用记录 / 安防事件 / 反馈,
+更新 (PUT) 该用户, 再按相反顺序删除, 因此不会在数据库中留下数据。
+往返次数 = SQL 语句数 + COMMIT 数 (驱动隐式发出的 BEGIN 不计入)。
+
+用法 (在项目根目录):
+    python -m benchmarks.write_bench --rounds 200
+"""
+import argparse
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from database import engine
+from query_counter import count_queries
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self, client):
+        self.client = client
+        self.results = {}
+
+    def call(self, label, method, path, **kwargs):
+        with count_queries(engine) as counter:
+            began = time.perf_counter()
+            response = self.client.request(method, path, **kwargs)
+            elapsed = time.perf_counter() - began
+        response.raise_for_status()
+        latencies, trips = self.results.setdefault(label, ([], []))
+        latencies.append(elapsed * 1000)
+        trips.append(counter.round_trips)
+        return response.json()
+
+
+def run_round(rec: Recorder, i: int):
+    user = rec.call("POST /users/", "POST", "/users/",
+                    json={"name": f"bench-{i}", "house_area": 80.0})
+    room = rec.call("POST /rooms/", "POST", "/rooms/",
+                    json={"name": f"bench-room-{i}"})
+    device = rec.call("POST /devices/", "POST", "/devices/", json={
+        "name": f"bench-device-{i}", "type": "light", "room_id": room["id"]
+    })
+    usage = rec.call("POST /device_usages/", "POST", "/device_usages/", json={
+        "user_id": user["id"], "device_id": device["id"],
+        "start_time": "2024-06-01T08:00:00",
+        "end_time": "2024-06-01T09:00:00", "energy_consumed": 0.5,
+    })
+    event = rec.call(
+        "POST /security_events/", "POST", "/security_events/", json={
+            "user_id": user["id"], "device_id": device["id"],
+            "event_type": "motion", "timestamp": "2024-06-01T08:30:00",
+        })
+    feedback = rec.call("POST /feedbacks/", "POST", "/feedbacks/", json={
+        "user_id": user["id"], "device_id": device["id"],
+        "content": "ok", "timestamp": "2024-06-01T10:00:00",
+    })
+    rec.call("PUT /users/{id}", "PUT", f"/users/{user['id']}",
+             json={"name": f"bench-{i}-renamed", "house_area": 90.0})
+    rec.call("DELETE /feedbacks/{id}", "DELETE",
+             f"/feedbacks/{feedback['id']}")
+    rec.call("DELETE /security_events/{id}", "DELETE",
+             f"/security_events/{event['id']}")
+    rec.call("DELETE /device_usages/{id}", "DELETE",
+             f"/device_usages/{usage['id']}")
+    rec.call("DELETE /devices/{id}", "DELETE", f"/devices/{device['id']}")
+    rec.call("DELETE /rooms/{id}", "DELETE", f"/rooms/{room['id']}")
+    rec.call("DELETE /users/{id}", "DELETE", f"/users/{user['id']}")
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    args = parser.parse_args()
+
+    with TestClient(main.app) as client:
+        warmup = Recorder(client)
+        for i in range(args.warmup):
+            run_round(warmup, i)
+        rec = Recorder(client)
+        for i in range(args.rounds):
+            run_round(rec, i)
+
+    print(f"{'endpoint':<32}{'round-trips':>12}{'p50 ms':>9}{'p99 ms':>9}")
+    for label, (latencies, trips) in rec.results.items():
+        print(f"{label:<32}{statistics.median(trips):>12.0f}"
+              f"{percentile(latencies, 50):>9.2f}"
+              f"{percentile(latencies, 99):>9.2f}")
+
+
+if __name__ == "__main__":
+    main_()
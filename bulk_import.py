@@ -0,0 +1,203 @@
+"""
+命令行客户端的批量导入: python client_cli.py import <文件> --type <类型>
+
+- 文件按行流式读取 (CSV 首行为列名, 或 NDJSON 每行一个 JSON 对象),
+  不会整体读入内存; 每 batch_size 行组成一批, 发送到服务端的 /<表>/bulk
+- 同时最多有 in_flight 批请求在途 (流水线), 不必等上一批返回再发下一批
+- 每批确认后写入检查点文件 (<文件>.import-checkpoint.json), 记录已确认的批号;
+  失败后重新执行同一命令, 会跳过已确认的批次继续导入
+- 已发出但未收到确认的批次 (如服务端已提交而响应丢失) 在续传时会重新发送
+- 不支持指定主键: 新记录的 id 一律由服务端分配, 文件中含有非空 id 列时
+  拒绝导入 (ValueError), 以免其它文件中按原 id 引用的 user_id / device_id
+  等悄悄指向错误的记录; 有关联的数据需按服务端分配的 id 改写后再导入
+"""
+import codecs
+import csv
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# 导入类型 -> 服务端批量写入接口
+IMPORT_ENDPOINTS = {
+    "users": "/users/bulk",
+    "rooms": "/rooms/bulk",
+    "devices": "/devices/bulk",
+    "usages": "/device_usages/bulk",
+    "events": "/security_events/bulk",
+    "feedbacks": "/feedbacks/bulk",
+}
+
+
+class BatchRejected(Exception):
+    """某一批被服务端拒绝 (数据错误等, 重试无意义)。"""
+
+
+def _detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    return "ndjson" if ext in (".ndjson", ".jsonl", ".json") else "csv"
+
+
+def _lines(f, progress):
+    """逐行解码二进制文件, 同时通过 progress(已读字节数) 报告进度。"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    done = 0
+    for raw in f:
+        done += len(raw)
+        progress(done)
+        yield decoder.decode(raw)
+
+
+def read_records(path: str, fmt: str, progress=lambda done: None):
+    """逐条读取记录 (dict); CSV 的空字段视为未填写 (None)。"""
+    with open(path, "rb") as f:
+        lines = _lines(f, progress)
+        if fmt == "ndjson":
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for row in csv.DictReader(lines):
+                yield {k: (v if v != "" else None) for k, v in row.items()}
+
+
+def _reject_ids(records):
+    """逐条检查记录, 遇到非空 id 时抛出 ValueError (在发送该记录所在批之前)。"""
+    for number, record in enumerate(records, 1):
+        if record.get("id") is not None:
+            raise ValueError(
+                f"第 {number} 条记录含有 id 列: 导入不支持指定主键, "
+                "id 由服务端分配, 请删除该列 (关联数据需改用新的 id)"
+            )
+        yield record
+
+
+def batches(records, batch_size: int):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoint:
+    """已确认批号的检查点, 与导入的文件、类型和批大小对应。"""
+
+    def __init__(self, path: str, kind: str, batch_size: int):
+        self.file = path + ".import-checkpoint.json"
+        self.key = {"path": os.path.abspath(path), "type": kind,
+                    "batch_size": batch_size}
+        self.acked = set()
+        self.rows = 0
+
+    def load(self) -> bool:
+        """读取匹配的检查点, 返回是否存在。"""
+        try:
+            with open(self.file, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("key") != self.key:
+            return False
+        self.acked = set(data.get("acked", []))
+        self.rows = data.get("rows", 0)
+        return True
+
+    def ack(self, index: int, rows: int):
+        self.acked.add(index)
+        self.rows += rows
+        tmp = self.file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "acked": sorted(self.acked),
+                       "rows": self.rows}, f)
+        os.replace(tmp, self.file)
+
+    def remove(self):
+        try:
+            os.remove(self.file)
+        except OSError:
+            pass
+
+
+def _send(api, endpoint: str, batch: list):
+    resp = api.post(endpoint, json=batch, timeout=(3.05, 300))
+    if 400 <= resp.status_code < 500 and resp.status_code != 429:
+        raise BatchRejected(f"HTTP {resp.status_code}: {resp.text[:500]}")
+    resp.raise_for_status()
+    return resp.json().get("created", len(batch))
+
+
+def import_file(api, path: str, kind: str, fmt: str = None,
+                batch_size: int = 1000, in_flight: int = 4,
+                restart: bool = False, on_progress=None, on_batch=None):
+    """
+    导入文件, 返回 (本次导入行数, 跳过的已确认行数), 行数均为服务端确认写入的行数。
+    on_progress(已读字节数, 文件总字节数); on_batch(批号, 写入行数)。
+    失败时抛出异常, 已确认的批次保存在检查点中。
+    """
+    endpoint = IMPORT_ENDPOINTS[kind]
+    fmt = fmt or _detect_format(path)
+    total_bytes = os.path.getsize(path)
+    checkpoint = Checkpoint(path, kind, batch_size)
+    if restart:
+        checkpoint.remove()
+    resumed = checkpoint.load()
+    skipped = checkpoint.rows if resumed else 0
+
+    def progress(done):
+        if on_progress:
+            on_progress(done, total_bytes)
+
+    imported = 0
+    pending = {}
+    with ThreadPoolExecutor(max_workers=in_flight) as pool:
+        try:
+            for index, batch in enumerate(batches(
+                    _reject_ids(read_records(path, fmt, progress)),
+                    batch_size)):
+                if index in checkpoint.acked:
+                    continue
+                # 在途请求达到上限时等待其中一批完成, 读取文件也随之暂停
+                while len(pending) >= in_flight:
+                    imported += _collect(pending, checkpoint, on_batch)
+                future = pool.submit(_send, api, endpoint, batch)
+                pending[future] = index
+            while pending:
+                imported += _collect(pending, checkpoint, on_batch)
+        except BaseException:
+            # 等待已发出的请求结束并记录其结果, 再抛出第一个错误
+            for future in list(pending):
+                future.cancel()
+            done, _ = wait(pending)
+            for future in done:
+                if not future.cancelled() and future.exception() is None:
+                    index, rows = pending[future], future.result()
+                    checkpoint.ack(index, rows)
+                    imported += rows
+                    if on_batch:
+                        on_batch(index, rows)
+            raise
+    checkpoint.remove()
+    return imported, skipped
+
+
+def _collect(pending: dict, checkpoint: Checkpoint, on_batch) -> int:
+    """等待至少一批完成, 记录成功的批次; 有失败的批次时抛出其异常。"""
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    rows_done, error = 0, None
+    for future in done:
+        index = pending.pop(future)
+        if future.exception() is not None:
+            error = error or future.exception()
+            continue
+        # 以服务端返回的写入行数为准
+        rows = future.result()
+        checkpoint.ack(index, rows)
+        rows_done += rows
+        if on_batch:
+            on_batch(index, rows)
+    if error is not None:
+        raise error
+    return rows_done
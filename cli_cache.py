@@ -0,0 +1,188 @@
+"""
+命令行客户端的本地响应缓存 (SQLite), 按 URL 缓存 GET 接口的响应。
+
+- 再次请求同一 URL 时带上 If-None-Match, 服务端返回 304 时直接使用缓存,
+  不再传输 (分析接口也不再重新绘图)
+- 无法连接服务端时返回缓存的响应 (离线模式), 并标记为离线与缓存时间
+- 缓存总大小超过 SMARTHOME_CACHE_MAX_MB (默认 100) 时删除最久未使用的条目
+
+每次操作打开独立的连接, 可以在后台线程中使用 (如刷新 SQL 补全的 schema)。
+"""
+import json
+import os
+import sqlite3
+import time
+from urllib.parse import urlencode
+
+import requests
+
+# 客户端本地缓存目录 (响应缓存、字体路径等)
+CACHE_DIR = os.getenv(
+    "SMARTHOME_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "smarthome_cli")
+)
+CACHE_DB = os.path.join(CACHE_DIR, "responses.sqlite3")
+CACHE_MAX_BYTES = int(
+    float(os.getenv("SMARTHOME_CACHE_MAX_MB", "100")) * 1024 * 1024
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    content_type TEXT NOT NULL,
+    body BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL
+)
+"""
+
+
+class CachedResponse:
+    """
+    GET 请求的结果, 来自服务端或本地缓存。
+    offline 为 True 表示服务端不可达, 内容为 fetched_at 时缓存的旧结果。
+    """
+
+    def __init__(self, url, status_code, content_type, content, fetched_at,
+                 offline=False):
+        self.url = url
+        self.status_code = status_code
+        self.content_type = content_type
+        self.content = content
+        self.fetched_at = fetched_at
+        self.offline = offline
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ResponseCache:
+    def __init__(self, path: str = CACHE_DB, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            self._initialized = True
+        return conn
+
+    @staticmethod
+    def key(api, path: str, params=None) -> str:
+        """缓存键: 服务端地址 + 路径 + 排序后的查询参数。"""
+        url = api.base_url + path
+        if params:
+            url += "?" + urlencode(sorted(params.items()))
+        return url
+
+    def _lookup(self, url: str):
+        """(etag, content_type, body, fetched_at) 或 None。"""
+        try:
+            conn = self._connect()
+            with conn:
+                row = conn.execute(
+                    "SELECT etag, content_type, body, fetched_at "
+                    "FROM responses WHERE url = ?", (url,)
+                ).fetchone()
+            conn.close()
+        except sqlite3.Error:
+            return None
+        return row
+
+    def peek(self, url: str):
+        """只读缓存, 不访问网络; 没有缓存时返回 None。"""
+        entry = self._lookup(url)
+        if entry is None:
+            return None
+        return CachedResponse(url, 200, entry[1], entry[2], entry[3])
+
+    def get(self, api, path: str, params=None, **kwargs) -> CachedResponse:
+        """
+        带缓存的 GET。只缓存 200 响应; 其它状态码抛出 requests.HTTPError。
+        连接失败或超时且有缓存时返回离线结果, 否则抛出原异常。
+        """
+        url = self.key(api, path, params)
+        entry = self._lookup(url)
+        headers = {"If-None-Match": entry[0]} if entry and entry[0] else {}
+        try:
+            resp = api.get(path, params=params, headers=headers, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if entry is None:
+                raise
+            return CachedResponse(url, 200, entry[1], entry[2], entry[3],
+                                  offline=True)
+
+        now = time.time()
+        if resp.status_code == 304 and entry is not None:
+            self._execute(
+                "UPDATE responses SET fetched_at = ?, used_at = ? "
+                "WHERE url = ?", (now, now, url)
+            )
+            return CachedResponse(url, 200, entry[1], entry[2], now)
+        resp.raise_for_status()
+
+        content_type = resp.headers.get("content-type", "")
+        if resp.status_code == 200:
+            self._store(url, resp.headers.get("ETag"), content_type,
+                        resp.content, now)
+        return CachedResponse(url, resp.status_code, content_type,
+                              resp.content, now)
+
+    def _execute(self, sql: str, params=()):
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(sql, params)
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _store(self, url, etag, content_type, body, now):
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(url, etag, content_type, body, fetched_at, used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, etag, content_type, body, now, now)
+                )
+                self._evict(conn)
+            conn.close()
+        except sqlite3.Error:
+            # 缓存只是加速与离线浏览, 写入失败不影响本次请求
+            pass
+
+    def _evict(self, conn):
+        total = conn.execute(
+            "SELECT coalesce(sum(length(body)), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in conn.execute(
+            "SELECT url, length(body) FROM responses ORDER BY used_at"
+        ).fetchall():
+            conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def entries(self) -> list:
+        """所有缓存条目 (url, content_type, 字节数, fetched_at), 最近的在前。"""
+        try:
+            conn = self._connect()
+        except sqlite3.Error:
+            return []
+        with conn:
+            rows = conn.execute(
+                "SELECT url, content_type, length(body), fetched_at "
+                "FROM responses ORDER BY fetched_at DESC"
+            ).fetchall()
+        conn.close()
+        return rows
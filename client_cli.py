@@ -1,30 +1,63 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
 import requests
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib import font_manager
-from matplotlib.font_manager import FontProperties
+from typing import TYPE_CHECKING
 
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 from rich.prompt import Prompt
 
-# Import for autocompletion
-from prompt_toolkit import PromptSession
-from prompt_toolkit.completion import Completer, Completion
-from prompt_toolkit.document import Document
+from api_client import ApiClient, DEFAULT_BASE_URL
+from cli_cache import CACHE_DIR, ResponseCache
+
+# pandas / matplotlib / prompt_toolkit 导入耗时较长, 只在用到的功能里导入,
+# 启动时不导入, 也不访问网络, 菜单可以立即出现
+if TYPE_CHECKING:
+    import pandas as pd
 
 console = Console()
-BASE_URL = "http://127.0.0.1:8000"
+# 所有请求共用同一个客户端 (连接池 + 超时 + 重试); 服务端地址:
+# 命令行参数 --base-url > 环境变量 SMARTHOME_API_URL > 默认值
+api = ApiClient(DEFAULT_BASE_URL)
+
+# GET 接口的本地缓存 (ETag 重新验证, 服务端不可达时离线显示), 见 cli_cache
+cache = ResponseCache()
+
+FONT_CACHE_FILE = os.path.join(CACHE_DIR, "font_path")
+CHINESE_FONTS = ['SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS']
+SIMHEI_URL = 'https://github.com/owent-utils/font/raw/master/simhei.ttf'
+
+SCHEMA_PATH = "/api/schema_for_completion"
+
+_plt = None
+
+
+def _find_chinese_font(font_manager) -> str:
+    """
+    中文字体文件路径: 优先使用磁盘上缓存的结果; 否则在系统字体中查找,
+    仍未找到时下载 SimHei.ttf。结果写入缓存, 之后不再扫描字体列表。
+    """
+    try:
+        with open(FONT_CACHE_FILE, encoding="utf-8") as f:
+            cached = f.read().strip()
+        if os.path.exists(cached):
+            return cached
+    except OSError:
+        pass
 
-# --- 中文字体配置 (与analysis.py保持一致) ---
-try:
     font_path = None
-    font_list = ['SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS']
-    for font in font_list:
+    for font in CHINESE_FONTS:
         for f in font_manager.fontManager.ttflist:
             if font == f.name:
                 font_path = f.fname
@@ -32,27 +65,68 @@ try:
         if font_path:
             break
     if not font_path:
+        font_path = os.path.join(os.path.dirname(__file__), 'simhei.ttf')
+    if not os.path.exists(font_path):
         console.print(
             "[yellow]未找到中文字体, 正在尝试下载 SimHei.ttf...[/yellow]"
         )
-        simhei_url = (
-            'https://github.com/owent-utils/font/raw/master/simhei.ttf'
-        )
-        font_path = os.path.join(os.path.dirname(__file__), 'simhei.ttf')
-        if not os.path.exists(font_path):
-            r = requests.get(simhei_url)
-            with open(font_path, 'wb') as f:
-                f.write(r.content)
-        # 将新字体添加到matplotlib的字体管理器
-        font_manager.fontManager.addfont(font_path)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        font_path = os.path.join(CACHE_DIR, 'simhei.ttf')
+        r = requests.get(SIMHEI_URL, timeout=60)
+        r.raise_for_status()
+        with open(font_path, 'wb') as f:
+            f.write(r.content)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(FONT_CACHE_FILE, "w", encoding="utf-8") as f:
+        f.write(font_path)
+    return font_path
+
+
+def pyplot():
+    """导入 matplotlib.pyplot 并配置中文字体 (只在第一次绘图时执行)。"""
+    global _plt
+    if _plt is not None:
+        return _plt
+    import matplotlib.pyplot as plt
+    from matplotlib import font_manager
+    from matplotlib.font_manager import FontProperties
 
-    font_prop = FontProperties(fname=font_path)
-    plt.rcParams['font.sans-serif'] = [font_prop.get_name()]
-    plt.rcParams['axes.unicode_minus'] = False
-except Exception as e:
-    console.print(f"[bold red]加载中文字体失败: {e}[/bold red]")
-    console.print("[yellow]图表中的中文可能无法正常显示。[/yellow]")
-# --- 字体配置结束 ---
+    try:
+        font_path = _find_chinese_font(font_manager)
+        # 将字体添加到matplotlib的字体管理器 (系统字体重复添加无影响)
+        font_manager.fontManager.addfont(font_path)
+        font_prop = FontProperties(fname=font_path)
+        plt.rcParams['font.sans-serif'] = [font_prop.get_name()]
+        plt.rcParams['axes.unicode_minus'] = False
+    except Exception as e:
+        console.print(f"[bold red]加载中文字体失败: {e}[/bold red]")
+        console.print("[yellow]图表中的中文可能无法正常显示。[/yellow]")
+    _plt = plt
+    return plt
+
+
+# 表格分页: 每页行数 (0 表示按终端高度), 列宽按前若干行估计
+PAGE_SIZE = int(os.getenv("SMARTHOME_PAGE_SIZE", "0"))
+COLUMN_SAMPLE_ROWS = 200
+MAX_COLUMN_WIDTH = 40
+# 流式 SQL 结果先完整接收到本地再分页, 超过该字节数时写入临时文件
+STREAM_SPOOL_BYTES = 16 * 1024 * 1024
+
+# "生成全部分析报告" 并发请求的线程数
+REPORT_WORKERS = int(os.getenv("SMARTHOME_REPORT_WORKERS", "4"))
+# 被服务端限流 (429) 时, 单个报告最多等待的秒数
+REPORT_DEADLINE_SECONDS = 300
+ANALYSIS_REPORTS = [
+    ("device_usage_frequency", "设备使用频率分析"),
+    ("user_habits", "用户习惯分析"),
+    ("area_impact", "房屋面积影响分析"),
+    ("device_type_usage", "各设备类型使用次数"),
+    ("room_energy", "各房间设备总能耗"),
+    ("user_activity", "用户活跃度排行"),
+    ("room_event_count", "各房间安防事件数"),
+    ("daily_device_usage", "每日设备使用趋势"),
+]
 
 # 颜色代码
 MAGENTA = '\033[95m'
@@ -106,6 +180,7 @@ def print_menu():
   [cyan]16.[/cyan] 用户活跃度排行
   [cyan]17.[/cyan] 各房间安防事件数
   [cyan]18.[/cyan] 每日设备使用趋势
+  [cyan]22.[/cyan] 生成全部分析报告 (并发)
     """
     ai_menu = """
 [bold yellow]🤖 智能问答与分析[/bold yellow]
@@ -115,6 +190,7 @@ def print_menu():
     sql_menu = """
 [bold cyan]📝 SQL查询功能[/bold cyan]
   [cyan]21.[/cyan] 自定义SQL查询
+  [cyan]23.[/cyan] 浏览本地缓存 (离线可用)
     """
 
     menu_panel = Panel(
@@ -146,64 +222,91 @@ def print_menu():
     console.print("[bold yellow]0. 退出 🏠[/bold yellow]")
 
 
-def print_table(data, title="查询结果"):
-    if not data:
-        console.print("[yellow]无数据可供展示。[/yellow]")
-        return
-    if isinstance(data, dict):
-        data = [data]
+def _column_widths(columns, sample_rows):
+    """按样本行估计列宽, 之后各页使用相同的列宽 (超出部分省略)。"""
+    widths = [len(str(c)) for c in columns]
+    for row in sample_rows:
+        for i, cell in enumerate(row):
+            widths[i] = max(widths[i], len(str(cell)))
+    return [min(w, MAX_COLUMN_WIDTH) for w in widths]
 
+
+def _new_table(title, columns, widths):
     table = Table(
         title=f"[bold green]{title}[/bold green]",
         show_header=True,
         header_style="bold magenta",
         border_style="dim"
     )
-
-    if not data:
-        console.print(table)
-        return
-
-    keys = data[0].keys()
-    for key in keys:
+    for column, width in zip(columns, widths):
         table.add_column(
-            key, style="dim" if "id" in key.lower() else ""
+            str(column), style="dim" if "id" in str(column).lower() else "",
+            width=width, no_wrap=True, overflow="ellipsis"
         )
+    return table
 
-    for row in data:
-        table.add_row(*(str(row.get(k, '')) for k in keys))
 
-    console.print(table)
+def page_rows(columns, rows, title="查询结果"):
+    """
+    分页显示行 (rows 为任意可迭代对象, 可以边接收边显示),
+    每页渲染一个表格; 还有数据时询问是否继续, 输入 q 结束。返回显示的行数。
+    """
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, COLUMN_SAMPLE_ROWS))
+    if not sample:
+        console.print("[yellow]无数据可供展示。[/yellow]")
+        return 0
+    widths = _column_widths(columns, sample)
+    rows = itertools.chain(sample, rows)
+    if PAGE_SIZE:
+        page_size = PAGE_SIZE
+    elif console.is_terminal:
+        page_size = max(10, console.size.height - 8)
+    else:
+        page_size = 1000  # 输出重定向到文件时不需要按屏分页
+    shown = 0
+    page = list(itertools.islice(rows, page_size))
+    while page:
+        table = _new_table(title, columns, widths)
+        for row in page:
+            table.add_row(*(str(cell) for cell in row))
+        console.print(table)
+        shown += len(page)
+        page = list(itertools.islice(rows, page_size))
+        if page and console.is_terminal:
+            answer = Prompt.ask(
+                f"[dim]已显示 {shown} 行, Enter 下一页, q 结束[/dim]",
+                default="", show_default=False
+            )
+            if answer.strip().lower() == "q":
+                break
+    return shown
+
+
+def print_table(data, title="查询结果"):
+    if not data:
+        console.print("[yellow]无数据可供展示。[/yellow]")
+        return
+    if isinstance(data, dict):
+        data = [data]
+    keys = list(data[0].keys())
+    page_rows(keys, ([row.get(k, '') for k in keys] for row in data), title)
 
 
 def display_dataframe(df: pd.DataFrame, title: str = "查询结果"):
-    """Renders a pandas DataFrame as a rich Table."""
+    """Renders a pandas DataFrame as paged rich Tables."""
     if df.empty:
         console.print("[yellow]无数据可供展示。[/yellow]")
         return
-
-    table = Table(
-        title=f"[bold green]{title}[/bold green]",
-        show_header=True,
-        header_style="bold magenta",
-        border_style="dim"
+    page_rows(
+        list(df.columns), df.itertuples(index=False, name=None), title
     )
 
-    # Add columns from DataFrame
-    for column in df.columns:
-        table.add_column(
-            str(column), style="dim" if "id" in str(column).lower() else ""
-        )
-
-    # Add rows from DataFrame
-    for _, row in df.iterrows():
-        table.add_row(*(str(item) for item in row))
-
-    console.print(table)
-
 
 def is_suitable_for_chart(df: pd.DataFrame) -> bool:
     """A simple heuristic to decide if a DataFrame is suitable for plotting."""
+    import pandas as pd
+
     if df.empty or len(df.columns) < 2 or len(df) > 50:
         return False
     # Check for at least one numeric column (that is not an ID column)
@@ -216,7 +319,10 @@ def is_suitable_for_chart(df: pd.DataFrame) -> bool:
 
 def plot_data(df: pd.DataFrame, title: str):
     """Tries to plot a sensible chart from a DataFrame."""
+    import pandas as pd
+
     try:
+        plt = pyplot()
         plt.figure(figsize=(10, 6))
 
         x_col = df.columns[0]
@@ -261,16 +367,29 @@ def plot_data(df: pd.DataFrame, title: str):
         display_dataframe(df, title)
 
 
+def cached_get(path: str, **kwargs):
+    """带本地缓存的 GET; 服务端不可达时返回缓存的结果并提示缓存时间。"""
+    resp = cache.get(api, path, **kwargs)
+    if resp.offline:
+        fetched = datetime.fromtimestamp(resp.fetched_at)
+        console.print(
+            f"[yellow]⚠ 无法连接服务器, 以下为 "
+            f"{fetched:%Y-%m-%d %H:%M:%S} 缓存的结果 (离线)。[/yellow]"
+        )
+    return resp
+
+
 def get_all_users():
-    with console.status(
-        "[bold green]正在查询所有用户...[/bold green]", spinner="dots"
-    ):
-        try:
-            resp = requests.get(f"{BASE_URL}/users/")
-            resp.raise_for_status()
-            print_table(resp.json(), "所有用户")
-        except requests.RequestException as e:
-            console.print(f"[bold red]查询失败: {e}[/bold red]")
+    try:
+        with console.status(
+            "[bold green]正在查询所有用户...[/bold green]", spinner="dots"
+        ):
+            resp = cached_get("/users/")
+    except requests.RequestException as e:
+        console.print(f"[bold red]查询失败: {e}[/bold red]")
+        return
+    # 在状态提示结束后再显示, 避免旋转动画覆盖分页提示
+    print_table(resp.json(), "所有用户")
 
 
 def add_user():
@@ -278,8 +397,8 @@ def add_user():
         name = Prompt.ask("[cyan]请输入用户名[/cyan]")
         area = Prompt.ask("[cyan]请输入房屋面积[/cyan]")
         with console.status("[bold green]正在添加用户...[/bold green]"):
-            resp = requests.post(
-                f"{BASE_URL}/users/",
+            resp = api.post(
+                "/users/",
                 json={"name": name, "house_area": float(area)}
             )
             resp.raise_for_status()
@@ -294,15 +413,15 @@ def add_user():
 
 
 def get_all_devices():
-    with console.status(
-        "[bold green]正在查询所有设备...[/bold green]", spinner="dots"
-    ):
-        try:
-            resp = requests.get(f"{BASE_URL}/devices/")
-            resp.raise_for_status()
-            print_table(resp.json(), "所有设备")
-        except requests.RequestException as e:
-            console.print(f"[bold red]查询失败: {e}[/bold red]")
+    try:
+        with console.status(
+            "[bold green]正在查询所有设备...[/bold green]", spinner="dots"
+        ):
+            resp = cached_get("/devices/")
+    except requests.RequestException as e:
+        console.print(f"[bold red]查询失败: {e}[/bold red]")
+        return
+    print_table(resp.json(), "所有设备")
 
 
 def add_device():
@@ -311,8 +430,8 @@ def add_device():
         dtype = Prompt.ask("[cyan]请输入设备类型[/cyan]")
         room_id = Prompt.ask("[cyan]请输入所属房间ID[/cyan]")
         with console.status("[bold green]正在添加设备...[/bold green]"):
-            resp = requests.post(
-                f"{BASE_URL}/devices/",
+            resp = api.post(
+                "/devices/",
                 json={"name": name, "type": dtype, "room_id": int(room_id)}
             )
             resp.raise_for_status()
@@ -327,15 +446,15 @@ def add_device():
 
 
 def get_all_usages():
-    with console.status(
-        "[bold green]查询设备使用记录...[/bold green]", spinner="dots"
-    ):
-        try:
-            resp = requests.get(f"{BASE_URL}/device_usages/")
-            resp.raise_for_status()
-            print_table(resp.json(), "所有设备使用记录")
-        except requests.RequestException as e:
-            console.print(f"[bold red]查询失败: {e}[/bold red]")
+    try:
+        with console.status(
+            "[bold green]查询设备使用记录...[/bold green]", spinner="dots"
+        ):
+            resp = cached_get("/device_usages/")
+    except requests.RequestException as e:
+        console.print(f"[bold red]查询失败: {e}[/bold red]")
+        return
+    print_table(resp.json(), "所有设备使用记录")
 
 
 def add_usage():
@@ -362,7 +481,7 @@ def add_usage():
                 "usage_type": usage_type,
                 "energy_consumed": float(energy)
             }
-            resp = requests.post(f"{BASE_URL}/device_usages/", json=payload)
+            resp = api.post("/device_usages/", json=payload)
             resp.raise_for_status()
             print_table(resp.json(), "新增记录成功")
     except requests.RequestException as e:
@@ -378,15 +497,15 @@ def add_usage():
 
 
 def get_all_events():
-    with console.status(
-        "[bold green]正在查询安防事件...[/bold green]", spinner="dots"
-    ):
-        try:
-            resp = requests.get(f"{BASE_URL}/security_events/")
-            resp.raise_for_status()
-            print_table(resp.json(), "所有安防事件")
-        except requests.RequestException as e:
-            console.print(f"[bold red]查询失败: {e}[/bold red]")
+    try:
+        with console.status(
+            "[bold green]正在查询安防事件...[/bold green]", spinner="dots"
+        ):
+            resp = cached_get("/security_events/")
+    except requests.RequestException as e:
+        console.print(f"[bold red]查询失败: {e}[/bold red]")
+        return
+    print_table(resp.json(), "所有安防事件")
 
 
 def add_event():
@@ -404,7 +523,7 @@ def add_event():
                     timestamp, "%Y-%m-%d %H:%M:%S"
                 ).isoformat()
             }
-            resp = requests.post(f"{BASE_URL}/security_events/", json=data)
+            resp = api.post("/security_events/", json=data)
             resp.raise_for_status()
             print_table(resp.json(), "新增事件成功")
     except requests.RequestException as e:
@@ -420,15 +539,15 @@ def add_event():
 
 
 def get_all_feedbacks():
-    with console.status(
-        "[bold green]正在查询用户反馈...[/bold green]", spinner="dots"
-    ):
-        try:
-            resp = requests.get(f"{BASE_URL}/feedbacks/")
-            resp.raise_for_status()
-            print_table(resp.json(), "所有用户反馈")
-        except requests.RequestException as e:
-            console.print(f"[bold red]查询失败: {e}[/bold red]")
+    try:
+        with console.status(
+            "[bold green]正在查询用户反馈...[/bold green]", spinner="dots"
+        ):
+            resp = cached_get("/feedbacks/")
+    except requests.RequestException as e:
+        console.print(f"[bold red]查询失败: {e}[/bold red]")
+        return
+    print_table(resp.json(), "所有用户反馈")
 
 
 def add_feedback():
@@ -445,7 +564,7 @@ def add_feedback():
                 "device_id": int(device_id) if device_id else None,
                 "timestamp": datetime.now().isoformat()
             }
-            resp = requests.post(f"{BASE_URL}/feedbacks/", json=payload)
+            resp = api.post("/feedbacks/", json=payload)
             resp.raise_for_status()
             print_table(resp.json(), "新增反馈成功")
     except requests.RequestException as e:
@@ -457,49 +576,178 @@ def add_feedback():
         console.print("[bold red]输入错误: 用户ID和设备ID必须是数字。[/bold red]")
 
 
+def open_file(filename):
+    try:
+        if os.name == "nt":
+            os.startfile(filename)
+        elif sys.platform == "darwin":
+            os.system(f"open {filename}")
+        else:
+            os.system(f"xdg-open {filename}")
+    except Exception:
+        console.print("[yellow]无法自动打开图片, 请手动查看。[/yellow]")
+
+
+def show_analysis(resp, endpoint, filename):
+    """显示分析接口的结果: 图片保存为 filename 并打开, JSON 以表格显示。"""
+    content_type = resp.content_type
+    if "image" in content_type:
+        with open(filename, 'wb') as f:
+            f.write(resp.content)
+        console.print(
+            f"[bold green]✔ 分析图片已保存为 "
+            f"[underline]{filename}[/underline][/bold green]"
+        )
+        open_file(filename)
+    elif "application/json" in content_type:
+        data = resp.json()
+        if 'data' in data:
+            print_table(data['data'], title=f"分析结果: {endpoint}")
+        else:
+            console.print(
+                f"[bold red]分析出错: "
+                f"{data.get('error', '未知错误')}[/bold red]"
+            )
+    else:
+        console.print(
+            f"[bold red]错误: 收到未知的响应类型 "
+            f"({content_type})。[/bold red]"
+        )
+
+
 def get_analysis(endpoint, filename):
-    with console.status(
-        f"[bold green]正在获取分析结果: {endpoint}...[/bold green]",
-        spinner="dots"
-    ):
-        try:
-            resp = requests.get(f"{BASE_URL}/analysis/{endpoint}")
-            resp.raise_for_status()
-            content_type = resp.headers.get('content-type', '')
+    try:
+        with console.status(
+            f"[bold green]正在获取分析结果: {endpoint}...[/bold green]",
+            spinner="dots"
+        ):
+            resp = cached_get(f"/analysis/{endpoint}")
+    except requests.RequestException as e:
+        console.print(f"[bold red]请求分析接口失败: {e}[/bold red]")
+        return
+    show_analysis(resp, endpoint, filename)
 
-            if "image" in content_type:
-                with open(filename, 'wb') as f:
-                    f.write(resp.content)
-                console.print(
-                    f"[bold green]✔ 分析图片已保存为 "
-                    f"[underline]{filename}[/underline][/bold green]"
-                )
-                try:
-                    if os.name == "nt":
-                        os.startfile(filename)
-                    elif sys.platform == "darwin":
-                        os.system(f"open {filename}")
-                    else:
-                        os.system(f"xdg-open {filename}")
-                except Exception:
-                    console.print("[yellow]无法自动打开图片, 请手动查看。[/yellow]")
-            elif "application/json" in content_type:
-                data = resp.json()
-                if 'data' in data:
-                    print_table(data['data'], title=f"分析结果: {endpoint}")
-                else:
-                    console.print(
-                        f"[bold red]分析出错: "
-                        f"{data.get('error', '未知错误')}[/bold red]"
-                    )
-            else:
-                console.print(
-                    f"[bold red]错误: 收到未知的响应类型 "
-                    f"({content_type})。[/bold red]"
-                )
 
-        except requests.RequestException as e:
-            console.print(f"[bold red]请求分析接口失败: {e}[/bold red]")
+def browse_cache():
+    """浏览本地缓存的查询结果与分析图表, 服务端不可达时也可使用。"""
+    entries = cache.entries()
+    if not entries:
+        console.print("[yellow]本地缓存为空。[/yellow]")
+        return
+    table = Table(title="本地缓存的结果", show_lines=False)
+    for column in ["编号", "地址", "类型", "大小", "缓存时间"]:
+        table.add_column(column)
+    for i, (url, content_type, size, fetched_at) in enumerate(entries, 1):
+        table.add_row(
+            str(i), url, content_type.split(";")[0], f"{size / 1024:.1f} KB",
+            f"{datetime.fromtimestamp(fetched_at):%Y-%m-%d %H:%M:%S}"
+        )
+    console.print(table)
+
+    choice = Prompt.ask("[cyan]输入编号查看 (直接回车返回)[/cyan]", default="")
+    if not choice:
+        return
+    if not choice.isdigit() or not 1 <= int(choice) <= len(entries):
+        console.print(f"[bold red]无效编号: {choice}[/bold red]")
+        return
+    url = entries[int(choice) - 1][0]
+    resp = cache.peek(url)
+    if resp is None:
+        console.print("[yellow]该条目已从缓存中删除。[/yellow]")
+        return
+    name = url.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+    if "image" in resp.content_type:
+        show_analysis(resp, name, f"{name}.png")
+        return
+    data = resp.json()
+    if isinstance(data, dict) and ("data" in data or "error" in data):
+        show_analysis(resp, name, f"{name}.png")
+    else:
+        print_table(data, title=url)
+
+
+def _fetch_report(endpoint: str, output_dir: str):
+    """
+    获取一个分析报告并写入 output_dir, 返回 (状态, 耗时秒, 字节数, 文件)。
+    分析接口在服务端按并发数限流, 被拒绝 (429) 时按 Retry-After 等待后重试,
+    直到 REPORT_DEADLINE_SECONDS; 由这里统一重试, 请求本身不按状态码重试。
+    """
+    began = time.perf_counter()
+    deadline = began + REPORT_DEADLINE_SECONDS
+    while True:
+        resp = api.get(f"/analysis/{endpoint}", timeout=(3.05, 120),
+                       retry_status=False)
+        if resp.status_code != 429 or time.perf_counter() >= deadline:
+            break
+        time.sleep(float(resp.headers.get("Retry-After", 1)))
+    elapsed = time.perf_counter() - began
+    if resp.status_code != 200:
+        return f"HTTP {resp.status_code}", elapsed, 0, ""
+
+    content_type = resp.headers.get('content-type', '')
+    if "image" in content_type:
+        filename = os.path.join(output_dir, f"{endpoint}.png")
+    elif "application/json" in content_type:
+        error = resp.json().get("error")
+        if error:
+            return f"出错: {error}", elapsed, 0, ""
+        filename = os.path.join(output_dir, f"{endpoint}.json")
+    else:
+        return f"未知类型 {content_type}", elapsed, 0, ""
+    with open(filename, "wb") as f:
+        f.write(resp.content)
+    return "成功", elapsed, len(resp.content), filename
+
+
+def generate_all_reports():
+    """并发获取全部分析报告, 总耗时接近最慢的一个报告, 而不是所有报告之和。"""
+    default_dir = os.path.join(
+        "reports", datetime.now().strftime("%Y%m%d_%H%M%S")
+    )
+    output_dir = Prompt.ask("[cyan]请输入输出目录[/cyan]", default=default_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = {}
+    began = time.perf_counter()
+    with console.status(
+        "[bold green]正在并发生成分析报告...[/bold green]", spinner="dots"
+    ) as status, ThreadPoolExecutor(max_workers=REPORT_WORKERS) as pool:
+        futures = {
+            pool.submit(_fetch_report, endpoint, output_dir): endpoint
+            for endpoint, _ in ANALYSIS_REPORTS
+        }
+        for future in as_completed(futures):
+            endpoint = futures[future]
+            try:
+                results[endpoint] = future.result()
+            except requests.RequestException as e:
+                results[endpoint] = (f"请求失败: {e}", 0.0, 0, "")
+            status.update(
+                f"[bold green]已完成 {len(results)}/{len(futures)}: "
+                f"{endpoint}[/bold green]"
+            )
+    wall = time.perf_counter() - began
+
+    table = Table(
+        title=f"[bold green]分析报告 ({output_dir})[/bold green]",
+        show_header=True,
+        header_style="bold magenta",
+        border_style="dim"
+    )
+    for column in ("报告", "状态", "耗时 (秒)", "大小 (KB)", "文件"):
+        table.add_column(column)
+    for endpoint, title in ANALYSIS_REPORTS:
+        state, elapsed, size, filename = results[endpoint]
+        table.add_row(
+            title, state, f"{elapsed:.2f}",
+            f"{size / 1024:.1f}" if size else "", filename
+        )
+    console.print(table)
+    total = sum(r[1] for r in results.values())
+    console.print(
+        f"[bold green]✔ 全部完成, 用时 {wall:.2f} 秒[/bold green] "
+        f"[dim](各报告耗时合计 {total:.2f} 秒, 并发数 {REPORT_WORKERS})[/dim]"
+    )
 
 
 def choose_model():
@@ -538,8 +786,8 @@ def nlp_query_mode(model_provider: str):
             with console.status(
                 "[cyan]大模型正在思考中，请稍候...", spinner="bouncingBall"
             ):
-                resp = requests.post(
-                    f"{BASE_URL}/nlp/", json=payload, timeout=60
+                resp = api.post(
+                    "/nlp/", json=payload, timeout=60
                 )
                 resp.raise_for_status()
                 result = resp.json()
@@ -630,8 +878,8 @@ def nlp_analysis_mode(model_provider: str):
             with console.status(
                 "[cyan]AI正在深度分析并决策中...", spinner="bouncingBall"
             ):
-                resp = requests.post(
-                    f"{BASE_URL}/nlp/", json=payload, timeout=60
+                resp = api.post(
+                    "/nlp/", json=payload, timeout=60
                 )
                 resp.raise_for_status()
                 result = resp.json()
@@ -645,6 +893,7 @@ def nlp_analysis_mode(model_provider: str):
 
             # Case 1: AI decided to visualize
             if action == "visualize" and data:
+                import pandas as pd
                 df = pd.DataFrame(data)
                 dataframe_for_explanation = df
                 if is_suitable_for_chart(df):
@@ -726,10 +975,11 @@ def nlp_analysis_mode(model_provider: str):
                                     )
                                 }
                             ]
-                            resp2 = requests.post(
-                                f"{BASE_URL}/nlp/",
+                            resp2 = api.post(
+                                "/nlp/",
                                 json={"messages": explain_messages,
-                                      "model": model_provider}
+                                      "model": model_provider},
+                                timeout=60
                             )
                             explanation = resp2.json().get(
                                 "suggestion") or resp2.json().get(
@@ -753,93 +1003,115 @@ def nlp_analysis_mode(model_provider: str):
             console.print(f"\n[bold red]发生未知错误: {e}[/bold red]")
 
 
-class SQLCompleter(Completer):
-    def __init__(self, schema: dict):
-        self.schema = schema
-        self.all_keywords = [
-            'SELECT', 'FROM', 'WHERE', 'INSERT', 'INTO', 'VALUES', 'UPDATE',
-            'SET', 'DELETE', 'LIMIT', 'ORDER', 'BY', 'GROUP', 'ASC', 'DESC',
-            'JOIN', 'ON', 'AS', 'AND', 'OR', 'NOT', 'IN', 'LIKE', 'IS', 'NULL'
-        ]
-        self.tables = list(self.schema.keys())
-        self.columns = [col for cols in self.schema.values() for col in cols]
-
-    def get_completions(self, document: Document, complete_event):
-        text = document.text_before_cursor.upper()
-        word_before_cursor = document.get_word_before_cursor(WORD=True).upper()
-
-        suggestions = self._get_contextual_suggestions(text)
-
-        for keyword in suggestions:
-            if keyword.upper().startswith(word_before_cursor):
-                yield Completion(
-                    keyword,
-                    start_position=-len(word_before_cursor),
-                    display_meta=self.get_meta(keyword)
-                )
+def _ndjson_rows(lines):
+    """逐行解析 /api/sql_query/stream 的数据行, 遇到结束或错误行时停止。"""
+    for line in lines:
+        if not line:
+            continue
+        item = json.loads(line)
+        if isinstance(item, list):
+            yield item
+        elif "error" in item:
+            raise RuntimeError(item["error"])
+        else:
+            return
 
-    def _get_contextual_suggestions(self, text: str) -> list:
-        words = text.split()
-        if not words:
-            return self.all_keywords
 
-        # Very simple context detection
+def run_sql_streaming(sql: str):
+    """
+    流式执行 SQL: 先把结果完整接收到本地 (较大时写入临时文件) 再分页显示,
+    翻页期间不占用服务端的连接、游标与限流通道; 接收时按 Ctrl+C 会关闭连接
+    (服务端随之停止读取) 并回到 SQL> 提示符。
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_BYTES)
+    error = None
+    with spool:
         try:
-            # Pop the last word and analyze context from the one before it
-            if len(words) > 1:
-                context_word = words[-2]
-            else:
-                context_word = ''
-
-            if context_word in ['FROM', 'JOIN', 'UPDATE', 'INTO']:
-                # After FROM/JOIN etc., suggest table names
-                return self.tables
-            elif context_word in ['WHERE', 'ON', 'AND', 'OR', 'BY', 'SET',
-                                  'SELECT']:
-                # After WHERE, ON etc., suggest column names and keywords
-                suggestions = self.columns + self.all_keywords
-                return suggestions
-            elif context_word in self.tables:
-                # After a table name, suggest column names
-                return self.schema.get(context_word, [])
-            else:
-                return self.all_keywords
-        except IndexError:
-            return self.all_keywords
+            with console.status("[bold green]正在执行SQL...") as status:
+                resp = api.post("/api/sql_query/stream", json={"sql": sql},
+                                stream=True)
+                with resp:
+                    resp.raise_for_status()
+                    if "ndjson" not in resp.headers.get("content-type", ""):
+                        error = resp.json().get("error", "未知错误")
+                    else:
+                        received = 0
+                        for line in resp.iter_lines():
+                            if not line:
+                                continue
+                            # 数据行为数组; 首行 (列名)、末行 (结束/错误) 为对象
+                            if line.startswith(b"["):
+                                received += 1
+                                if received % 10000 == 0:
+                                    status.update(
+                                        f"[bold green]已接收 {received} 行...")
+                            else:
+                                item = json.loads(line)
+                                if "error" in item:
+                                    error = item["error"]
+                                    break
+                            spool.write(line + b"\n")
+        except KeyboardInterrupt:
+            # 离开 with resp 时连接已关闭, 回到 SQL> 提示符而不是退出 SQL 模式
+            console.print("[yellow]已取消查询。[/yellow]")
+            return
+        if error is not None:
+            console.print(f"[bold red]查询失败: {error}[/bold red]")
+            return
+        spool.seek(0)
+        lines = iter(spool)
+        header = json.loads(next(lines))
+        shown = page_rows(
+            header["columns"], _ndjson_rows(lines), "SQL查询结果"
+        )
+    console.print(f"[dim]共显示 {shown} 行。[/dim]")
 
-    def get_meta(self, word: str) -> str:
-        if word.upper() in self.all_keywords:
-            return 'Keyword'
-        if word in self.tables:
-            return 'Table'
-        if word in self.columns:
-            return 'Column'
-        return ''
+
+def _refresh_schema(completer):
+    """后台重新验证缓存的 schema, 有变化时更新补全; 失败时保留缓存的版本。"""
+    try:
+        completer.update(cache.get(api, SCHEMA_PATH).json())
+    except (requests.RequestException, ValueError):
+        pass
 
 
 def sql_query_cli():
     """CLI for direct SQL queries with autocompletion."""
-    schema = {}
-    completer = None
+    from prompt_toolkit import PromptSession
+    from sql_completer import SQLCompleter
+
     session = PromptSession(complete_while_typing=True)  # Fallback session
 
-    try:
-        with console.status("[bold green]正在获取数据库Schema用于自动补全..."):
-            resp = requests.get(f"{BASE_URL}/api/schema_for_completion")
-            if resp.status_code == 200:
-                schema = resp.json()
-                completer = SQLCompleter(schema)
-                session = PromptSession(
-                    completer=completer, complete_while_typing=True
-                )
-                console.print("[bold green]✔ Schema获取成功, SQL自动补全已激活。")
-            else:
-                console.print(
-                    f"[yellow]无法获取Schema (HTTP {resp.status_code}), "
-                    "自动补全不可用。[/yellow]"
-                )
-    except requests.RequestException as e:
-        console.print(f"[yellow]无法连接到服务器 ({e}), 自动补全不可用。[/yellow]")
+    # 有缓存的 schema 时立即启用补全, 在后台向服务端重新验证;
+    # 首次使用 (没有缓存) 时同步获取
+    cached = cache.peek(cache.key(api, SCHEMA_PATH))
+    if cached is not None:
+        completer = SQLCompleter(cached.json())
+        session = PromptSession(
+            completer=completer, complete_while_typing=True
+        )
+        console.print("[bold green]✔ 已从本地缓存加载Schema, SQL自动补全已激活。")
+        threading.Thread(
+            target=_refresh_schema, args=(completer,), daemon=True
+        ).start()
+    else:
+        try:
+            with console.status("[bold green]正在获取数据库Schema用于自动补全..."):
+                resp = cache.get(api, SCHEMA_PATH)
+            completer = SQLCompleter(resp.json())
+            session = PromptSession(
+                completer=completer, complete_while_typing=True
+            )
+            console.print("[bold green]✔ Schema获取成功, SQL自动补全已激活。")
+        except requests.HTTPError as e:
+            console.print(
+                f"[yellow]无法获取Schema (HTTP {e.response.status_code}), "
+                "自动补全不可用。[/yellow]"
+            )
+        except requests.RequestException as e:
+            console.print(
+                f"[yellow]无法连接到服务器 ({e}), 自动补全不可用。[/yellow]"
+            )
 
     console.print(Panel(
         "[bold yellow]进入SQL查询模式, 输入 'exit' 或 'quit' 返回。[/bold yellow]\n"
@@ -854,20 +1126,7 @@ def sql_query_cli():
             if not sql.strip():
                 continue
 
-            with console.status("[bold green]正在执行SQL..."):
-                resp = requests.post(
-                    f"{BASE_URL}/api/sql_query", json={"sql": sql}
-                )
-                resp.raise_for_status()
-            data = resp.json()
-
-            if data.get("success"):
-                print_table(data.get("data", []), "SQL查询结果")
-            else:
-                console.print(
-                    f"[bold red]查询失败: "
-                    f"{data.get('error', '未知错误')}[/bold red]"
-                )
+            run_sql_streaming(sql)
 
         except requests.RequestException as e:
             console.print(f"[bold red]请求失败: {e}[/bold red]")
@@ -877,7 +1136,103 @@ def sql_query_cli():
             break
 
 
+def import_command(args) -> int:
+    """python client_cli.py import <文件> --type <类型>, 返回退出码。"""
+    import bulk_import
+    from rich.progress import (
+        BarColumn, Progress, TaskProgressColumn, TextColumn, TimeElapsedColumn
+    )
+
+    progress = Progress(
+        TextColumn("[bold blue]{task.description}"),
+        BarColumn(),
+        TaskProgressColumn(),
+        TextColumn("{task.fields[rows]} 行"),
+        TextColumn("{task.fields[rate]:.0f} 行/秒"),
+        TimeElapsedColumn(),
+        console=console,
+    )
+    task = progress.add_task(
+        os.path.basename(args.file), total=None, rows=0, rate=0.0
+    )
+    imported = 0
+    began = time.perf_counter()
+
+    def on_progress(done, total):
+        progress.update(task, completed=done, total=total)
+
+    def on_batch(index, rows):
+        nonlocal imported
+        imported += rows
+        elapsed = time.perf_counter() - began
+        progress.update(task, rows=imported, rate=imported / elapsed)
+
+    try:
+        with progress:
+            imported, skipped = bulk_import.import_file(
+                api, args.file, args.type, fmt=args.format,
+                batch_size=args.batch_size, in_flight=args.in_flight,
+                restart=args.restart, on_progress=on_progress,
+                on_batch=on_batch,
+            )
+    except (bulk_import.BatchRejected, requests.RequestException,
+            ValueError, OSError) as e:
+        console.print(f"[bold red]导入中断: {e}[/bold red]")
+        console.print(
+            f"[yellow]本次已确认 {imported} 行; 修正问题后重新执行同一命令, "
+            "将从检查点继续。[/yellow]"
+        )
+        return 1
+    elapsed = time.perf_counter() - began
+    if skipped:
+        console.print(f"[dim]跳过检查点中已导入的 {skipped} 行。[/dim]")
+    console.print(
+        f"[bold green]✔ 导入完成: {imported} 行, 用时 {elapsed:.1f} 秒 "
+        f"({imported / max(elapsed, 1e-9):.0f} 行/秒)[/bold green]"
+    )
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="智能家居系统命令行客户端")
+    parser.add_argument(
+        "--base-url", default=DEFAULT_BASE_URL,
+        help="服务端地址 (默认取环境变量 SMARTHOME_API_URL)"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    importer = subparsers.add_parser(
+        "import", help="从 CSV / NDJSON 文件批量导入数据"
+    )
+    importer.add_argument("file", help="CSV (首行为列名) 或 NDJSON 文件")
+    importer.add_argument(
+        "--type", required=True,
+        choices=["users", "rooms", "devices", "usages", "events",
+                 "feedbacks"],
+        help="数据类型"
+    )
+    importer.add_argument(
+        "--format", choices=["csv", "ndjson"],
+        help="文件格式 (默认按扩展名判断, .ndjson/.jsonl/.json 为 NDJSON)"
+    )
+    importer.add_argument(
+        "--batch-size", type=int, default=1000, help="每批行数"
+    )
+    importer.add_argument(
+        "--in-flight", type=int, default=4, help="同时在途的批数"
+    )
+    importer.add_argument(
+        "--restart", action="store_true", help="忽略检查点, 从头导入"
+    )
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args()
+    api.base_url = args.base_url.rstrip("/")
+    if args.command == "import":
+        code = import_command(args)
+        api.close()
+        sys.exit(code)
     try:
         while True:
             clear()
@@ -886,7 +1241,7 @@ def main():
             try:
                 choice = Prompt.ask(
                     "[bold]请选择操作[/bold]",
-                    choices=[str(i) for i in range(22)],
+                    choices=[str(i) for i in range(24)],
                     show_choices=False
                 )
             except KeyboardInterrupt:
@@ -918,6 +1273,8 @@ def main():
                 "19": lambda: nlp_query_mode(choose_model()),
                 "20": lambda: nlp_analysis_mode(choose_model()),
                 "21": sql_query_cli,
+                "22": generate_all_reports,
+                "23": browse_cache,
                 "0": lambda: sys.exit(
                     console.print("[bold cyan]感谢使用, 再见！[/bold cyan]")
                 )
@@ -936,6 +1293,7 @@ def main():
     except (KeyboardInterrupt, EOFError):
         pass
     finally:
+        api.close()
         console.print("\n[bold cyan]程序已退出。[/bold cyan]")
         sys.exit(0)
 
@@ -1,47 +1,281 @@
-from sqlalchemy.orm import Session
+import datetime
+import os
+from sqlalchemy import (
+    bindparam, delete, insert, lambda_stmt, literal_column, select, update
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, joinedload, selectinload
 import models
 import schemas
+import refcache
+
+# 批量更新/删除每批处理的行数, 每批单独提交, 避免长时间持有行锁
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "5000"))
+
+# 列表接口的快速路径: 只查询需要的列, 直接组装成与 schemas 结构一致的字典,
+# 由 fast_response.FastJSONResponse 编码, 不再经过 ORM 实体与 pydantic 校验。
+_DEVICE_COLUMNS = (
+    models.Device.id,
+    models.Device.name,
+    models.Device.type,
+    models.Device.room_id,
+)
+
+
+# 与各个 *Out 响应模型序列化的关系一一对应的加载策略,
+# 避免序列化时逐行触发懒加载 (N+1)。
+_USER_OUT_LOADERS = (
+    selectinload(models.User.usages).joinedload(models.DeviceUsage.device),
+    selectinload(models.User.events).joinedload(models.SecurityEvent.device),
+    selectinload(models.User.feedbacks).joinedload(models.Feedback.device),
+)
+_ROOM_OUT_LOADERS = (selectinload(models.Room.devices),)
+_DEVICE_OUT_LOADERS = (joinedload(models.Device.room),)
+
+# 热点查询预先构造为模块级 select() 语句, 参数用 bindparam 传入:
+# 每次调用不再重新构造 Query 对象, 编译结果由 SQLAlchemy 的编译缓存复用。
+# 带可选过滤条件的列表查询使用 lambda_stmt, 每种条件组合各缓存一份。
+_SKIP = bindparam("skip")
+_LIMIT = bindparam("limit")
+
+
+def _by_id(model, *loaders):
+    return select(model).options(*loaders).where(
+        model.id == bindparam("row_id"))
+
+
+def _page(model, *loaders):
+    return select(model).options(*loaders).offset(_SKIP).limit(_LIMIT)
+
+
+_USER_BY_ID = _by_id(models.User, *_USER_OUT_LOADERS)
+_USERS_PAGE = _page(models.User, *_USER_OUT_LOADERS)
+_ROOM_BY_ID = _by_id(models.Room, *_ROOM_OUT_LOADERS)
+_ROOMS_PAGE = _page(models.Room, *_ROOM_OUT_LOADERS)
+_DEVICE_BY_ID = _by_id(models.Device, *_DEVICE_OUT_LOADERS)
+_DEVICES_PAGE = _page(models.Device, *_DEVICE_OUT_LOADERS)
+_DEVICE_USAGE_BY_ID = _by_id(
+    models.DeviceUsage, joinedload(models.DeviceUsage.device))
+_SECURITY_EVENT_BY_ID = _by_id(
+    models.SecurityEvent, joinedload(models.SecurityEvent.device))
+_FEEDBACK_BY_ID = _by_id(
+    models.Feedback, joinedload(models.Feedback.device))
+_FEEDBACKS_PAGE = _page(models.Feedback, joinedload(models.Feedback.device))
+
+
+def _get_by_id(db: Session, stmt, row_id: int):
+    return db.execute(stmt, {"row_id": row_id}).scalars().first()
+
+
+def _get_page(db: Session, stmt, skip: int, limit: int):
+    return db.execute(
+        stmt, {"skip": skip, "limit": limit}).scalars().all()
+
+
+def _device_dict(device_id, name, device_type, room_id):
+    if device_id is None:
+        return None
+    return {
+        "name": name, "type": device_type, "room_id": room_id, "id": device_id
+    }
+
+
+# 写入路径: 每次写入只发一条语句再提交, 不再 add -> commit -> refresh。
+# INSERT ... RETURNING 一次拿到自增 id 与默认值;
+# DELETE ... RETURNING id 同时完成存在性检查与删除。
+
+
+def _insert_returning(db: Session, model, values: dict) -> dict:
+    row = db.execute(
+        insert(model).values(**values).returning(*model.__table__.columns)
+    ).mappings().one()
+    db.commit()
+    return dict(row)
+
+
+def _insert_returning_with_device(db: Session, model, values: dict) -> dict:
+    """
+    插入并在同一条语句中关联出响应中嵌套的 device:
+    WITH inserted AS (INSERT ... RETURNING ...) SELECT ... LEFT JOIN devices
+    """
+    columns = model.__table__.columns
+    inserted = insert(model).values(**values).returning(*columns).cte(
+        "inserted")
+    row = db.execute(
+        select(inserted, *_DEVICE_COLUMNS).outerjoin(
+            models.Device, models.Device.id == inserted.c.device_id)
+    ).one()
+    db.commit()
+    result = dict(zip(columns.keys(), row[:len(columns)]))
+    result["device"] = _device_dict(*row[len(columns):])
+    return result
+
+
+# 外键置空时一并置空的冗余列: 它们复制自被删除的行, 保留下来会让按这些列
+# 分组的分析继续统计已删除的用户 / 设备
+_DETACH_COPIED_COLUMNS = {
+    ("device_usages", "user_id"): ("user_name",),
+    ("device_usages", "device_id"): ("device_type",),
+}
+
+
+def _delete_returning(db: Session, model, row_id: int, children=()) -> bool:
+    """
+    按 id 删除, 返回是否删除了记录。
+    children 为引用该表的外键列, 在同一条语句中先置空 (与原先 ORM 删除时
+    将子记录外键置为 NULL 的行为一致), 外键检查在语句结束时进行。
+    """
+    stmt = delete(model).where(model.id == row_id).returning(model.id)
+    for i, column in enumerate(children):
+        copied = _DETACH_COPIED_COLUMNS.get((column.table.name, column.name))
+        values = dict.fromkeys((column.name, *(copied or ())))
+        stmt = stmt.add_cte(
+            update(column.table).where(column == row_id)
+            .values(values).cte(f"detach_{i}")
+        )
+    deleted = db.execute(stmt).first()
+    db.commit()
+    return deleted is not None
+
+
+# 批量更新/删除: 过滤条件 -> 按 id 升序分批 (keyset), 每批一个短事务
+
+
+_LIST_FILTERS = {"ids": "id", "user_ids": "user_id", "device_ids": "device_id"}
+
+
+def _bulk_conditions(model, time_column, filters) -> list:
+    conditions = []
+    for key, value in filters.model_dump(exclude_none=True).items():
+        if key == "start":
+            conditions.append(time_column >= value)
+        elif key == "end":
+            conditions.append(time_column < value)
+        elif key in _LIST_FILTERS:
+            conditions.append(getattr(model, _LIST_FILTERS[key]).in_(value))
+        else:
+            conditions.append(getattr(model, key) == value)
+    return conditions
+
+
+def _bulk_execute(
+    db: Session, model, conditions: list, values: dict = None,
+    batch_size: int = None,
+):
+    """
+    对满足 conditions 的行执行 UPDATE (values 不为空) 或 DELETE。
+    每批先按 id 取出下一段主键, 再只对这些行执行修改并提交;
+    修改语句中重复过滤条件, 期间被并发修改而不再满足条件的行会被跳过。
+    """
+    batch_size = batch_size or BULK_BATCH_SIZE
+    affected = batches = 0
+    last_id = 0
+    while True:
+        ids = db.execute(
+            select(model.id).where(*conditions, model.id > last_id)
+            .order_by(model.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        if values:
+            stmt = update(model).values(**values)
+        else:
+            stmt = delete(model)
+        result = db.execute(
+            stmt.where(model.id.in_(ids), *conditions),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        affected += result.rowcount
+        batches += 1
+        last_id = ids[-1]
+        if len(ids) < batch_size:
+            break
+    return {"ok": True, "affected": affected, "batches": batches}
+
+
+def _bulk_insert(db: Session, model, rows: list):
+    """整批一个事务; executemany, 由驱动合并为多值 INSERT。"""
+    if rows:
+        db.execute(insert(model), rows)
+        db.commit()
+    return {"ok": True, "created": len(rows)}
 
 # 用户 CRUD
 
 
 def create_user(db: Session, user: schemas.UserCreate):
-    db_user = models.User(name=user.name, house_area=user.house_area)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    row = _insert_returning(db, models.User, user.model_dump())
+    refcache.invalidate(models.User.__tablename__)
+    # 新用户还没有任何关联记录
+    return {**row, "usages": [], "events": [], "feedbacks": []}
+
+
+def create_users(db: Session, users: list):
+    result = _bulk_insert(db, models.User, [u.model_dump() for u in users])
+    refcache.invalidate(models.User.__tablename__)
+    return result
 
 
 def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+    return _get_page(db, _USERS_PAGE, skip, limit)
 
 
 def get_user(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return _get_by_id(db, _USER_BY_ID, user_id)
+
+
+def _sync_usage_user_name(db: Session, user_id: int):
+    """
+    用户改名后同步使用记录上的冗余列 user_name, 否则按 user_name 分组的分析
+    会把同一用户拆成新旧两个名字。在用户行提交之后按 id 分批执行, 每批一个
+    短事务, 不会长时间锁住该用户的全部使用记录; 取值为 users 中的当前名字,
+    并发改名时以最后提交的为准。
+    """
+    current = select(models.User.name).where(
+        models.User.id == user_id).scalar_subquery()
+    return _bulk_execute(db, models.DeviceUsage, [
+        models.DeviceUsage.user_id == user_id,
+        models.DeviceUsage.user_name.is_distinct_from(current),
+    ], {"user_name": current})
 
 
 def create_or_update_user(db: Session, user_id: int, user: schemas.UserCreate):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
-    if db_user:
-        # 更新现有用户
-        db_user.name = user.name
-        db_user.house_area = user.house_area
-    else:
-        # 创建新用户
-        db_user = models.User(id=user_id, name=user.name,
-                              house_area=user.house_area)
-        db.add(db_user)
+    # 一条 INSERT ... ON CONFLICT DO UPDATE 完成创建或更新,
+    # xmax = 0 表示本次是插入 (新行), 否则是更新已有行
+    stmt = pg_insert(models.User).values(id=user_id, **user.model_dump())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.User.id],
+        set_={
+            "name": stmt.excluded.name,
+            "house_area": stmt.excluded.house_area,
+        },
+    ).returning(
+        models.User.id, models.User.name, models.User.house_area,
+        literal_column("xmax = 0").label("inserted"),
+    )
+    row = db.execute(stmt).mappings().one()
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    refcache.invalidate(models.User.__tablename__)
+    if not row["inserted"]:
+        _sync_usage_user_name(db, user_id)
+    if row["inserted"]:
+        return {
+            "id": row["id"], "name": row["name"],
+            "house_area": row["house_area"],
+            "usages": [], "events": [], "feedbacks": [],
+        }
+    # 已有用户的响应包含其关联记录, 按 UserOut 的加载策略读取
+    return get_user(db, user_id)
 
 
 def delete_user(db: Session, user_id: int):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
-    if db_user:
-        db.delete(db_user)
-        db.commit()
+    if _delete_returning(db, models.User, user_id, children=(
+        models.DeviceUsage.user_id,
+        models.SecurityEvent.user_id,
+        models.Feedback.user_id,
+    )):
+        refcache.invalidate(models.User.__tablename__)
         return {"ok": True}
     return {"ok": False, "error": "User not found"}
 
@@ -49,26 +283,31 @@ def delete_user(db: Session, user_id: int):
 
 
 def create_room(db: Session, room: schemas.RoomCreate):
-    db_room = models.Room(name=room.name)
-    db.add(db_room)
-    db.commit()
-    db.refresh(db_room)
-    return db_room
+    row = _insert_returning(db, models.Room, room.model_dump())
+    refcache.invalidate(models.Room.__tablename__)
+    return row
+
+
+def create_rooms(db: Session, rooms: list):
+    result = _bulk_insert(db, models.Room, [r.model_dump() for r in rooms])
+    refcache.invalidate(models.Room.__tablename__)
+    return result
 
 
 def get_rooms(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Room).offset(skip).limit(limit).all()
+    return _get_page(db, _ROOMS_PAGE, skip, limit)
 
 
 def get_room(db: Session, room_id: int):
-    return db.query(models.Room).filter(models.Room.id == room_id).first()
+    return _get_by_id(db, _ROOM_BY_ID, room_id)
 
 
 def delete_room(db: Session, room_id: int):
-    db_room = db.query(models.Room).filter(models.Room.id == room_id).first()
-    if db_room:
-        db.delete(db_room)
-        db.commit()
+    if _delete_returning(db, models.Room, room_id,
+                         children=(models.Device.room_id,)):
+        # 所属设备的 room_id 被置空, 设备缓存也需要失效
+        refcache.invalidate(models.Room.__tablename__)
+        refcache.invalidate(models.Device.__tablename__)
         return {"ok": True}
     return {"ok": False, "error": "Room not found"}
 
@@ -76,126 +315,376 @@ def delete_room(db: Session, room_id: int):
 
 
 def create_device(db: Session, device: schemas.DeviceCreate):
-    db_device = models.Device(
-        name=device.name, type=device.type, room_id=device.room_id)
-    db.add(db_device)
-    db.commit()
-    db.refresh(db_device)
-    return db_device
+    row = _insert_returning(db, models.Device, device.model_dump())
+    refcache.invalidate(models.Device.__tablename__)
+    return row
+
+
+def create_devices(db: Session, devices: list):
+    result = _bulk_insert(
+        db, models.Device, [d.model_dump() for d in devices])
+    refcache.invalidate(models.Device.__tablename__)
+    return result
 
 
 def get_devices(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Device).offset(skip).limit(limit).all()
+    return _get_page(db, _DEVICES_PAGE, skip, limit)
+
+
+_DEVICE_ROWS_PAGE = select(*_DEVICE_COLUMNS, models.Room.name).outerjoin(
+    models.Room, models.Room.id == models.Device.room_id
+).offset(_SKIP).limit(_LIMIT)
+
+
+def get_device_rows(db: Session, skip: int = 0, limit: int = 100):
+    rows = db.execute(
+        _DEVICE_ROWS_PAGE, {"skip": skip, "limit": limit}).all()
+    return [
+        {
+            "name": name,
+            "type": device_type,
+            "room_id": room_id,
+            "id": device_id,
+            "room": (
+                {"name": room_name, "id": room_id}
+                if room_id is not None and room_name is not None else None
+            ),
+        }
+        for device_id, name, device_type, room_id, room_name in rows
+    ]
 
 
 def get_device(db: Session, device_id: int):
-    return db.query(
-        models.Device).filter(
-        models.Device.id == device_id).first()
+    return _get_by_id(db, _DEVICE_BY_ID, device_id)
 
 
 def delete_device(db: Session, device_id: int):
-    db_device = (
-        db.query(models.Device).filter(models.Device.id == device_id).first()
-    )
-    if db_device:
-        db.delete(db_device)
-        db.commit()
+    if _delete_returning(db, models.Device, device_id, children=(
+        models.DeviceUsage.device_id,
+        models.SecurityEvent.device_id,
+        models.Feedback.device_id,
+    )):
+        refcache.invalidate(models.Device.__tablename__)
         return {"ok": True}
     return {"ok": False, "error": "Device not found"}
 
 # 设备使用记录 CRUD
 
 
-def create_device_usage(db: Session, usage: schemas.DeviceUsageCreate):
-    db_usage = models.DeviceUsage(**usage.model_dump())
-    db.add(db_usage)
-    db.commit()
-    db.refresh(db_usage)
-    return db_usage
+def _enrich_usages(db: Session, rows: list):
+    """
+    写入前补全冗余列 device_type / user_name。
+    查找走 refcache, 整批最多各一条 IN 查询, 不逐行查询。
+    """
+    types = refcache.device_types(db, {row["device_id"] for row in rows})
+    names = refcache.user_names(db, {row["user_id"] for row in rows})
+    for row in rows:
+        row["device_type"] = types.get(row["device_id"])
+        row["user_name"] = names.get(row["user_id"])
+    return rows
 
 
-def get_device_usages(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.DeviceUsage).offset(skip).limit(limit).all()
+def create_device_usage(db: Session, usage: schemas.DeviceUsageCreate):
+    row = _enrich_usages(db, [usage.model_dump()])[0]
+    return _insert_returning_with_device(db, models.DeviceUsage, row)
+
+
+def create_device_usages(db: Session, usages: list):
+    rows = _enrich_usages(db, [usage.model_dump() for usage in usages])
+    return _bulk_insert(db, models.DeviceUsage, rows)
+
+
+def get_device_usages(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+):
+    # start/end 作用在分区键 start_time 上, 分区表可据此裁剪分区
+    stmt = lambda_stmt(lambda: select(models.DeviceUsage).options(
+        joinedload(models.DeviceUsage.device)))
+    if start is not None:
+        stmt += lambda s: s.where(models.DeviceUsage.start_time >= start)
+    if end is not None:
+        stmt += lambda s: s.where(models.DeviceUsage.start_time < end)
+    stmt += lambda s: s.offset(skip).limit(limit)
+    return db.execute(stmt).scalars().all()
+
+
+def get_device_usage_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+):
+    stmt = lambda_stmt(lambda: select(
+        models.DeviceUsage.id,
+        models.DeviceUsage.user_id,
+        models.DeviceUsage.device_id,
+        models.DeviceUsage.start_time,
+        models.DeviceUsage.end_time,
+        models.DeviceUsage.usage_type,
+        models.DeviceUsage.energy_consumed,
+        *_DEVICE_COLUMNS,
+    ).outerjoin(
+        models.Device, models.Device.id == models.DeviceUsage.device_id
+    ))
+    if start is not None:
+        stmt += lambda s: s.where(models.DeviceUsage.start_time >= start)
+    if end is not None:
+        stmt += lambda s: s.where(models.DeviceUsage.start_time < end)
+    stmt += lambda s: s.offset(skip).limit(limit)
+    return [
+        {
+            "user_id": row[1],
+            "device_id": row[2],
+            "start_time": row[3],
+            "end_time": row[4],
+            "usage_type": row[5],
+            "energy_consumed": row[6],
+            "id": row[0],
+            "device": _device_dict(*row[7:]),
+        }
+        for row in db.execute(stmt).all()
+    ]
 
 
 def get_device_usage(db: Session, usage_id: int):
-    return db.query(models.DeviceUsage).filter(
-        models.DeviceUsage.id == usage_id).first()
+    return _get_by_id(db, _DEVICE_USAGE_BY_ID, usage_id)
+
+
+def get_open_device_usage(db: Session, device_id: int, user_id: int = None):
+    """
+    查询设备当前未结束的使用记录。
+    只选取部分索引 ix_device_usages_open 覆盖的列, 可走 index-only scan。
+    """
+    query = db.query(
+        models.DeviceUsage.id,
+        models.DeviceUsage.user_id,
+        models.DeviceUsage.device_id,
+        models.DeviceUsage.start_time,
+    ).filter(
+        models.DeviceUsage.device_id == device_id,
+        models.DeviceUsage.end_time.is_(None),
+    )
+    if user_id is not None:
+        query = query.filter(models.DeviceUsage.user_id == user_id)
+    return query.order_by(models.DeviceUsage.start_time.desc()).first()
+
+
+def close_device_usage(
+    db: Session,
+    db_usage: models.DeviceUsage,
+    close: schemas.DeviceUsageClose,
+):
+    # 已结束的记录保持不变, 重复调用是幂等的
+    if db_usage.end_time is None:
+        db_usage.end_time = close.end_time or datetime.datetime.utcnow()
+        if close.energy_consumed is not None:
+            db_usage.energy_consumed = close.energy_consumed
+        db.commit()
+        db.refresh(db_usage)
+    return db_usage
 
 
 def delete_device_usage(db: Session, usage_id: int):
-    db_usage = (
-        db.query(models.DeviceUsage)
-        .filter(models.DeviceUsage.id == usage_id)
-        .first()
-    )
-    if db_usage:
-        db.delete(db_usage)
-        db.commit()
+    if _delete_returning(db, models.DeviceUsage, usage_id):
         return {"ok": True}
     return {"ok": False, "error": "DeviceUsage not found"}
 
-# 安防事件 CRUD
 
+def bulk_update_device_usages(
+    db: Session,
+    where: schemas.DeviceUsageFilter,
+    values: schemas.DeviceUsageBulkValues,
+):
+    return _bulk_execute(
+        db, models.DeviceUsage,
+        _bulk_conditions(models.DeviceUsage, models.DeviceUsage.start_time,
+                         where),
+        values.model_dump(exclude_unset=True),
+    )
 
-def create_security_event(db: Session, event: schemas.SecurityEventCreate):
-    db_event = models.SecurityEvent(**event.model_dump())
-    db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
-    return db_event
 
+def bulk_delete_device_usages(db: Session, where: schemas.DeviceUsageFilter):
+    # 时间范围作用在分区键 start_time 上, 分区表可据此裁剪分区
+    return _bulk_execute(
+        db, models.DeviceUsage,
+        _bulk_conditions(models.DeviceUsage, models.DeviceUsage.start_time,
+                         where),
+    )
 
-def get_security_events(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.SecurityEvent).offset(skip).limit(limit).all()
+# 安防事件 CRUD
+
+
+def create_security_event(db: Session, event: schemas.SecurityEventCreate):
+    return _insert_returning_with_device(
+        db, models.SecurityEvent, event.model_dump())
+
+
+def create_security_events(db: Session, events: list):
+    return _bulk_insert(
+        db, models.SecurityEvent, [e.model_dump() for e in events])
+
+
+def get_security_events(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+):
+    # start/end 作用在分区键 timestamp 上, 分区表可据此裁剪分区
+    stmt = lambda_stmt(lambda: select(models.SecurityEvent).options(
+        joinedload(models.SecurityEvent.device)))
+    if start is not None:
+        stmt += lambda s: s.where(models.SecurityEvent.timestamp >= start)
+    if end is not None:
+        stmt += lambda s: s.where(models.SecurityEvent.timestamp < end)
+    stmt += lambda s: s.offset(skip).limit(limit)
+    return db.execute(stmt).scalars().all()
+
+
+def get_security_event_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+):
+    stmt = lambda_stmt(lambda: select(
+        models.SecurityEvent.id,
+        models.SecurityEvent.user_id,
+        models.SecurityEvent.device_id,
+        models.SecurityEvent.event_type,
+        models.SecurityEvent.timestamp,
+        *_DEVICE_COLUMNS,
+    ).outerjoin(
+        models.Device, models.Device.id == models.SecurityEvent.device_id
+    ))
+    if start is not None:
+        stmt += lambda s: s.where(models.SecurityEvent.timestamp >= start)
+    if end is not None:
+        stmt += lambda s: s.where(models.SecurityEvent.timestamp < end)
+    stmt += lambda s: s.offset(skip).limit(limit)
+    return [
+        {
+            "user_id": row[1],
+            "device_id": row[2],
+            "event_type": row[3],
+            "timestamp": row[4],
+            "id": row[0],
+            "device": _device_dict(*row[5:]),
+        }
+        for row in db.execute(stmt).all()
+    ]
 
 
 def get_security_event(db: Session, event_id: int):
-    return db.query(models.SecurityEvent).filter(
-        models.SecurityEvent.id == event_id).first()
+    return _get_by_id(db, _SECURITY_EVENT_BY_ID, event_id)
 
 
 def delete_security_event(db: Session, event_id: int):
-    db_event = (
-        db.query(models.SecurityEvent)
-        .filter(models.SecurityEvent.id == event_id)
-        .first()
-    )
-    if db_event:
-        db.delete(db_event)
-        db.commit()
+    if _delete_returning(db, models.SecurityEvent, event_id):
         return {"ok": True}
     return {"ok": False, "error": "SecurityEvent not found"}
 
+
+def bulk_update_security_events(
+    db: Session,
+    where: schemas.SecurityEventFilter,
+    values: schemas.SecurityEventBulkValues,
+):
+    return _bulk_execute(
+        db, models.SecurityEvent,
+        _bulk_conditions(models.SecurityEvent, models.SecurityEvent.timestamp,
+                         where),
+        values.model_dump(exclude_unset=True),
+    )
+
+
+def bulk_delete_security_events(
+    db: Session, where: schemas.SecurityEventFilter
+):
+    return _bulk_execute(
+        db, models.SecurityEvent,
+        _bulk_conditions(models.SecurityEvent, models.SecurityEvent.timestamp,
+                         where),
+    )
+
 # 用户反馈 CRUD
 
 
 def create_feedback(db: Session, feedback: schemas.FeedbackCreate):
-    db_feedback = models.Feedback(**feedback.model_dump())
-    db.add(db_feedback)
-    db.commit()
-    db.refresh(db_feedback)
-    return db_feedback
+    return _insert_returning_with_device(
+        db, models.Feedback, feedback.model_dump())
+
+
+def create_feedbacks(db: Session, feedbacks: list):
+    return _bulk_insert(
+        db, models.Feedback, [f.model_dump() for f in feedbacks])
 
 
 def get_feedbacks(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Feedback).offset(skip).limit(limit).all()
+    return _get_page(db, _FEEDBACKS_PAGE, skip, limit)
+
+
+_FEEDBACK_ROWS_PAGE = select(
+    models.Feedback.id,
+    models.Feedback.user_id,
+    models.Feedback.content,
+    models.Feedback.feedback_type,
+    models.Feedback.device_id,
+    models.Feedback.timestamp,
+    *_DEVICE_COLUMNS,
+).outerjoin(
+    models.Device, models.Device.id == models.Feedback.device_id
+).offset(_SKIP).limit(_LIMIT)
+
+
+def get_feedback_rows(db: Session, skip: int = 0, limit: int = 100):
+    rows = db.execute(
+        _FEEDBACK_ROWS_PAGE, {"skip": skip, "limit": limit}).all()
+    return [
+        {
+            "user_id": row[1],
+            "content": row[2],
+            "feedback_type": row[3],
+            "device_id": row[4],
+            "timestamp": row[5],
+            "id": row[0],
+            "device": _device_dict(*row[6:]),
+        }
+        for row in rows
+    ]
 
 
 def get_feedback(db: Session, feedback_id: int):
-    return db.query(models.Feedback).filter(
-        models.Feedback.id == feedback_id).first()
+    return _get_by_id(db, _FEEDBACK_BY_ID, feedback_id)
 
 
 def delete_feedback(db: Session, feedback_id: int):
-    db_feedback = (
-        db.query(models.Feedback)
-        .filter(models.Feedback.id == feedback_id)
-        .first()
-    )
-    if db_feedback:
-        db.delete(db_feedback)
-        db.commit()
+    if _delete_returning(db, models.Feedback, feedback_id):
         return {"ok": True}
     return {"ok": False, "error": "Feedback not found"}
+
+
+def bulk_update_feedbacks(
+    db: Session,
+    where: schemas.FeedbackFilter,
+    values: schemas.FeedbackBulkValues,
+):
+    return _bulk_execute(
+        db, models.Feedback,
+        _bulk_conditions(models.Feedback, models.Feedback.timestamp, where),
+        values.model_dump(exclude_unset=True),
+    )
+
+
+def bulk_delete_feedbacks(db: Session, where: schemas.FeedbackFilter):
+    return _bulk_execute(
+        db, models.Feedback,
+        _bulk_conditions(models.Feedback, models.Feedback.timestamp, where),
+    )
@@ -0,0 +1,164 @@
+"""
+读取接口的条件请求 (ETag / If-None-Match)。
+
+每张业务表在 table_versions 中有一组版本计数, 由语句级触发器在同一事务内
+递增, 因此版本号与数据同时可见。为避免所有写入争用同一行, 计数按连接
+(pg_backend_pid) 分成若干分片, 表的版本为各分片之和。
+
+接口通过依赖 conditional_get(表名...) 启用:
+  1. 先读取相关表的版本 (一条很小的查询), 再读取数据;
+     期间若有写入, 客户端下一次请求时拿到的是新的 ETag, 不会缓存旧数据
+  2. ETag = W/"hash(路径 + 查询参数 + 各表版本)"
+  3. 与 If-None-Match 匹配时直接返回 304, 不再查询数据
+ETagMiddleware 把依赖计算出的 ETag 写入响应头
+(列表接口直接返回 Response 对象, 无法通过依赖注入的 Response 设置响应头)。
+"""
+import hashlib
+import json
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import get_db
+import metrics
+
+VERSION_SHARDS = 16
+
+# 多个 worker 同时启动时串行执行安装, 避免并发 CREATE OR REPLACE 冲突
+_INSTALL_LOCK_KEY = 729002
+
+VERSIONED_TABLES = (
+    "users", "rooms", "devices", "device_usages", "security_events",
+    "feedbacks",
+)
+
+_INSTALL_SQL = f"""
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name text NOT NULL,
+    shard integer NOT NULL,
+    version bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, shard)
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, shard, version)
+    VALUES (TG_TABLE_NAME, pg_backend_pid() % {VERSION_SHARDS}, 1)
+    ON CONFLICT (table_name, shard)
+    DO UPDATE SET version = table_versions.version + 1;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# 先删除再创建 (同一事务内), 不使用 PostgreSQL 14 才支持的 CREATE OR REPLACE TRIGGER
+_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS {table}_bump_version ON {table};
+CREATE TRIGGER {table}_bump_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+"""
+
+_BUMP_SQL = f"""
+INSERT INTO table_versions (table_name, shard, version)
+VALUES (:table, pg_backend_pid() % {VERSION_SHARDS}, 1)
+ON CONFLICT (table_name, shard)
+DO UPDATE SET version = table_versions.version + 1
+"""
+
+
+def install_version_triggers(engine):
+    """
+    创建 table_versions 及各表的触发器, 可重复执行 (服务启动时调用)。
+    转换为分区表后父表是新建的, 需要重新执行 (manage partitions convert 会调用)。
+    """
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"),
+                     {"key": _INSTALL_LOCK_KEY})
+        conn.execute(text(_INSTALL_SQL))
+        for table in VERSIONED_TABLES:
+            conn.execute(text(_TRIGGER_SQL.format(table=table)))
+
+
+def bump_version(conn, table: str):
+    """不经过 DML 的变更 (如分离分区) 需要手动递增版本。"""
+    conn.execute(text(_BUMP_SQL), {"table": table})
+
+
+def table_versions(db: Session, tables) -> dict:
+    rows = db.execute(
+        text("SELECT table_name, sum(version) FROM table_versions "
+             "WHERE table_name = ANY(:tables) GROUP BY table_name"),
+        {"tables": list(tables)}
+    ).all()
+    versions = {table: 0 for table in tables}
+    versions.update({name: int(version) for name, version in rows})
+    return versions
+
+
+def weak_etag(*parts) -> str:
+    digest = hashlib.sha1(
+        json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # 弱比较: 忽略 W/ 前缀
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def check_not_modified(request: Request, etag: str):
+    """记录本次响应的 ETag; 客户端缓存仍然有效时抛出 304。"""
+    request.state.etag = etag
+    matched = _matches(request, etag)
+    metrics.cache_lookup("etag", hit=matched)
+    if matched:
+        raise HTTPException(status_code=304, headers={"ETag": etag})
+
+
+def conditional_get(*tables, db_dependency=get_db):
+    """
+    返回一个依赖: 按给定表的版本计算 ETag, 命中 If-None-Match 时返回 304。
+    db_dependency 须与路由读取数据所用的依赖相同 (FastAPI 在一次请求内
+    复用同一依赖的结果), 使版本与数据读自同一个会话。
+    """
+    def dependency(request: Request, db: Session = Depends(db_dependency)):
+        versions = table_versions(db, tables)
+        check_not_modified(request, weak_etag(
+            request.url.path, str(request.query_params), versions
+        ))
+    return dependency
+
+
+class ETagMiddleware:
+    """把 request.state.etag 写入 2xx 响应的 ETag 头 (纯 ASGI 中间件)。"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start":
+                etag = scope.get("state", {}).get("etag")
+                status = message["status"]
+                if etag and 200 <= status < 300:
+                    headers = [
+                        (k, v) for k, v in message.get("headers", [])
+                        if k.lower() != b"etag"
+                    ]
+                    headers.append((b"etag", etag.encode("latin-1")))
+                    message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,45 @@
+"""
+列表接口的快速 JSON 响应。
+
+列表查询直接返回数据库中的列 (字典), 这些数据本身就符合 schemas 中的结构,
+不再经过 pydantic 的逐行校验, 直接用 orjson 编码; 未安装 orjson 时退回标准库。
+ndjson_lines() 用于流式接口, 把多行编码为 NDJSON (每行一个 JSON 值)。
+"""
+import datetime
+import decimal
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def ndjson_lines(values) -> bytes:
+    """把若干个值编码为 NDJSON, 每个值一行 (以换行结尾)。"""
+    if orjson is None:
+        return b"".join(
+            json.dumps(v, default=_default, ensure_ascii=False).encode()
+            + b"\n" for v in values
+        )
+    return b"".join(
+        orjson.dumps(v, default=_default, option=orjson.OPT_APPEND_NEWLINE)
+        for v in values
+    )
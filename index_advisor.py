@@ -0,0 +1,166 @@
+"""
+索引顾问: 基于 pg_stat_user_tables / pg_stat_statements 的统计信息,
+报告顺序扫描过多的表, 并为 API 实际执行的查询建议缺失的索引。
+通过 python -m manage index-advisor 调用。
+"""
+import re
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from database import Base
+
+# 这些列在插入时写入, 值随写入顺序递增, 建议使用 BRIN 而不是 B-tree;
+# end_time 在会话结束时才更新, 物理顺序与取值无关, BRIN 几乎无效
+TIME_COLUMNS = {"start_time", "timestamp"}
+
+_TABLE_REF = re.compile(
+    r"\b(?:from|join)\s+\"?(\w+)\"?(?:\s+(?:as\s+)?(?!on\b|where\b|join\b"
+    r"|left\b|inner\b|group\b|order\b|limit\b)(\w+))?",
+    re.IGNORECASE,
+)
+_PREDICATE = re.compile(
+    r"(?:\"?(\w+)\"?\.)?\"?(\w+)\"?\s*(?:=|<>|!=|<=|>=|<|>|\bin\b|\bis\b)",
+    re.IGNORECASE,
+)
+_CLAUSE = re.compile(
+    r"\b(?:where|on)\b(.*?)(?=\bgroup\s+by\b|\border\s+by\b|\blimit\b"
+    r"|\bjoin\b|\breturning\b|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def seq_scan_heavy_tables(conn, min_rows: int = 10000):
+    """
+    返回顺序扫描次数多于索引扫描、且行数超过 min_rows 的表。
+    分区表的统计信息记在各个分区上, 因此结果中可能出现分区名。
+    """
+    rows = conn.execute(text(
+        "SELECT relname, seq_scan, seq_tup_read, "
+        "       COALESCE(idx_scan, 0) AS idx_scan, n_live_tup "
+        "FROM pg_stat_user_tables "
+        "WHERE n_live_tup >= :min_rows "
+        "  AND seq_scan > COALESCE(idx_scan, 0) "
+        "ORDER BY seq_tup_read DESC"
+    ), {"min_rows": min_rows}).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def existing_leading_columns(conn):
+    """{表名: {索引首列}}, 用于判断某列是否已被索引覆盖。"""
+    rows = conn.execute(text(
+        "SELECT t.relname, a.attname "
+        "FROM pg_index i "
+        "JOIN pg_class t ON t.oid = i.indrelid "
+        "JOIN pg_attribute a "
+        "  ON a.attrelid = t.oid AND a.attnum = i.indkey[0] "
+        "WHERE pg_table_is_visible(t.oid)"
+    )).all()
+    leading = {}
+    for table, column in rows:
+        leading.setdefault(table, set()).add(column)
+    return leading
+
+
+def missing_model_indexes(conn):
+    """models.py 中声明、但数据库中尚不存在的索引 (create_all 不会补建)。"""
+    existing = set(conn.execute(text(
+        "SELECT indexname FROM pg_indexes "
+        "WHERE schemaname = current_schema()"
+    )).scalars())
+    tables = set(conn.execute(text(
+        "SELECT tablename FROM pg_tables "
+        "WHERE schemaname = current_schema()"
+    )).scalars())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        for index in table.indexes:
+            if index.name not in existing:
+                missing.append(index)
+    return missing
+
+
+def create_index_sql(index) -> str:
+    return str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+
+
+def pg_stat_statements_available(conn) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'"
+    )).first() is not None
+
+
+def top_statements(conn, limit: int = 50):
+    return conn.execute(text(
+        "SELECT query, calls, total_exec_time, mean_exec_time "
+        "FROM pg_stat_statements "
+        "WHERE dbid = (SELECT oid FROM pg_database "
+        "              WHERE datname = current_database()) "
+        "ORDER BY total_exec_time DESC LIMIT :limit"
+    ), {"limit": limit}).mappings().all()
+
+
+def predicate_columns(query: str, model_columns: dict):
+    """
+    粗略解析一条 SQL 中 WHERE/ON 子句里出现的 (表, 列)。
+    只识别 models.py 中存在的表和列, 解析不了的部分直接忽略。
+    """
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(query):
+        if table in model_columns:
+            aliases[table] = table
+            if alias:
+                aliases[alias] = table
+    found = set()
+    for clause in _CLAUSE.findall(query):
+        for qualifier, column in _PREDICATE.findall(clause):
+            if qualifier:
+                table = aliases.get(qualifier)
+                if table and column in model_columns[table]:
+                    found.add((table, column))
+                continue
+            # 未加限定的列名, 只有唯一匹配一个表时才归属
+            owners = {t for t in set(aliases.values())
+                      if column in model_columns[t]}
+            if len(owners) == 1:
+                found.add((owners.pop(), column))
+    return found
+
+
+def suggest_indexes(conn, limit: int = 50):
+    """
+    根据 pg_stat_statements 中耗时最多的查询, 建议缺失的单列索引。
+    返回按累计耗时排序的 [{table, column, method, calls, total_ms, sql}]。
+    """
+    model_columns = {
+        table.name: {column.name for column in table.columns}
+        for table in Base.metadata.sorted_tables
+    }
+    leading = existing_leading_columns(conn)
+    suggestions = {}
+    for row in top_statements(conn, limit):
+        for table, column in predicate_columns(row["query"], model_columns):
+            if column == "id" or column in leading.get(table, set()):
+                continue
+            item = suggestions.setdefault((table, column), {
+                "table": table,
+                "column": column,
+                "method": "brin" if column in TIME_COLUMNS else "btree",
+                "calls": 0,
+                "total_ms": 0.0,
+            })
+            item["calls"] += row["calls"]
+            item["total_ms"] += row["total_exec_time"]
+    result = sorted(
+        suggestions.values(), key=lambda item: item["total_ms"], reverse=True
+    )
+    for item in result:
+        item["sql"] = (
+            f"CREATE INDEX ix_{item['table']}_{item['column']}"
+            f"{'_brin' if item['method'] == 'brin' else ''} "
+            f"ON {item['table']} USING {item['method']} ({item['column']});"
+        )
+    return result
@@ -0,0 +1,184 @@
+"""
+跨 worker 的缓存失效通知 (PostgreSQL LISTEN/NOTIFY)。
+
+多个 uvicorn worker 各自持有进程内缓存 (refcache 参照数据、nlp_query 的
+schema 提示词), 某个 worker 写入后其它 worker 的缓存会过期。这里不引入
+外部消息队列, 直接使用数据库的 NOTIFY:
+
+- users / rooms / devices 上的语句级触发器在写入时执行
+  pg_notify('cache_invalidate_<表名>'), 通知在事务提交时才投递,
+  同一事务内的重复通知会被合并
+- 改变表结构的运维命令 (manage partitions ...) 调用 notify(conn, "schema")
+- 每个 worker 启动一个后台线程, 用一条独立于连接池的连接 LISTEN 这些频道,
+  收到通知后调用 register() 登记的回调
+- 连接断开时按指数退避重连; 断开期间可能漏掉通知,
+  因此重连成功后会调用所有回调, 全部失效一次
+
+环境变量 CACHE_INVALIDATION_ENABLED=0 可关闭监听线程。
+"""
+import os
+import select
+import threading
+
+from sqlalchemy import text
+
+CACHE_INVALIDATION_ENABLED = os.getenv(
+    "CACHE_INVALIDATION_ENABLED", "1") != "0"
+
+CHANNEL_PREFIX = "cache_invalidate_"
+NOTIFY_TABLES = ("users", "rooms", "devices")
+SCHEMA = "schema"
+
+_INSTALL_LOCK_KEY = 729003
+
+_INSTALL_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_cache_invalidation() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANNEL_PREFIX}' || TG_TABLE_NAME, '');
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# 先删除再创建 (同一事务内), 不使用 PostgreSQL 14 才支持的 CREATE OR REPLACE TRIGGER
+_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS {table}_notify_cache_invalidation ON {table};
+CREATE TRIGGER {table}_notify_cache_invalidation
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation()
+"""
+
+# 频道名 (不含前缀) -> 回调列表
+_callbacks = {}
+_callbacks_lock = threading.Lock()
+
+
+def register(name: str, callback):
+    """登记收到 name (表名或 "schema") 的失效通知时调用的函数。"""
+    with _callbacks_lock:
+        _callbacks.setdefault(name, []).append(callback)
+
+
+def dispatch(name: str = None):
+    """调用 name 对应的回调; name 为 None 时调用全部回调。"""
+    with _callbacks_lock:
+        if name is None:
+            callbacks = [cb for cbs in _callbacks.values() for cb in cbs]
+        else:
+            callbacks = list(_callbacks.get(name, ()))
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print(f"[ERROR] Cache invalidation callback failed: {e}")
+
+
+def install_triggers(engine):
+    """创建通知函数与触发器, 可重复执行 (服务启动时调用)。"""
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"),
+                     {"key": _INSTALL_LOCK_KEY})
+        conn.execute(text(_INSTALL_SQL))
+        for table in NOTIFY_TABLES:
+            conn.execute(text(_TRIGGER_SQL.format(table=table)))
+
+
+def notify(conn, name: str):
+    """在 conn 的事务中发送失效通知, 随事务提交投递。"""
+    conn.execute(text("SELECT pg_notify(:channel, '')"),
+                 {"channel": CHANNEL_PREFIX + name})
+
+
+class Listener(threading.Thread):
+    """后台监听线程, 每个 worker 一个。"""
+
+    def __init__(self, engine, poll_seconds: float = 5.0,
+                 max_backoff: float = 30.0):
+        super().__init__(name="cache-invalidation-listener", daemon=True)
+        self.engine = engine
+        self.poll_seconds = poll_seconds
+        self.max_backoff = max_backoff
+        self._stopping = threading.Event()
+
+    def _connect(self):
+        # 从连接池取出后 detach, 这条连接不再归还连接池, 由本线程独占
+        conn = self.engine.raw_connection()
+        dbapi_conn = conn.driver_connection
+        conn.detach()
+        dbapi_conn.autocommit = True
+        with dbapi_conn.cursor() as cursor:
+            for name in (*NOTIFY_TABLES, SCHEMA):
+                cursor.execute(f'LISTEN "{CHANNEL_PREFIX}{name}"')
+        return conn, dbapi_conn
+
+    def _listen(self, dbapi_conn):
+        if not hasattr(dbapi_conn, "poll"):
+            return self._listen_psycopg3(dbapi_conn)
+        while not self._stopping.is_set():
+            readable, _, _ = select.select(
+                [dbapi_conn], [], [], self.poll_seconds)
+            if not readable:
+                # 空闲时探测连接是否仍然可用, 断开则抛出异常进入重连
+                with dbapi_conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                continue
+            dbapi_conn.poll()
+            names = set()
+            while dbapi_conn.notifies:
+                names.add(dbapi_conn.notifies.pop(0).channel)
+            for channel in names:
+                dispatch(channel[len(CHANNEL_PREFIX):])
+
+    def _listen_psycopg3(self, dbapi_conn):
+        while not self._stopping.is_set():
+            for notify in dbapi_conn.notifies(timeout=self.poll_seconds):
+                dispatch(notify.channel[len(CHANNEL_PREFIX):])
+            dbapi_conn.execute("SELECT 1")
+
+    def run(self):
+        backoff = 1.0
+        first = True
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn, dbapi_conn = self._connect()
+                if not first:
+                    # 断开期间可能漏掉了通知
+                    print("[INFO] Cache invalidation listener reconnected.")
+                    dispatch()
+                first = False
+                backoff = 1.0
+                self._listen(dbapi_conn)
+            except Exception as e:
+                print(f"[WARN] Cache invalidation listener error: {e}, "
+                      f"retrying in {backoff:.0f}s")
+                first = False
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def stop(self):
+        self._stopping.set()
+
+
+_listener = None
+
+
+def start_listener(engine):
+    global _listener
+    if not CACHE_INVALIDATION_ENABLED or _listener is not None:
+        return
+    _listener = Listener(engine)
+    _listener.start()
+
+
+def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,21 +1,101 @@
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import os
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text, inspect
+from typing import Optional
+from datetime import datetime
 import schemas
 import crud
-from database import engine, Base, get_db
+from database import (
+    engine, read_engine, Base, get_db, get_read_db, read_db_dependency,
+    read_session, CRUD_READ_MAX_LAG_SECONDS,
+)
+from fast_response import FastJSONResponse, ndjson_lines
 from analysis import router as analysis_router
 from nlp_query import router as nlp_router
+import etag
+import invalidation
+import metrics
+import profiling
+import rate_limit
+import retention
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+# 流式 SQL 查询每次从服务端游标取出的行数
+SQL_STREAM_BATCH_SIZE = int(os.getenv("SQL_STREAM_BATCH_SIZE", "1000"))
+
+# 小于该字节数的响应不压缩
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
 
 # 创建表
 Base.metadata.create_all(bind=engine)
+# 读取接口 ETag 所需的表版本计数与触发器
+etag.install_version_triggers(engine)
+# 参照数据表写入时通知各 worker 使缓存失效
+invalidation.install_triggers(engine)
+# 按请求统计 SQL 语句数与执行时间 (Server-Timing 的 db 段)
+profiling.instrument_engines(engine, read_engine)
+# Prometheus 指标: 全部 SQL 语句的执行时间与连接池状态
+metrics.instrument_engines(primary=engine, read=read_engine)
 
 app = FastAPI(
     title="智能家居数据管理与分析系统API",
     description="提供对智能家居系统数据的CRUD操作、数据分析和自然语言查询功能。",
     version="1.2.0",
 )
+# 记录接口函数的返回时间, 用于区分计算与序列化耗时
+app.router.route_class = profiling.TimedRoute
+
+# ETag 中间件在内层, 压缩在外层; 安装了 brotli-asgi 时优先使用 brotli,
+# 客户端不支持 br 时自动退回 gzip
+app.add_middleware(etag.ETagMiddleware)
+if BrotliMiddleware is not None:
+    app.add_middleware(
+        BrotliMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE,
+        gzip_fallback=True
+    )
+else:
+    app.add_middleware(
+        GZipMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE,
+        compresslevel=GZIP_LEVEL
+    )
+# 耗时分解 (Server-Timing) 在压缩外层, 压缩时间计入序列化
+app.add_middleware(profiling.ProfilingMiddleware)
+# 优先级通道与限流在指标之内的最外层, 被拒绝的请求不再经过压缩等中间件
+app.add_middleware(rate_limit.PriorityLaneMiddleware)
+# 请求数与耗时指标在最外层, 被限流拒绝的请求也计入
+app.add_middleware(metrics.MetricsMiddleware)
+
+# CRUD 读取接口的会话: 配置了只读副本时, 副本延迟不超过
+# CRUD_READ_MAX_LAG_SECONDS 才走副本。ETag 依赖使用同一个依赖对象,
+# 保证表版本与数据来自同一个会话 (同一个库)。
+get_crud_read_db = read_db_dependency(CRUD_READ_MAX_LAG_SECONDS)
+
+
+def crud_etag(*tables):
+    return Depends(
+        etag.conditional_get(*tables, db_dependency=get_crud_read_db))
+
+
+# 各读取接口依赖的表: 其中任一表有写入, ETag 即变化
+users_etag = crud_etag(
+    "users", "device_usages", "security_events", "feedbacks", "devices"
+)
+rooms_etag = crud_etag("rooms", "devices")
+devices_etag = crud_etag("devices", "rooms")
+# 开放会话查询属于写入链路 (开始/结束会话), 始终读主库
+open_usage_etag = Depends(etag.conditional_get("device_usages"))
+device_usages_etag = crud_etag("device_usages", "devices")
+security_events_etag = crud_etag("security_events", "devices")
+feedbacks_etag = crud_etag("feedbacks", "devices")
 
 app.include_router(analysis_router, prefix="/analysis", tags=["数据分析与可视化"])
 app.include_router(nlp_router, prefix="/nlp", tags=["智能问答(NLP)"])
@@ -23,6 +103,37 @@ app.include_router(nlp_router, prefix="/nlp", tags=["智能问答(NLP)"])
 # 依赖项：获取数据库会话 - 已移至 database.py
 
 
+@app.on_event("startup")
+def start_invalidation_listener():
+    invalidation.start_listener(engine)
+
+
+@app.on_event("shutdown")
+def stop_invalidation_listener():
+    invalidation.stop_listener()
+
+
+@app.on_event("startup")
+async def start_retention_job():
+    # 可选的后台保留任务, 由 RETENTION_INTERVAL_HOURS 控制
+    if retention.RETENTION_INTERVAL_HOURS > 0:
+        asyncio.create_task(retention.run_periodically(
+            engine, retention.RETENTION_INTERVAL_HOURS
+        ))
+
+
+def check_bulk_request(where, values=None):
+    # 批量接口不允许无条件地修改整张表
+    if not where.model_dump(exclude_none=True):
+        raise HTTPException(
+            status_code=400, detail="At least one filter is required"
+        )
+    if values is not None and not values.model_dump(exclude_unset=True):
+        raise HTTPException(
+            status_code=400, detail="At least one value to update is required"
+        )
+
+
 # 用户相关API
 
 
@@ -31,13 +142,25 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return crud.create_user(db, user)
 
 
-@app.get("/users/", response_model=list[schemas.UserOut])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@app.post("/users/bulk")
+def create_users(
+    users: list[schemas.UserCreate], db: Session = Depends(get_db)
+):
+    return crud.create_users(db, users)
+
+
+@app.get("/users/", response_model=list[schemas.UserOut],
+         dependencies=[users_etag])
+def read_users(
+    skip: int = 0, limit: int = 100,
+    db: Session = Depends(get_crud_read_db)
+):
     return crud.get_users(db, skip=skip, limit=limit)
 
 
-@app.get("/users/{user_id}", response_model=schemas.UserOut)
-def read_user(user_id: int, db: Session = Depends(get_db)):
+@app.get("/users/{user_id}", response_model=schemas.UserOut,
+         dependencies=[users_etag])
+def read_user(user_id: int, db: Session = Depends(get_crud_read_db)):
     db_user = crud.get_user(db, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -63,13 +186,25 @@ def create_room(room: schemas.RoomCreate, db: Session = Depends(get_db)):
     return crud.create_room(db, room)
 
 
-@app.get("/rooms/", response_model=list[schemas.RoomOut])
-def read_rooms(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@app.post("/rooms/bulk")
+def create_rooms(
+    rooms: list[schemas.RoomCreate], db: Session = Depends(get_db)
+):
+    return crud.create_rooms(db, rooms)
+
+
+@app.get("/rooms/", response_model=list[schemas.RoomOut],
+         dependencies=[rooms_etag])
+def read_rooms(
+    skip: int = 0, limit: int = 100,
+    db: Session = Depends(get_crud_read_db)
+):
     return crud.get_rooms(db, skip=skip, limit=limit)
 
 
-@app.get("/rooms/{room_id}", response_model=schemas.RoomOut)
-def read_room(room_id: int, db: Session = Depends(get_db)):
+@app.get("/rooms/{room_id}", response_model=schemas.RoomOut,
+         dependencies=[rooms_etag])
+def read_room(room_id: int, db: Session = Depends(get_crud_read_db)):
     db_room = crud.get_room(db, room_id)
     if db_room is None:
         raise HTTPException(status_code=404, detail="Room not found")
@@ -88,16 +223,25 @@ def create_device(device: schemas.DeviceCreate, db: Session = Depends(get_db)):
     return crud.create_device(db, device)
 
 
-@app.get("/devices/", response_model=list[schemas.DeviceOut])
+@app.post("/devices/bulk")
+def create_devices(
+    devices: list[schemas.DeviceCreate], db: Session = Depends(get_db)
+):
+    return crud.create_devices(db, devices)
+
+
+@app.get("/devices/", response_model=list[schemas.DeviceOut],
+         dependencies=[devices_etag])
 def read_devices(
         skip: int = 0,
         limit: int = 100,
-        db: Session = Depends(get_db)):
-    return crud.get_devices(db, skip=skip, limit=limit)
+        db: Session = Depends(get_crud_read_db)):
+    return FastJSONResponse(crud.get_device_rows(db, skip=skip, limit=limit))
 
 
-@app.get("/devices/{device_id}", response_model=schemas.DeviceOut)
-def read_device(device_id: int, db: Session = Depends(get_db)):
+@app.get("/devices/{device_id}", response_model=schemas.DeviceOut,
+         dependencies=[devices_etag])
+def read_device(device_id: int, db: Session = Depends(get_crud_read_db)):
     db_device = crud.get_device(db, device_id)
     if db_device is None:
         raise HTTPException(status_code=404, detail="Device not found")
@@ -108,6 +252,22 @@ def read_device(device_id: int, db: Session = Depends(get_db)):
 def delete_device(device_id: int, db: Session = Depends(get_db)):
     return crud.delete_device(db, device_id)
 
+
+@app.get(
+    "/devices/{device_id}/open_usage",
+    response_model=schemas.OpenDeviceUsage,
+    dependencies=[open_usage_etag],
+)
+def read_open_device_usage(
+    device_id: int,
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    open_usage = crud.get_open_device_usage(db, device_id, user_id=user_id)
+    if open_usage is None:
+        raise HTTPException(status_code=404, detail="No open DeviceUsage")
+    return open_usage
+
 # 设备使用记录API
 
 
@@ -118,25 +278,76 @@ def create_device_usage(
     return crud.create_device_usage(db, usage)
 
 
-@app.get("/device_usages/", response_model=list[schemas.DeviceUsage])
+@app.post("/device_usages/bulk")
+def create_device_usages(
+    usages: list[schemas.DeviceUsageCreate], db: Session = Depends(get_db)
+):
+    return crud.create_device_usages(db, usages)
+
+
+@app.get("/device_usages/", response_model=list[schemas.DeviceUsage],
+         dependencies=[device_usages_etag])
 def read_device_usages(
-    skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+    skip: int = 0,
+    limit: int = 100,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_crud_read_db)
 ):
-    return crud.get_device_usages(db, skip=skip, limit=limit)
+    return FastJSONResponse(crud.get_device_usage_rows(
+        db, skip=skip, limit=limit,
+        start=schemas.to_naive_utc(start), end=schemas.to_naive_utc(end)
+    ))
 
 
-@app.get("/device_usages/{usage_id}", response_model=schemas.DeviceUsage)
-def read_device_usage(usage_id: int, db: Session = Depends(get_db)):
+@app.get("/device_usages/{usage_id}", response_model=schemas.DeviceUsage,
+         dependencies=[device_usages_etag])
+def read_device_usage(usage_id: int, db: Session = Depends(get_crud_read_db)):
     db_usage = crud.get_device_usage(db, usage_id)
     if db_usage is None:
         raise HTTPException(status_code=404, detail="DeviceUsage not found")
     return db_usage
 
 
+@app.patch(
+    "/device_usages/{usage_id}/close", response_model=schemas.DeviceUsage
+)
+def close_device_usage(
+    usage_id: int,
+    close: Optional[schemas.DeviceUsageClose] = None,
+    db: Session = Depends(get_db)
+):
+    db_usage = crud.get_device_usage(db, usage_id)
+    if db_usage is None:
+        raise HTTPException(status_code=404, detail="DeviceUsage not found")
+    close = close or schemas.DeviceUsageClose()
+    if close.end_time is not None and close.end_time < db_usage.start_time:
+        raise HTTPException(
+            status_code=400, detail="end_time must not be before start_time"
+        )
+    return crud.close_device_usage(db, db_usage, close)
+
+
 @app.delete("/device_usages/{usage_id}")
 def delete_device_usage(usage_id: int, db: Session = Depends(get_db)):
     return crud.delete_device_usage(db, usage_id)
 
+
+@app.post("/device_usages/bulk_update", response_model=schemas.BulkResult)
+def bulk_update_device_usages(
+    payload: schemas.DeviceUsageBulkUpdate, db: Session = Depends(get_db)
+):
+    check_bulk_request(payload.where, payload.values)
+    return crud.bulk_update_device_usages(db, payload.where, payload.values)
+
+
+@app.post("/device_usages/bulk_delete", response_model=schemas.BulkResult)
+def bulk_delete_device_usages(
+    where: schemas.DeviceUsageFilter, db: Session = Depends(get_db)
+):
+    check_bulk_request(where)
+    return crud.bulk_delete_device_usages(db, where)
+
 # 安防事件API
 
 
@@ -147,15 +358,35 @@ def create_security_event(
     return crud.create_security_event(db, event)
 
 
-@app.get("/security_events/", response_model=list[schemas.SecurityEvent])
+@app.post("/security_events/bulk")
+def create_security_events(
+    events: list[schemas.SecurityEventCreate], db: Session = Depends(get_db)
+):
+    return crud.create_security_events(db, events)
+
+
+@app.get("/security_events/",
+         response_model=list[schemas.SecurityEvent],
+         dependencies=[security_events_etag])
 def read_security_events(
-    skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+    skip: int = 0,
+    limit: int = 100,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_crud_read_db)
 ):
-    return crud.get_security_events(db, skip=skip, limit=limit)
+    return FastJSONResponse(crud.get_security_event_rows(
+        db, skip=skip, limit=limit,
+        start=schemas.to_naive_utc(start), end=schemas.to_naive_utc(end)
+    ))
 
 
-@app.get("/security_events/{event_id}", response_model=schemas.SecurityEvent)
-def read_security_event(event_id: int, db: Session = Depends(get_db)):
+@app.get("/security_events/{event_id}",
+         response_model=schemas.SecurityEvent,
+         dependencies=[security_events_etag])
+def read_security_event(
+    event_id: int, db: Session = Depends(get_crud_read_db)
+):
     db_event = crud.get_security_event(db, event_id)
     if db_event is None:
         raise HTTPException(status_code=404, detail="SecurityEvent not found")
@@ -166,6 +397,22 @@ def read_security_event(event_id: int, db: Session = Depends(get_db)):
 def delete_security_event(event_id: int, db: Session = Depends(get_db)):
     return crud.delete_security_event(db, event_id)
 
+
+@app.post("/security_events/bulk_update", response_model=schemas.BulkResult)
+def bulk_update_security_events(
+    payload: schemas.SecurityEventBulkUpdate, db: Session = Depends(get_db)
+):
+    check_bulk_request(payload.where, payload.values)
+    return crud.bulk_update_security_events(db, payload.where, payload.values)
+
+
+@app.post("/security_events/bulk_delete", response_model=schemas.BulkResult)
+def bulk_delete_security_events(
+    where: schemas.SecurityEventFilter, db: Session = Depends(get_db)
+):
+    check_bulk_request(where)
+    return crud.bulk_delete_security_events(db, where)
+
 # 用户反馈API
 
 
@@ -176,16 +423,27 @@ def create_feedback(
     return crud.create_feedback(db, feedback)
 
 
-@app.get("/feedbacks/", response_model=list[schemas.Feedback])
+@app.post("/feedbacks/bulk")
+def create_feedbacks(
+    feedbacks: list[schemas.FeedbackCreate], db: Session = Depends(get_db)
+):
+    return crud.create_feedbacks(db, feedbacks)
+
+
+@app.get("/feedbacks/", response_model=list[schemas.Feedback],
+         dependencies=[feedbacks_etag])
 def read_feedbacks(
         skip: int = 0,
         limit: int = 100,
-        db: Session = Depends(get_db)):
-    return crud.get_feedbacks(db, skip=skip, limit=limit)
+        db: Session = Depends(get_crud_read_db)):
+    return FastJSONResponse(
+        crud.get_feedback_rows(db, skip=skip, limit=limit)
+    )
 
 
-@app.get("/feedbacks/{feedback_id}", response_model=schemas.Feedback)
-def read_feedback(feedback_id: int, db: Session = Depends(get_db)):
+@app.get("/feedbacks/{feedback_id}", response_model=schemas.Feedback,
+         dependencies=[feedbacks_etag])
+def read_feedback(feedback_id: int, db: Session = Depends(get_crud_read_db)):
     db_feedback = crud.get_feedback(db, feedback_id)
     if db_feedback is None:
         raise HTTPException(status_code=404, detail="Feedback not found")
@@ -197,11 +455,50 @@ def delete_feedback(feedback_id: int, db: Session = Depends(get_db)):
     return crud.delete_feedback(db, feedback_id)
 
 
+@app.post("/feedbacks/bulk_update", response_model=schemas.BulkResult)
+def bulk_update_feedbacks(
+    payload: schemas.FeedbackBulkUpdate, db: Session = Depends(get_db)
+):
+    check_bulk_request(payload.where, payload.values)
+    return crud.bulk_update_feedbacks(db, payload.where, payload.values)
+
+
+@app.post("/feedbacks/bulk_delete", response_model=schemas.BulkResult)
+def bulk_delete_feedbacks(
+    where: schemas.FeedbackFilter, db: Session = Depends(get_db)
+):
+    check_bulk_request(where)
+    return crud.bulk_delete_feedbacks(db, where)
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus 文本格式的指标, 见 metrics.py。"""
+    content, content_type = metrics.render()
+    return Response(content=content, media_type=content_type)
+
+
+@app.get("/api/route_timings", tags=["高级功能"])
+def get_route_timings(reset: bool = False):
+    """
+    本进程内各路由的请求数、平均/最大耗时、平均 SQL 语句数与各段平均耗时
+    (db / compute / render / serialise), 按总耗时从高到低排列。
+    reset=true 时返回后清空统计。
+    """
+    stats = profiling.route_stats()
+    if reset:
+        profiling.reset_route_stats()
+    return stats
+
+
 @app.get("/api/schema_for_completion", tags=["高级功能"])
-def get_schema_for_completion(db: Session = Depends(get_db)):
+def get_schema_for_completion(
+    request: Request, db: Session = Depends(get_db)
+):
     """
     获取数据库的schema，用于前端自动补全。
     返回一个包含所有表名及其列名的字典。
+    ETag 为内容的哈希, schema 未变化时返回 304。
     """
     try:
         inspector = inspect(engine)
@@ -210,13 +507,14 @@ def get_schema_for_completion(db: Session = Depends(get_db)):
         for table_name in table_names:
             columns = inspector.get_columns(table_name)
             schema[table_name] = [col['name'] for col in columns]
-        return schema
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取schema失败: {e}")
+    etag.check_not_modified(request, etag.weak_etag(schema))
+    return schema
 
 
 @app.post("/api/sql_query", tags=["高级功能"])
-async def sql_query(payload: dict, db: Session = Depends(get_db)):
+def sql_query(payload: dict, db: Session = Depends(get_read_db)):
     sql = payload.get("sql", "")
     # 只允许SELECT，防止危险操作
     if not sql.strip().lower().startswith("select"):
@@ -231,6 +529,46 @@ async def sql_query(payload: dict, db: Session = Depends(get_db)):
         return JSONResponse(content={"success": False, "error": str(e)})
 
 
+def stream_sql_rows(sql: str):
+    """
+    逐批读取服务端游标 (yield_per), 编码为 NDJSON:
+    第一行 {"columns": [...]}, 之后每行是一行数据 (数组),
+    最后一行 {"done": true, "rows": 行数}; 出错时最后一行为 {"error": ...}。
+    响应开始发送后依赖注入的会话可能已关闭, 因此在生成器内自己创建会话。
+    """
+    rows = 0
+    with read_session() as db:
+        try:
+            result = db.execute(
+                text(sql),
+                execution_options={"yield_per": SQL_STREAM_BATCH_SIZE}
+            )
+            if not result.returns_rows:
+                yield ndjson_lines([{"error": "该语句不返回结果集"}])
+                return
+            yield ndjson_lines([{"columns": list(result.keys())}])
+            for batch in result.partitions():
+                rows += len(batch)
+                yield ndjson_lines(tuple(row) for row in batch)
+        except Exception as e:
+            yield ndjson_lines([{"error": str(e)}])
+            return
+    yield ndjson_lines([{"done": True, "rows": rows}])
+
+
+@app.post("/api/sql_query/stream", tags=["高级功能"])
+def sql_query_stream(payload: dict):
+    """与 /api/sql_query 相同, 但以 NDJSON 流式返回, 适合大结果集。"""
+    sql = payload.get("sql", "")
+    if not sql.strip().lower().startswith("select"):
+        return JSONResponse(
+            content={"success": False, "error": "只允许SELECT查询！"}
+        )
+    return StreamingResponse(
+        stream_sql_rows(sql), media_type="application/x-ndjson"
+    )
+
+
 @app.get("/", tags=["系统"])
 def read_root():
     return {"message": "欢迎使用智能家居数据管理与分析系统API。请访问 /docs 查看API文档。"}
@@ -0,0 +1,307 @@
+"""
+数据库运维命令入口, 用法: python -m manage <命令> [参数]
+
+  partitions convert   将 device_usages / security_events 转换为按月分区表
+  partitions create    预先创建未来的月分区
+  partitions detach    分离 (可选归档、删除) 过期分区
+  partitions list      列出现有分区
+  index-advisor        报告顺序扫描过多的表, 建议缺失的索引
+  retention            汇总、归档并删除超过保留期的原始使用记录
+  backfill-usage-denorm  补全历史使用记录的 device_type / user_name
+  create-read-role     创建只读角色, 供 READ_DATABASE_URL 使用
+"""
+import argparse
+import datetime
+import sys
+
+from sqlalchemy import text
+
+from database import engine, Base
+import models  # noqa: F401  注册所有模型
+import etag
+import index_advisor
+import invalidation
+import migrations
+import partitioning
+import retention
+
+
+def _partition_tables(args):
+    if args.table:
+        return [args.table]
+    return list(partitioning.PARTITIONED_TABLES)
+
+
+def _notify_schema_changed():
+    # 表结构变化, 通知各 worker 重新生成缓存的 schema 提示词
+    with engine.begin() as conn:
+        invalidation.notify(conn, invalidation.SCHEMA)
+
+
+def cmd_partitions(args):
+    if args.action == "convert":
+        Base.metadata.create_all(bind=engine)
+        for table in _partition_tables(args):
+            result = partitioning.convert_to_partitioned(
+                engine, table, months_ahead=args.months_ahead
+            )
+            if result["converted"]:
+                print(f"[INFO] {table}: 已转换为分区表, "
+                      f"共创建 {result['partitions']} 个月分区。")
+            else:
+                print(f"[INFO] {table}: 已经是分区表, 跳过。")
+        # 新建的分区父表上没有 ETag 版本触发器
+        etag.install_version_triggers(engine)
+        _notify_schema_changed()
+    elif args.action == "create":
+        for table in _partition_tables(args):
+            created = partitioning.create_partitions(
+                engine, table, datetime.date.today(), args.months_ahead + 1
+            )
+            print(f"[INFO] {table}: 新建分区 {created or '无'}")
+        _notify_schema_changed()
+    elif args.action == "detach":
+        today = datetime.date.today()
+        older_than = partitioning.add_months(
+            partitioning.month_floor(today), -args.older_than_months
+        )
+        for table in _partition_tables(args):
+            detached = partitioning.detach_partitions(
+                engine, table, older_than,
+                archive_dir=args.archive_dir, drop=args.drop
+            )
+            if detached:
+                # DETACH 不触发 DML 触发器, 手动递增版本使 ETag 失效
+                with engine.begin() as conn:
+                    etag.bump_version(conn, table)
+            print(f"[INFO] {table}: 已分离分区 {detached or '无'}")
+        _notify_schema_changed()
+    elif args.action == "list":
+        with engine.connect() as conn:
+            for table in _partition_tables(args):
+                print(f"-- {table}")
+                for name, bound in partitioning.list_partitions(conn, table):
+                    print(f"   {name}: {bound}")
+
+
+def cmd_index_advisor(args):
+    with engine.connect() as conn:
+        print("== 顺序扫描过多的表 ==")
+        heavy = index_advisor.seq_scan_heavy_tables(conn, args.min_rows)
+        for row in heavy:
+            print(f"   {row['relname']}: seq_scan={row['seq_scan']} "
+                  f"idx_scan={row['idx_scan']} "
+                  f"seq_tup_read={row['seq_tup_read']} "
+                  f"rows={row['n_live_tup']}")
+        if not heavy:
+            print("   无")
+
+        print("== models.py 中声明但数据库缺失的索引 ==")
+        missing = index_advisor.missing_model_indexes(conn)
+        for index in missing:
+            print(f"   {index_advisor.create_index_sql(index)};")
+        if not missing:
+            print("   无")
+
+        print("== 基于 pg_stat_statements 的索引建议 ==")
+        if index_advisor.pg_stat_statements_available(conn):
+            suggestions = index_advisor.suggest_indexes(conn, args.limit)
+            for item in suggestions:
+                print(f"   {item['sql']}  -- calls={item['calls']} "
+                      f"total={item['total_ms']:.1f}ms")
+            if not suggestions:
+                print("   无")
+        else:
+            print("   未安装 pg_stat_statements 扩展, 跳过。"
+                  "(需在 shared_preload_libraries 中加载并执行 "
+                  "CREATE EXTENSION pg_stat_statements)")
+
+    if args.apply and missing:
+        # 普通表使用 CONCURRENTLY 建索引, 不阻塞写入; 分区父表不支持
+        with engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as conn:
+            for index in missing:
+                sql = index_advisor.create_index_sql(index)
+                if not partitioning.is_partitioned(conn, index.table.name):
+                    sql = sql.replace(
+                        "CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+                conn.execute(text(sql))
+                print(f"[INFO] 已创建索引 {index.name}")
+
+
+def cmd_retention(args):
+    if args.dry_run:
+        expired = retention.count_expired(engine, args.horizon_days)
+        print(f"[INFO] 早于 {retention.retention_cutoff(args.horizon_days)} "
+              f"的原始使用记录共 {expired} 条。")
+        return
+    Base.metadata.create_all(bind=engine)
+    stats = retention.run_retention(
+        engine,
+        horizon_days=args.horizon_days,
+        archive_dir=args.archive_dir,
+        fmt=args.format,
+        batch_size=args.batch_size,
+        max_batches=args.max_batches,
+    )
+    if stats["archive"] is None:
+        print("[INFO] 其它进程正在执行保留任务, 本次跳过。")
+        return
+    print(f"[INFO] 已汇总并归档 {stats['moved']} 条记录 "
+          f"({stats['batches']} 批), 截止 {stats['cutoff']}, "
+          f"归档位置: {stats['archive']}")
+
+
+def cmd_backfill_usage_denorm(args):
+    def progress(current, last, updated):
+        print(f"[INFO] id <= {current}/{last}, 已更新 {updated} 行")
+
+    updated = migrations.backfill_usage_denorm(
+        engine, batch_size=args.batch_size, progress=progress
+    )
+    print(f"[INFO] 补全完成, 共更新 {updated} 行。")
+
+
+def cmd_create_read_role(args):
+    # 角色名与密码不能作为绑定参数, 用 format(%I / %L) 在服务端转义
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM pg_roles WHERE rolname = :name"),
+            {"name": args.name}
+        ).scalar()
+        action = "ALTER" if exists else "CREATE"
+        statements = [
+            f"format('{action} ROLE %I LOGIN PASSWORD %L', "
+            f":name, :password)",
+            "format('ALTER ROLE %I SET default_transaction_read_only = on', "
+            ":name)",
+            "format('GRANT CONNECT ON DATABASE %I TO %I', "
+            "current_database(), :name)",
+            "format('GRANT USAGE ON SCHEMA public TO %I', :name)",
+            "format('GRANT SELECT ON ALL TABLES IN SCHEMA public TO %I', "
+            ":name)",
+            "format('ALTER DEFAULT PRIVILEGES IN SCHEMA public "
+            "GRANT SELECT ON TABLES TO %I', :name)",
+        ]
+        for expr in statements:
+            sql = conn.execute(
+                text(f"SELECT {expr}"),
+                {"name": args.name, "password": args.password}
+            ).scalar()
+            conn.execute(text(sql))
+    print(f"[INFO] 只读角色 {args.name} 已{'更新' if exists else '创建'}。")
+    print(f"[INFO] 设置 READ_DATABASE_URL=postgresql://{args.name}:<密码>@"
+          f"<主机>:<端口>/<数据库> 后重启服务。")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m manage", description="智能家居数据库运维命令"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    partitions = subparsers.add_parser(
+        "partitions", help="按月范围分区管理"
+    )
+    partitions.add_argument(
+        "action", choices=["convert", "create", "detach", "list"]
+    )
+    partitions.add_argument(
+        "--table", choices=list(partitioning.PARTITIONED_TABLES),
+        help="只处理指定的表 (默认全部)"
+    )
+    partitions.add_argument(
+        "--months-ahead", type=int, default=3,
+        help="预先创建的未来月分区数量"
+    )
+    partitions.add_argument(
+        "--older-than-months", type=int, default=12,
+        help="detach: 分离早于 N 个月之前的分区"
+    )
+    partitions.add_argument(
+        "--archive-dir", help="detach: 分离后把分区数据导出为 csv.gz"
+    )
+    partitions.add_argument(
+        "--drop", action="store_true", help="detach: 分离后删除分区表"
+    )
+    partitions.set_defaults(func=cmd_partitions)
+
+    advisor = subparsers.add_parser(
+        "index-advisor", help="报告顺序扫描过多的表并建议缺失的索引"
+    )
+    advisor.add_argument(
+        "--min-rows", type=int, default=10000,
+        help="只报告行数不少于该值的表"
+    )
+    advisor.add_argument(
+        "--limit", type=int, default=50,
+        help="分析 pg_stat_statements 中耗时最多的前 N 条查询"
+    )
+    advisor.add_argument(
+        "--apply", action="store_true",
+        help="创建 models.py 中声明但数据库缺失的索引"
+    )
+    advisor.set_defaults(func=cmd_index_advisor)
+
+    keep = subparsers.add_parser(
+        "retention", help="汇总、归档并删除超过保留期的原始使用记录"
+    )
+    keep.add_argument(
+        "--horizon-days", type=int, default=retention.RETENTION_DAYS,
+        help="原始记录保留天数"
+    )
+    keep.add_argument(
+        "--archive-dir", default=retention.RETENTION_ARCHIVE_DIR,
+        help="归档文件目录"
+    )
+    keep.add_argument(
+        "--format", choices=["csv", "parquet"],
+        default=retention.RETENTION_FORMAT, help="归档格式"
+    )
+    keep.add_argument(
+        "--batch-size", type=int, default=retention.RETENTION_BATCH_SIZE,
+        help="每个事务处理的记录数"
+    )
+    keep.add_argument(
+        "--max-batches", type=int, help="本次最多处理的批数 (默认不限)"
+    )
+    keep.add_argument(
+        "--dry-run", action="store_true", help="只统计过期记录数"
+    )
+    keep.set_defaults(func=cmd_retention)
+
+    backfill = subparsers.add_parser(
+        "backfill-usage-denorm",
+        help="补全历史使用记录的 device_type / user_name"
+    )
+    backfill.add_argument(
+        "--batch-size", type=int, default=10000,
+        help="每个事务处理的 id 区间大小"
+    )
+    backfill.set_defaults(func=cmd_backfill_usage_denorm)
+
+    reader = subparsers.add_parser(
+        "create-read-role",
+        help="创建 (或更新) 只读角色, 供 READ_DATABASE_URL 使用"
+    )
+    reader.add_argument(
+        "--name", default="smarthome_reader", help="角色名"
+    )
+    reader.add_argument("--password", required=True, help="登录密码")
+    reader.set_defaults(func=cmd_create_read_role)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except (ValueError, RuntimeError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
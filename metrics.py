@@ -0,0 +1,206 @@
+"""
+Prometheus 指标 (GET /metrics, 文本格式)。
+
+  smarthome_http_requests_total{method,route,status}            请求数
+  smarthome_http_request_duration_seconds{method,route,status}  请求耗时
+  smarthome_sql_query_duration_seconds{engine,operation}        SQL 执行时间
+  smarthome_db_pool_{size,checked_out,checked_in,overflow}{engine}
+                                                                连接池状态
+  smarthome_llm_request_duration_seconds{provider}              大模型调用耗时
+  smarthome_llm_errors_total{provider,reason}                   大模型调用失败数
+  smarthome_cache_lookups_total{cache,result}                   缓存命中 (hit/miss)
+  smarthome_chart_render_seconds{route}                         分析图表绘制耗时
+
+route 为路由模板 (如 /users/{user_id}), 未匹配任何路由的请求 (404、被限流
+拒绝的请求) 记为 (unmatched)。缓存包括参照数据缓存 (refcache_<表名>)、
+条件请求 (etag, 命中即返回 304) 与 NLP 的 schema 提示词 (nlp_schema_prompt)。
+
+多 worker 部署 (uvicorn --workers N) 时需设置 PROMETHEUS_MULTIPROC_DIR 为一个
+空目录 (每次启动前清空), 各进程的计数与直方图写入该目录, /metrics 返回汇总
+结果; 连接池状态只反映处理本次抓取的 worker。
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+    generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+
+import profiling
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+HTTP_REQUESTS = Counter(
+    "smarthome_http_requests_total", "HTTP requests",
+    ["method", "route", "status"],
+)
+HTTP_DURATION = Histogram(
+    "smarthome_http_request_duration_seconds", "HTTP request duration",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+SQL_DURATION = Histogram(
+    "smarthome_sql_query_duration_seconds", "SQL statement execution time",
+    ["engine", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+             0.5, 1, 2.5, 5, 10),
+)
+LLM_DURATION = Histogram(
+    "smarthome_llm_request_duration_seconds", "LLM API call duration",
+    ["provider"],
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 60),
+)
+LLM_ERRORS = Counter(
+    "smarthome_llm_errors_total", "Failed LLM API calls",
+    ["provider", "reason"],
+)
+CACHE_LOOKUPS = Counter(
+    "smarthome_cache_lookups_total", "Cache lookups", ["cache", "result"],
+)
+CHART_RENDER = Histogram(
+    "smarthome_chart_render_seconds", "Chart rendering (pyplot) time",
+    ["route"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+SQL_OPERATIONS = ("select", "insert", "update", "delete")
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+@contextmanager
+def llm_call(provider: str):
+    """记录代码块 (一次大模型调用) 的耗时; 抛出异常时按异常类型计入失败数。"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        LLM_ERRORS.labels(provider, type(e).__name__).inc()
+        raise
+    finally:
+        LLM_DURATION.labels(provider).observe(time.perf_counter() - started)
+
+
+# ---- SQL 执行时间与连接池 ----
+
+def _sql_listeners(name: str):
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        conn.info.setdefault("metrics_started", []).append(
+            time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context,
+                             executemany):
+        started = conn.info.get("metrics_started")
+        if not started:
+            return
+        operation = statement.lstrip()[:6].lower()
+        if operation not in SQL_OPERATIONS:
+            operation = "other"
+        SQL_DURATION.labels(name, operation).observe(
+            time.perf_counter() - started.pop())
+
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_started"):
+            conn.info["metrics_started"].pop()
+
+    return before_cursor_execute, after_cursor_execute, handle_error
+
+
+class PoolCollector:
+    """抓取时读取各 engine 连接池的状态。"""
+
+    def __init__(self):
+        self.engines = {}
+
+    def collect(self):
+        gauges = {
+            attr: GaugeMetricFamily(
+                f"smarthome_db_pool_{attr}", description, labels=["engine"])
+            for attr, description in (
+                ("size", "Configured pool size"),
+                ("checked_out", "Connections in use"),
+                ("checked_in", "Idle connections in the pool"),
+                ("overflow", "Connections opened beyond the pool size"),
+            )
+        }
+        for name, engine in self.engines.items():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            gauges["size"].add_metric([name], pool.size())
+            gauges["checked_out"].add_metric([name], pool.checkedout())
+            gauges["checked_in"].add_metric([name], pool.checkedin())
+            gauges["overflow"].add_metric([name], max(0, pool.overflow()))
+        return list(gauges.values())
+
+
+_pools = PoolCollector()
+REGISTRY.register(_pools)
+
+
+def instrument_engines(**engines):
+    """
+    按名称 (如 primary=engine, read=read_engine) 注册 SQL 计时事件与连接池
+    指标; 与已注册的 engine 是同一对象时跳过。
+    """
+    for name, engine in engines.items():
+        if any(engine is e for e in _pools.engines.values()):
+            continue
+        before, after, handle_error = _sql_listeners(name)
+        event.listen(engine, "before_cursor_execute", before)
+        event.listen(engine, "after_cursor_execute", after)
+        event.listen(engine, "handle_error", handle_error)
+        _pools.engines[name] = engine
+
+
+def render() -> tuple:
+    """(响应内容, Content-Type)"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_pools)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    纯 ASGI 中间件, 放在最外层 (包括被限流拒绝的请求): 按路由与状态码记录
+    请求数与耗时; 分析接口的绘图时间取自 profiling 的耗时分解。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = profiling.route_template(scope)
+            labels = (scope["method"], route, str(status))
+            HTTP_REQUESTS.labels(*labels).inc()
+            HTTP_DURATION.labels(*labels).observe(
+                time.perf_counter() - started)
+            timings = scope.get("state", {}).get("timings")
+            if timings is not None and "render" in timings.phases:
+                CHART_RENDER.labels(route).observe(timings.phases["render"])
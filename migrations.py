@@ -0,0 +1,45 @@
+"""
+一次性数据迁移, 通过 python -m manage 调用。
+"""
+from sqlalchemy import text
+
+_BACKFILL_USAGE_DENORM_SQL = """
+UPDATE device_usages u
+SET device_type = COALESCE(u.device_type, d.type),
+    user_name = COALESCE(u.user_name, s.name)
+FROM device_usages x
+LEFT JOIN devices d ON d.id = x.device_id
+LEFT JOIN users s ON s.id = x.user_id
+WHERE u.id = x.id
+  AND x.id > :low AND x.id <= :high
+  AND u.id > :low AND u.id <= :high
+  AND ((u.device_type IS NULL AND d.type IS NOT NULL)
+       OR (u.user_name IS NULL AND s.name IS NOT NULL))
+"""
+
+
+def backfill_usage_denorm(engine, batch_size: int = 10000, progress=None):
+    """
+    为历史 device_usages 记录补全 device_type / user_name。
+    按 id 区间分批, 每批一个事务, 只更新确实会改变的行; 可重复执行。
+    返回更新的总行数。
+    """
+    with engine.connect() as conn:
+        low, high = conn.execute(
+            text("SELECT min(id), max(id) FROM device_usages")
+        ).one()
+    if low is None:
+        return 0
+    updated = 0
+    cursor = low - 1
+    while cursor < high:
+        upper = min(cursor + batch_size, high)
+        with engine.begin() as conn:
+            result = conn.execute(text(_BACKFILL_USAGE_DENORM_SQL), {
+                "low": cursor, "high": upper
+            })
+            updated += result.rowcount
+        cursor = upper
+        if progress:
+            progress(cursor, high, updated)
+    return updated
@@ -1,5 +1,6 @@
 from sqlalchemy import (
-    Column, Integer, String, Float, DateTime, ForeignKey, Text
+    Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Index,
+    text
 )
 from sqlalchemy.orm import relationship
 from database import Base
@@ -50,6 +51,38 @@ class DeviceUsage(Base):
     user = relationship('User', back_populates='usages')
     device = relationship('Device', back_populates='usages')
 
+    __table_args__ = (
+        # 追加写入为主, start_time 与物理顺序高度相关, BRIN 索引体积极小
+        Index(
+            'ix_device_usages_start_time_brin', 'start_time',
+            postgresql_using='brin',
+        ),
+        # 按用户/设备的点查与关联
+        Index('ix_device_usages_user_id', 'user_id'),
+        Index('ix_device_usages_device_id', 'device_id'),
+        # 未结束会话 (end_time IS NULL) 的部分索引, 流式写入查找开放会话时
+        # 只需扫描该索引即可返回结果 (index-only scan)
+        Index(
+            'ix_device_usages_open', 'device_id', 'user_id',
+            postgresql_where=text('end_time IS NULL'),
+            postgresql_include=['id', 'start_time'],
+        ),
+    )
+
+
+class DeviceUsageDaily(Base):
+    """
+    超过保留期的原始使用记录按 天/设备/用户 汇总后的结果 (见 retention.py)。
+    历史数据不设外键, 设备或用户已删除时对应的 id 记为 0。
+    """
+    __tablename__ = 'device_usage_daily'
+    day = Column(Date, primary_key=True)
+    device_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    usage_count = Column(Integer, nullable=False, default=0)
+    total_minutes = Column(Float, nullable=False, default=0)
+    energy_consumed = Column(Float, nullable=False, default=0)
+
 
 class SecurityEvent(Base):
     __tablename__ = 'security_events'
@@ -64,6 +97,15 @@ class SecurityEvent(Base):
     user = relationship('User', back_populates='events')
     device = relationship('Device', back_populates='events')
 
+    __table_args__ = (
+        Index(
+            'ix_security_events_timestamp_brin', 'timestamp',
+            postgresql_using='brin',
+        ),
+        Index('ix_security_events_user_id', 'user_id'),
+        Index('ix_security_events_device_id', 'device_id'),
+    )
+
 
 class Feedback(Base):
     __tablename__ = 'feedbacks'
@@ -3,14 +3,17 @@ import httpx
 import os
 from sqlalchemy import inspect, text
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
+from database import SessionLocal, engine, get_read_db
+import invalidation
+import metrics
+import profiling
 import re
 from dotenv import load_dotenv
 
 # 加载 .env 文件中的环境变量
 load_dotenv()
 
-router = APIRouter()
+router = APIRouter(route_class=profiling.TimedRoute)
 
 # --- 全局变量，用于缓存数据库Schema ---
 DB_SCHEMA_PROMPT_CACHE = None
@@ -21,6 +24,8 @@ def get_db_schema_prompt():
     动态生成并缓存数据库的Schema描述，用于注入到LLM的Prompt中。
     """
     global DB_SCHEMA_PROMPT_CACHE
+    metrics.cache_lookup("nlp_schema_prompt",
+                         hit=bool(DB_SCHEMA_PROMPT_CACHE))
     if DB_SCHEMA_PROMPT_CACHE:
         return DB_SCHEMA_PROMPT_CACHE
 
@@ -91,13 +96,28 @@ def get_db_schema_prompt():
             "5. 如无法生成SQL，请只用简洁中文说明原因。")
 
 
+def invalidate_db_schema_prompt():
+    # 表结构变化后 (如转换为分区表), 下次请求时重新生成
+    global DB_SCHEMA_PROMPT_CACHE
+    DB_SCHEMA_PROMPT_CACHE = None
+
+
+invalidation.register(invalidation.SCHEMA, invalidate_db_schema_prompt)
+
+
 # --- 模型配置 ---
+# 接口地址可通过环境变量修改 (如压测时指向 benchmarks.stub_llm)
 # DeepSeek (默认)
-DEEPSEEK_API_URL = "https://api.deepseek.com/chat/completions"
+DEEPSEEK_API_URL = os.getenv(
+    "DEEPSEEK_API_URL", "https://api.deepseek.com/chat/completions"
+)
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")  # 从环境变量加载
 
 # 通义千问 (Qwen) - 使用OpenAI兼容模式
-QWEN_API_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"
+QWEN_API_URL = os.getenv(
+    "QWEN_API_URL",
+    "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"
+)
 # !! 请在环境变量中设置您的通义千问API Key, 变量名为 QWEN_API_KEY
 QWEN_API_KEY = os.getenv("QWEN_API_KEY")  # 从环境变量加载
 
@@ -117,7 +137,12 @@ def on_startup():
 
 
 @router.post("/")
-async def nlp_query(request: Request, db: Session = Depends(get_db)):
+async def nlp_query(
+    request: Request,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+):
+    # 生成的 SELECT 走只读会话 (配置了只读副本时为副本), 写操作走主库
     data = await request.json()
     # 兼容旧版和新版：优先读取messages，如果不存在，则读取question并包装
     messages = data.get("messages")
@@ -169,9 +194,12 @@ async def nlp_query(request: Request, db: Session = Depends(get_db)):
 
     async with httpx.AsyncClient() as client:
         try:
-            resp = await client.post(api_url, json=payload, headers=headers, timeout=60)
-            resp.raise_for_status()
-            result = resp.json()
+            # 按模型提供商记录调用耗时与失败数 (Prometheus 指标)
+            with metrics.llm_call(model_provider):
+                resp = await client.post(
+                    api_url, json=payload, headers=headers, timeout=60)
+                resp.raise_for_status()
+                result = resp.json()
         except httpx.RequestError as e:
             return {"error": f"请求大模型API失败: {e}"}
 
@@ -183,6 +211,7 @@ async def nlp_query(request: Request, db: Session = Depends(get_db)):
         elif model_provider == "qwen":
             # 检查通义千问是否返回了包含在200 OK响应中的错误信息
             if "code" in result and result["code"]:
+                metrics.LLM_ERRORS.labels(model_provider, "api_error").inc()
                 error_msg = result.get('message', '无详细错误信息。')
                 return {
                     "error": f"通义千问API返回错误: {error_msg}",
@@ -210,7 +239,7 @@ async def nlp_query(request: Request, db: Session = Depends(get_db)):
                 sql = tool_input.get("sql")
                 title = tool_input.get("title", "AI生成图表")
                 if sql:
-                    rows = db.execute(text(sql)).mappings().all()
+                    rows = read_db.execute(text(sql)).mappings().all()
                     # 向客户端返回明确的可视化指令
                     return {
                         "action": "visualize",
@@ -230,7 +259,7 @@ async def nlp_query(request: Request, db: Session = Depends(get_db)):
         try:
             sql_type = sql.strip().split()[0].lower()
             if sql_type == 'select':
-                rows = db.execute(text(sql)).mappings().all()
+                rows = read_db.execute(text(sql)).mappings().all()
 
                 # --- Safety Net Logic ---
                 # Get the last user question from the conversation history.
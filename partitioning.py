@@ -0,0 +1,266 @@
+"""
+device_usages / security_events 的按月范围分区管理。
+
+- convert: 把现有的普通表在线转换为按时间列分区的表 (单事务, 失败即回滚)
+- create: 预先创建未来若干个月的分区 (DEFAULT 分区中已有的该月数据会移入新分区)
+- detach: 分离 (可选归档为 csv.gz、删除) 过期的分区
+"""
+import datetime
+import gzip
+import os
+
+from sqlalchemy import text
+
+import models
+
+# 表名 -> 分区键
+PARTITIONED_TABLES = {
+    models.DeviceUsage.__tablename__: "start_time",
+    models.SecurityEvent.__tablename__: "timestamp",
+}
+
+MODEL_TABLES = {
+    models.DeviceUsage.__tablename__: models.DeviceUsage.__table__,
+    models.SecurityEvent.__tablename__: models.SecurityEvent.__table__,
+}
+
+
+def month_floor(value) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month: datetime.date, count: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime.date) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def _check_table(table: str):
+    if table not in PARTITIONED_TABLES:
+        raise ValueError(
+            f"不支持分区的表: {table} "
+            f"(可选: {', '.join(PARTITIONED_TABLES)})"
+        )
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+    ), {"table": table}).first() is not None
+
+
+def list_partitions(conn, table: str):
+    """返回 [(分区名, 分区边界表达式)], 按名称排序。"""
+    return conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table AND pg_table_is_visible(p.oid) "
+        "ORDER BY c.relname"
+    ), {"table": table}).all()
+
+
+def _default_partition(conn, table: str):
+    for name, bound in list_partitions(conn, table):
+        if bound == "DEFAULT":
+            return name
+    return None
+
+
+def _create_month_partition(conn, table: str, month: datetime.date) -> bool:
+    """
+    创建 month 所在月份的分区。DEFAULT 分区中已有该月数据时直接建分区会失败,
+    此时先分离 DEFAULT 分区, 建好月分区后把这些行移入, 再重新挂回。
+    """
+    name = partition_name(table, month)
+    exists = conn.execute(
+        text("SELECT to_regclass(:name)"), {"name": name}
+    ).scalar()
+    if exists:
+        return False
+    column = PARTITIONED_TABLES[table]
+    bounds = {"low": month, "high": add_months(month, 1)}
+    in_month = f'"{column}" >= :low AND "{column}" < :high'
+    default = _default_partition(conn, table)
+    moving = default is not None and conn.execute(text(
+        f'SELECT 1 FROM "{default}" WHERE {in_month} LIMIT 1'
+    ), bounds).first() is not None
+    if moving:
+        conn.execute(text(
+            f'ALTER TABLE "{table}" DETACH PARTITION "{default}"'
+        ))
+    conn.execute(text(
+        f'CREATE TABLE "{name}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') "
+        f"TO ('{add_months(month, 1).isoformat()}')"
+    ))
+    if moving:
+        moved = conn.execute(text(
+            f'INSERT INTO "{table}" SELECT * FROM "{default}" '
+            f"WHERE {in_month}"
+        ), bounds).rowcount
+        conn.execute(text(f'DELETE FROM "{default}" WHERE {in_month}'),
+                     bounds)
+        conn.execute(text(
+            f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT'
+        ))
+        print(f"[INFO] Moved {moved} rows from {default} to {name}")
+    return True
+
+
+def create_partitions(engine, table: str, start: datetime.date,
+                      months: int):
+    """从 start 所在月份起创建 months 个月分区, 已存在的分区会跳过。"""
+    _check_table(table)
+    created = []
+    with engine.begin() as conn:
+        if not is_partitioned(conn, table):
+            raise RuntimeError(
+                f"{table} 还不是分区表, 请先执行 partitions convert。"
+            )
+        month = month_floor(start)
+        for i in range(months):
+            if _create_month_partition(conn, table, add_months(month, i)):
+                created.append(partition_name(table, add_months(month, i)))
+    return created
+
+
+def convert_to_partitioned(engine, table: str, months_ahead: int = 3):
+    """
+    将普通表转换为按月分区表。整个过程在一个事务中完成:
+    重命名旧表 -> 建分区父表与月分区 (以及 DEFAULT 分区) -> 复制数据 ->
+    迁移序列归属 -> 删除旧表 -> 重建主键、外键与模型中声明的索引。
+    转换期间表被 ACCESS EXCLUSIVE 锁定, 请在维护窗口内执行。
+    """
+    _check_table(table)
+    column = PARTITIONED_TABLES[table]
+    legacy = f"{table}_unpartitioned"
+    with engine.begin() as conn:
+        if is_partitioned(conn, table):
+            return {"table": table, "converted": False, "partitions": 0}
+
+        conn.execute(text(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE'))
+        nulls = conn.execute(text(
+            f'SELECT count(*) FROM "{table}" WHERE "{column}" IS NULL'
+        )).scalar()
+        if nulls:
+            raise RuntimeError(
+                f"{table}.{column} 存在 {nulls} 行空值, 分区键不能为空。"
+            )
+        low, high = conn.execute(text(
+            f'SELECT min("{column}"), max("{column}") FROM "{table}"'
+        )).one()
+        foreign_keys = conn.execute(text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"
+        ), {"table": table}).all()
+        sequence = conn.execute(text(
+            "SELECT pg_get_serial_sequence(:table, 'id')"
+        ), {"table": table}).scalar()
+
+        conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "{legacy}"'))
+        conn.execute(text(
+            f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE ("{column}")'
+        ))
+
+        today = datetime.date.today()
+        first = month_floor(low) if low else month_floor(today)
+        newest = max(high.date(), today) if high else today
+        last = add_months(month_floor(newest), months_ahead)
+        months = 0
+        month = first
+        while month <= last:
+            _create_month_partition(conn, table, month)
+            month = add_months(month, 1)
+            months += 1
+        # 兜底分区, 接收超出已建分区范围的数据
+        conn.execute(text(
+            f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT'
+        ))
+
+        conn.execute(text(f'INSERT INTO "{table}" SELECT * FROM "{legacy}"'))
+        if sequence:
+            conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY '
+                              f'"{table}".id'))
+        conn.execute(text(f'DROP TABLE "{legacy}"'))
+
+        # 分区表的主键必须包含分区键
+        conn.execute(text(
+            f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" '
+            f'PRIMARY KEY (id, "{column}")'
+        ))
+        for name, definition in foreign_keys:
+            conn.execute(text(
+                f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}'
+            ))
+        for index in MODEL_TABLES[table].indexes:
+            index.create(conn, checkfirst=True)
+    return {"table": table, "converted": True, "partitions": months}
+
+
+def detach_partitions(engine, table: str, older_than: datetime.date,
+                      archive_dir: str = None, drop: bool = False):
+    """
+    分离上界不晚于 older_than 所在月份的分区。
+    指定 archive_dir 时先把分区数据导出为 <分区名>.csv.gz;
+    指定 drop 时在分离 (及归档) 后删除该分区表。
+    """
+    _check_table(table)
+    cutoff = month_floor(older_than)
+    detached = []
+    with engine.connect() as conn:
+        names = [name for name, _ in list_partitions(conn, table)]
+    for name in names:
+        month = _partition_month(table, name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+        # 每个分区单独一个事务, 避免长时间持有父表的锁
+        with engine.begin() as conn:
+            conn.execute(text(
+                f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'
+            ))
+        if archive_dir:
+            _archive_table(engine, name, archive_dir)
+        if drop:
+            with engine.begin() as conn:
+                conn.execute(text(f'DROP TABLE "{name}"'))
+        detached.append(name)
+    return detached
+
+
+def _partition_month(table: str, name: str):
+    suffix = name[len(table):]
+    if not suffix.startswith("_y") or len(suffix) != 9:
+        return None
+    try:
+        return datetime.date(int(suffix[2:6]), int(suffix[7:9]), 1)
+    except ValueError:
+        return None
+
+
+def _archive_table(engine, name: str, archive_dir: str) -> str:
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        sql = f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)'
+        with gzip.open(path, "wb") as f:
+            if hasattr(cursor, "copy_expert"):
+                cursor.copy_expert(sql, f)
+            else:
+                # psycopg 3
+                with cursor.copy(sql) as copy:
+                    for block in copy:
+                        f.write(block)
+        cursor.close()
+    finally:
+        raw.close()
+    return path
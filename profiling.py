@@ -0,0 +1,368 @@
+"""
+按请求的耗时分解 (Server-Timing) 与可选的单请求性能剖析。
+
+每个请求的耗时分为以下几段, 写入响应头 Server-Timing (单位毫秒):
+  db         SQL 语句的执行时间 (engine 的 before/after_cursor_execute 事件),
+             desc 为语句数
+  render     绘图 (分析接口中用 mark_phase("render") 标记的 pyplot 代码)
+  serialise  接口函数返回到发出响应头之间: 响应模型校验、JSON 编码、压缩
+  compute    其余时间 (pandas 计算、依赖项、线程池调度等)
+  total      从收到请求到发出响应头
+各段时间按路由模板 (如 GET /analysis/room_energy) 累计, 由 route_stats()
+汇总 (GET /api/route_timings)。
+
+PROFILING_ENABLED=1 时, 带 ?profile=1 的请求在接口函数内运行剖析器, 返回
+剖析报告而不是原来的响应: 安装了 pyinstrument 时为 HTML 调用树, 否则为
+cProfile 按累计时间排序的前 PROFILE_TOP_N 个函数 (文本)。只剖析接口函数本身
+(同步接口在线程池线程中运行, 剖析器在该线程中启动), 不包括依赖项与序列化。
+
+配置 (环境变量):
+  SERVER_TIMING_ENABLED=0     不添加 Server-Timing 响应头
+  PROFILING_ENABLED=1         允许 ?profile=1 (默认关闭)
+  PROFILE_TOP_N               cProfile 报告的行数 (默认 40)
+  SLOW_REQUEST_MS             超过该耗时的请求打印一行耗时分解 (默认 0, 不打印)
+"""
+import contextvars
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "1") != "0"
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "40"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+PHASES = ("db", "compute", "render", "serialise")
+
+# 当前请求的计时; 线程池中的同步接口与依赖项继承调用方的上下文,
+# 因此 SQL 事件与 mark_phase 在工作线程中也能找到所属的请求
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self, profile: bool = False):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        # mark_phase 标记的各段时间 (秒), 已扣除其中的 SQL 时间
+        self.phases = {}
+        self.endpoint_done = None
+        self.responded = None
+        self.profile = profile
+        # 剖析报告 (media_type, 内容)
+        self.report = None
+
+    def breakdown(self, until: float) -> dict:
+        """各段耗时 (秒): db、compute、render、serialise、total。"""
+        total = until - self.started
+        result = {"db": self.sql_seconds}
+        result.update(self.phases)
+        serialise_end = self.responded or until
+        if self.endpoint_done is not None:
+            result["serialise"] = (result.get("serialise", 0.0)
+                                   + max(0.0, serialise_end
+                                         - self.endpoint_done))
+        result["compute"] = max(0.0, total - sum(result.values()))
+        result["total"] = total
+        return result
+
+
+def current() -> RequestTimings:
+    """当前请求的计时, 不在请求中时返回 None。"""
+    return _current.get()
+
+
+@contextmanager
+def mark_phase(name: str):
+    """把代码块的耗时 (扣除其中的 SQL 时间) 计入当前请求的 name 段。"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started, sql_before = time.perf_counter(), timings.sql_seconds
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started
+                   - (timings.sql_seconds - sql_before))
+        timings.phases[name] = timings.phases.get(name, 0.0) + elapsed
+
+
+# ---- SQL 语句计数与计时 ----
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profiling_started", []).append(
+            time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    timings = _current.get()
+    started = conn.info.get("profiling_started")
+    if timings is None or not started:
+        return
+    timings.sql_seconds += time.perf_counter() - started.pop()
+    timings.sql_count += 1
+
+
+def _handle_error(exception_context):
+    # 执行失败时不会触发 after_cursor_execute, 丢弃对应的开始时间
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("profiling_started"):
+        conn.info["profiling_started"].pop()
+
+
+def instrument_engines(*engines):
+    """在 engine 上注册 SQL 计时事件 (同一个 engine 只注册一次)。"""
+    for engine in {id(e): e for e in engines}.values():
+        if event.contains(engine, "before_cursor_execute",
+                          _before_cursor_execute):
+            continue
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+# ---- 接口函数: 记录返回时间, 按需运行剖析器 ----
+
+@contextmanager
+def _profiled(timings: RequestTimings, async_mode: str):
+    if not timings.profile:
+        yield
+        return
+    if Profiler is not None:
+        profiler = Profiler(async_mode=async_mode)
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            timings.report = ("text/html; charset=utf-8",
+                              profiler.output_html())
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        timings.report = ("text/plain; charset=utf-8", out.getvalue())
+
+
+def _timed(endpoint):
+    if getattr(endpoint, "_timed", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return await endpoint(*args, **kwargs)
+            try:
+                with _profiled(timings, "enabled"):
+                    return await endpoint(*args, **kwargs)
+            finally:
+                timings.endpoint_done = time.perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return endpoint(*args, **kwargs)
+            try:
+                with _profiled(timings, "disabled"):
+                    return endpoint(*args, **kwargs)
+            finally:
+                timings.endpoint_done = time.perf_counter()
+
+    wrapper._timed = True
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    记录接口函数返回时间的路由类 (APIRouter(route_class=TimedRoute))。
+    接口函数之后到发出响应头的时间计为 serialise。
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed(endpoint), **kwargs)
+
+
+# ---- 按路由的统计 ----
+
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.sql_count = 0
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+
+    def add(self, status: int, phases: dict, sql_count: int):
+        self.count += 1
+        self.errors += status >= 500
+        self.seconds += phases["total"]
+        self.max_seconds = max(self.max_seconds, phases["total"])
+        self.sql_count += sql_count
+        for name in PHASES:
+            self.phase_seconds[name] += phases.get(name, 0.0)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.seconds / self.count * 1000, 2),
+            "max_ms": round(self.max_seconds * 1000, 2),
+            "avg_sql_statements": round(self.sql_count / self.count, 2),
+            "avg_phase_ms": {
+                name: round(seconds / self.count * 1000, 2)
+                for name, seconds in self.phase_seconds.items()
+            },
+        }
+
+
+_stats_lock = threading.Lock()
+_route_stats = {}
+
+
+def route_template(scope) -> str:
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "(unmatched)"
+    # 较新的 FastAPI 在 include_router 时不复制路由, route.path 不含路由器的
+    # 前缀 (如 /analysis); 按模板的段数从实际路径中取回前缀
+    parts = scope["path"].split("/")
+    return "/".join(parts[:len(parts) - template.count("/")]) + template
+
+
+def route_stats() -> dict:
+    """按总耗时从高到低排列的各路由统计 ("METHOD /path" -> 统计)。"""
+    with _stats_lock:
+        items = sorted(_route_stats.items(),
+                       key=lambda item: item[1].seconds, reverse=True)
+        return {route: stats.as_dict() for route, stats in items}
+
+
+def reset_route_stats():
+    with _stats_lock:
+        _route_stats.clear()
+
+
+def _record(scope, status: int, timings: RequestTimings):
+    phases = timings.breakdown(time.perf_counter())
+    route = f"{scope['method']} {route_template(scope)}"
+    with _stats_lock:
+        stats = _route_stats.get(route)
+        if stats is None:
+            stats = _route_stats[route] = RouteStats()
+        stats.add(status, phases, timings.sql_count)
+    if SLOW_REQUEST_MS and phases["total"] * 1000 >= SLOW_REQUEST_MS:
+        parts = ", ".join(f"{name} {phases[name] * 1000:.0f}ms"
+                          for name in PHASES)
+        print(f"[WARN] Slow request {route} {status}: "
+              f"{phases['total'] * 1000:.0f}ms ({parts}, "
+              f"{timings.sql_count} SQL statements)")
+
+
+def server_timing(timings: RequestTimings, until: float) -> str:
+    phases = timings.breakdown(until)
+    parts = []
+    for name in PHASES + ("total",):
+        part = f"{name};dur={phases.get(name, 0.0) * 1000:.1f}"
+        if name == "db":
+            part += f';desc="{timings.sql_count} queries"'
+        parts.append(part)
+    return ", ".join(parts)
+
+
+def _wants_profile(scope) -> bool:
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("profile", [""])[-1].lower() in ("1", "true")
+
+
+class ProfilingMiddleware:
+    """
+    纯 ASGI 中间件: 为每个请求建立计时, 在响应头中写入 Server-Timing,
+    结束后按路由累计; 请求剖析时用剖析报告代替原来的响应。
+    放在压缩中间件外层, 压缩时间计入 serialise。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings(
+            profile=PROFILING_ENABLED and _wants_profile(scope))
+        token = _current.set(timings)
+        # 外层中间件 (metrics) 在请求结束后通过 scope 读取各段耗时
+        scope.setdefault("state", {})["timings"] = timings
+        status = 500
+        replaced = False
+
+        async def send_with_timing(message):
+            nonlocal status, replaced
+            if message["type"] == "http.response.start":
+                timings.responded = time.perf_counter()
+                status = message["status"]
+                # 接口函数没有运行 (如 404、304) 时照常返回原响应
+                replaced = timings.report is not None
+                if replaced:
+                    return
+                if SERVER_TIMING_ENABLED:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", server_timing(
+                            timings, timings.responded).encode("latin-1"))
+                    ]
+            elif replaced:
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            _record(scope, status, timings)
+        if replaced:
+            await _send_report(send, timings)
+
+
+async def _send_report(send, timings: RequestTimings):
+    media_type, report = timings.report
+    body = report.encode("utf-8")
+    headers = [
+        (b"content-type", media_type.encode("latin-1")),
+        (b"content-length", str(len(body)).encode("latin-1")),
+        (b"cache-control", b"no-store"),
+    ]
+    if SERVER_TIMING_ENABLED:
+        headers.append((b"server-timing", server_timing(
+            timings, timings.responded).encode("latin-1")))
+    await send({"type": "http.response.start", "status": 200,
+                "headers": headers})
+    await send({"type": "http.response.body", "body": body})
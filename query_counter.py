@@ -0,0 +1,50 @@
+"""
+统计一段代码内执行的 SQL 语句数。
+
+    with count_queries(engine) as counter:
+        client.get("/users/")
+    assert counter.count <= 4, counter.statements
+
+基于 engine 的 before_cursor_execute / commit 事件, 统计范围是整个 engine,
+因此只适合在没有其它并发请求时使用 (脚本、基准测试)。
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        self.statements.append(statement)
+
+    @property
+    def round_trips(self) -> int:
+        """语句数加 COMMIT 数 (驱动隐式发出的 BEGIN 不计入)。"""
+        return self.count + self.commits
+
+    def _commit(self, conn):
+        self.commits += 1
+
+
+@contextmanager
+def count_queries(engine):
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute",
+                 counter._before_cursor_execute)
+    event.listen(engine, "commit", counter._commit)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute",
+                     counter._before_cursor_execute)
+        event.remove(engine, "commit", counter._commit)
@@ -0,0 +1,164 @@
+"""
+按路由类别划分的优先级通道 (priority lanes) 与按客户端的令牌桶限流。
+
+- ingest:    POST /device_usages/、POST /security_events/, 设备上报, 对延迟敏感
+- expensive: /analysis、/api/sql_query, 占用 CPU 与数据库, 开销大、尽力而为
+- llm:       /nlp, 大部分时间在等待大模型接口 (最长 60 秒), 单独限制并发,
+             不与 expensive 争用同一个并发名额
+- default:   其余接口
+
+每个通道有独立的并发上限, 每个 (通道, 客户端) 有独立的令牌桶。
+expensive 与 llm 通道可被丢弃: 在途请求数 (不含 llm) 达到 SATURATION_INFLIGHT
+(服务已饱和) 时直接拒绝, 把线程池与数据库连接留给 ingest。
+被拒绝的请求返回 429 与 Retry-After (秒)。
+
+配置 (环境变量, <LANE> 为 INGEST / EXPENSIVE / LLM / DEFAULT):
+  RATE_LIMIT_ENABLED=0        关闭本中间件
+  LANE_<LANE>_CONCURRENCY     通道并发上限 (0 表示不限)
+  LANE_<LANE>_RATE            每个客户端每秒补充的令牌数 (0 表示不限流)
+  LANE_<LANE>_BURST           令牌桶容量
+  SATURATION_INFLIGHT         丢弃 expensive / llm 通道的在途请求数 (0 表示不丢弃)
+"""
+import json
+import math
+import os
+import time
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+SATURATION_INFLIGHT = int(os.getenv("SATURATION_INFLIGHT", "32"))
+
+INGEST = "ingest"
+EXPENSIVE = "expensive"
+LLM = "llm"
+DEFAULT = "default"
+
+INGEST_ROUTES = {
+    ("POST", "/device_usages/"),
+    ("POST", "/security_events/"),
+}
+EXPENSIVE_PREFIXES = ("/analysis", "/api/sql_query")
+LLM_PREFIXES = ("/nlp",)
+
+# 令牌桶数量超过该值时清理已回满 (长时间空闲) 的桶
+_MAX_BUCKETS = 10000
+
+
+def _env_number(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+class Lane:
+    def __init__(self, name: str, concurrency: int, rate: float, burst: float,
+                 sheddable: bool = False, io_bound: bool = False):
+        prefix = f"LANE_{name.upper()}_"
+        self.name = name
+        self.concurrency = int(_env_number(prefix + "CONCURRENCY",
+                                           concurrency))
+        self.rate = _env_number(prefix + "RATE", rate)
+        self.burst = max(1.0, _env_number(prefix + "BURST", burst))
+        self.sheddable = sheddable
+        # 主要在等待外部接口的通道不计入饱和判断 (不占用线程池与数据库)
+        self.io_bound = io_bound
+        self.inflight = 0
+        # 客户端 -> [令牌数, 上次补充时间]
+        self._buckets = {}
+
+    def take_token(self, client: str, now: float) -> float:
+        """取一个令牌, 成功返回 0, 否则返回需要等待的秒数。"""
+        if self.rate <= 0:
+            return 0.0
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= _MAX_BUCKETS:
+                self._prune(now)
+            bucket = self._buckets[client] = [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    def _prune(self, now: float):
+        full_after = self.burst / self.rate
+        self._buckets = {
+            client: bucket for client, bucket in self._buckets.items()
+            if now - bucket[1] < full_after
+        }
+
+
+def classify(method: str, path: str) -> str:
+    if (method, path) in INGEST_ROUTES:
+        return INGEST
+    if path.startswith(EXPENSIVE_PREFIXES):
+        return EXPENSIVE
+    if path.startswith(LLM_PREFIXES):
+        return LLM
+    return DEFAULT
+
+
+class PriorityLaneMiddleware:
+    """纯 ASGI 中间件, 需放在最外层, 被拒绝的请求不经过其它中间件。"""
+
+    def __init__(self, app):
+        self.app = app
+        self.lanes = {
+            INGEST: Lane(INGEST, concurrency=64, rate=200, burst=400),
+            # 分析接口用 pyplot 绘图, 既占用 GIL 又共享全局状态 (非线程安全),
+            # 同一进程内同时绘制两张图时 ingest 延迟会急剧上升; 需要更高的
+            # 分析吞吐量时增加 worker 进程数
+            EXPENSIVE: Lane(EXPENSIVE, concurrency=1, rate=2, burst=5,
+                            sheddable=True),
+            LLM: Lane(LLM, concurrency=8, rate=1, burst=5, sheddable=True,
+                      io_bound=True),
+            DEFAULT: Lane(DEFAULT, concurrency=32, rate=50, burst=100),
+        }
+
+    def _total_inflight(self) -> int:
+        return sum(lane.inflight for lane in self.lanes.values()
+                   if not lane.io_bound)
+
+    def _admit(self, lane: Lane, client: str):
+        """允许进入返回 None, 否则返回 (Retry-After 秒数, 原因)。"""
+        if lane.concurrency and lane.inflight >= lane.concurrency:
+            return 1, f"too many concurrent {lane.name} requests"
+        if (lane.sheddable and SATURATION_INFLIGHT
+                and self._total_inflight() >= SATURATION_INFLIGHT):
+            return 1, "server is busy"
+        wait = lane.take_token(client, time.monotonic())
+        if wait:
+            return math.ceil(wait), "rate limit exceeded"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+
+        lane = self.lanes[classify(scope["method"], scope["path"])]
+        client = scope["client"][0] if scope.get("client") else "unknown"
+        rejected = self._admit(lane, client)
+        if rejected is not None:
+            retry_after, reason = rejected
+            return await _send_429(send, lane.name, retry_after, reason)
+
+        lane.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.inflight -= 1
+
+
+async def _send_429(send, lane: str, retry_after: int, reason: str):
+    body = json.dumps({"detail": reason}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(retry_after).encode("latin-1")),
+            (b"x-priority-lane", lane.encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,164 @@
+"""
+User / Room / Device 参照数据的进程内只读缓存 (read-through)。
+
+- 按 id 查询: 命中直接返回, 未命中的 id 用一条 WHERE id IN (...) 批量加载
+  (整表已加载时也会查询, 不把未命中当作不存在)
+- 不指定 id 时返回整张表: 首次整表加载一次, 之后不再查询数据库
+- crud 中修改这三张表的函数会调用 invalidate() 使缓存失效
+- 其它 worker 的写入通过 invalidation 模块 (LISTEN/NOTIFY) 通知到本进程;
+  也可设置环境变量 REFCACHE_TTL_SECONDS 作为兜底,
+  缓存超过该时间后整体重新加载 (0 表示不过期)
+
+缓存的是查询返回的行 (只读), 通过属性访问, 如 devices(db)[1].name。
+缓存由所有请求共享, 并被写入 device_usages 的冗余列使用, 因此总是从主库
+加载: 传入的是只读副本会话时, 另开一个主库会话查询, 避免缓存复制延迟下的旧值。
+所有方法线程安全, 可在同步路由的线程池中并发调用。
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy.orm import Session
+
+import database
+import invalidation
+import metrics
+import models
+
+REFCACHE_TTL_SECONDS = float(os.getenv("REFCACHE_TTL_SECONDS", "0"))
+
+
+@contextmanager
+def _primary_session(db: Session):
+    """db 连接的是主库时直接使用, 否则临时新建一个主库会话。"""
+    if db.get_bind() is database.engine:
+        yield db
+        return
+    primary = database.SessionLocal()
+    try:
+        yield primary
+    finally:
+        primary.close()
+
+
+class _RefTable:
+    def __init__(self, model, *columns):
+        self.model = model
+        self.columns = (model.id, *columns)
+        self._rows = {}
+        self._complete = False
+        self._loaded_at = None
+        # 每次失效递增; 查询期间发生失效时不把 (可能过期的) 结果写入缓存
+        self._generation = 0
+        self._lock = threading.RLock()
+
+    @property
+    def table(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def metric_name(self) -> str:
+        return f"refcache_{self.table}"
+
+    def _expire_if_stale(self):
+        if (REFCACHE_TTL_SECONDS > 0 and self._loaded_at is not None
+                and time.monotonic() - self._loaded_at > REFCACHE_TTL_SECONDS):
+            self._clear()
+
+    def _clear(self):
+        self._rows = {}
+        self._complete = False
+        self._loaded_at = None
+        self._generation += 1
+
+    def _store(self, generation: int, rows, complete: bool = False):
+        with self._lock:
+            if generation != self._generation:
+                return
+            if self._loaded_at is None:
+                self._loaded_at = time.monotonic()
+            for row in rows:
+                self._rows[row.id] = row
+            self._complete = self._complete or complete
+
+    def get(self, db: Session, ids=None) -> dict:
+        """{id: 行}; ids 为 None 时返回整张表, 不存在的 id 不会出现在结果中。"""
+        with self._lock:
+            self._expire_if_stale()
+            generation = self._generation
+            if ids is None:
+                if self._complete:
+                    metrics.cache_lookup(self.metric_name, hit=True)
+                    return dict(self._rows)
+            else:
+                ids = {i for i in ids if i is not None}
+                found = {i: self._rows[i] for i in ids if i in self._rows}
+                missing = ids - found.keys()
+                metrics.cache_lookup(self.metric_name, hit=not missing)
+                if not missing:
+                    return found
+        # 在锁外查询数据库, 避免慢查询阻塞其它线程的命中
+        if ids is None:
+            metrics.cache_lookup(self.metric_name, hit=False)
+            with _primary_session(db) as primary:
+                rows = primary.query(*self.columns).all()
+            self._store(generation, rows, complete=True)
+            return {row.id: row for row in rows}
+        # 整表已加载时也查询缺失的 id: 其它 worker 新建的行可能在失效通知
+        # 到达之前 (或通知在监听重连期间丢失) 就被引用
+        with _primary_session(db) as primary:
+            rows = primary.query(*self.columns).filter(
+                self.model.id.in_(missing)).all()
+        self._store(generation, rows)
+        found.update((row.id, row) for row in rows)
+        return found
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+
+_users = _RefTable(models.User, models.User.name, models.User.house_area)
+_rooms = _RefTable(models.Room, models.Room.name)
+_devices = _RefTable(
+    models.Device, models.Device.name, models.Device.type,
+    models.Device.room_id,
+)
+_TABLES = {t.table: t for t in (_users, _rooms, _devices)}
+
+
+def users(db: Session, ids=None) -> dict:
+    """{user_id: (id, name, house_area)}"""
+    return _users.get(db, ids)
+
+
+def rooms(db: Session, ids=None) -> dict:
+    """{room_id: (id, name)}"""
+    return _rooms.get(db, ids)
+
+
+def devices(db: Session, ids=None) -> dict:
+    """{device_id: (id, name, type, room_id)}"""
+    return _devices.get(db, ids)
+
+
+def device_types(db: Session, device_ids) -> dict:
+    """{device_id: type}, 不存在的设备不会出现在结果中。"""
+    return {i: d.type for i, d in _devices.get(db, device_ids).items()}
+
+
+def user_names(db: Session, user_ids) -> dict:
+    """{user_id: name}, 不存在的用户不会出现在结果中。"""
+    return {i: u.name for i, u in _users.get(db, user_ids).items()}
+
+
+def invalidate(table: str = None):
+    """使指定表 (users / rooms / devices) 的缓存失效, 不指定时全部失效。"""
+    for name, ref in _TABLES.items():
+        if table in (None, name):
+            ref.invalidate()
+
+
+for _ref in _TABLES.values():
+    invalidation.register(_ref.table, _ref.invalidate)
@@ -0,0 +1,193 @@
+"""
+原始设备使用记录的保留、降采样与归档。
+
+超过保留期 (默认 90 天) 的 device_usages 记录按批次处理, 每一批在一个短事务内:
+  1. 选出一批过期记录并删除 (FOR UPDATE SKIP LOCKED, 不阻塞并发写入)
+  2. 将这批记录按 天/设备/用户 累加到 device_usage_daily
+  3. 把删除的原始记录追加写入本地归档文件 (csv.gz 或 parquet), 然后提交
+归档写入在提交之前完成, 因此已删除的数据一定已经归档;
+若写入后提交失败, 下一次运行会再次归档这批记录 (归档中可能出现重复行)。
+
+命令行: python -m manage retention
+后台任务: 设置环境变量 RETENTION_INTERVAL_HOURS > 0 后随服务启动。
+"""
+import asyncio
+import csv
+import datetime
+import gzip
+import os
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "90"))
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "archive")
+RETENTION_FORMAT = os.getenv("RETENTION_FORMAT", "csv")
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "5000"))
+# 后台任务的运行间隔, 0 表示不启用
+RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "0"))
+
+# 多个 worker 同时运行时只允许一个执行保留任务
+_ADVISORY_LOCK_KEY = 729001
+
+_MOVE_BATCH_SQL = """
+WITH batch AS (
+    SELECT id FROM device_usages
+    WHERE start_time < :cutoff
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+), moved AS (
+    DELETE FROM device_usages u
+    USING batch b
+    WHERE u.id = b.id AND u.start_time < :cutoff
+    RETURNING u.*
+), rollup AS (
+    INSERT INTO device_usage_daily (
+        day, device_id, user_id, usage_count, total_minutes, energy_consumed
+    )
+    SELECT
+        CAST(start_time AS date),
+        COALESCE(device_id, 0),
+        COALESCE(user_id, 0),
+        count(*),
+        COALESCE(SUM(EXTRACT(EPOCH FROM (end_time - start_time)) / 60), 0),
+        COALESCE(SUM(energy_consumed), 0)
+    FROM moved
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, device_id, user_id) DO UPDATE SET
+        usage_count = device_usage_daily.usage_count + EXCLUDED.usage_count,
+        total_minutes =
+            device_usage_daily.total_minutes + EXCLUDED.total_minutes,
+        energy_consumed =
+            device_usage_daily.energy_consumed + EXCLUDED.energy_consumed
+)
+SELECT * FROM moved ORDER BY id
+"""
+
+
+def retention_cutoff(horizon_days: int) -> datetime.datetime:
+    """保留期的起点, 取 UTC 当天零点, 保证同一天内多次运行的边界一致。"""
+    today = datetime.datetime.utcnow().replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return today - datetime.timedelta(days=horizon_days)
+
+
+class _CsvArchive:
+    """单个 csv.gz 文件, 每批追加一个 gzip 成员 (合法的 gzip 文件)。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._has_header = os.path.exists(path)
+
+    def write(self, columns, rows):
+        with gzip.open(self.path, "at", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            if not self._has_header:
+                writer.writerow(columns)
+                self._has_header = True
+            writer.writerows(rows)
+
+
+class _ParquetArchive:
+    """每批写一个 parquet 文件, 需要安装 pandas 与 pyarrow。"""
+
+    def __init__(self, directory: str):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError(
+                "归档为 parquet 需要安装 pyarrow (pip install pyarrow)"
+            ) from e
+        os.makedirs(directory, exist_ok=True)
+        self.path = directory
+        self._part = len(os.listdir(directory))
+
+    def write(self, columns, rows):
+        import pandas as pd
+        self._part += 1
+        df = pd.DataFrame([tuple(row) for row in rows], columns=list(columns))
+        df.to_parquet(
+            os.path.join(self.path, f"part-{self._part:05d}.parquet"),
+            compression="zstd", index=False
+        )
+
+
+def _open_archive(archive_dir: str, fmt: str, cutoff: datetime.datetime):
+    os.makedirs(archive_dir, exist_ok=True)
+    name = f"device_usages_before_{cutoff:%Y%m%d}"
+    if fmt == "csv":
+        return _CsvArchive(os.path.join(archive_dir, name + ".csv.gz"))
+    if fmt == "parquet":
+        return _ParquetArchive(os.path.join(archive_dir, name))
+    raise ValueError(f"不支持的归档格式: {fmt} (可选: csv, parquet)")
+
+
+def count_expired(engine, horizon_days: int = RETENTION_DAYS) -> int:
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT count(*) FROM device_usages "
+                 "WHERE start_time < :cutoff"),
+            {"cutoff": retention_cutoff(horizon_days)}
+        ).scalar()
+
+
+def run_retention(
+    engine,
+    horizon_days: int = RETENTION_DAYS,
+    archive_dir: str = RETENTION_ARCHIVE_DIR,
+    fmt: str = RETENTION_FORMAT,
+    batch_size: int = RETENTION_BATCH_SIZE,
+    max_batches: int = None,
+):
+    """
+    执行一次保留任务, 返回 {"cutoff", "moved", "batches", "archive"}。
+    若其它进程正在执行 (未拿到 advisory lock), 直接返回 moved=0。
+    """
+    cutoff = retention_cutoff(horizon_days)
+    stats = {"cutoff": cutoff, "moved": 0, "batches": 0, "archive": None}
+    with engine.connect() as lock_conn:
+        locked = lock_conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"),
+            {"key": _ADVISORY_LOCK_KEY}
+        ).scalar()
+        lock_conn.commit()
+        if not locked:
+            return stats
+        try:
+            archive = _open_archive(archive_dir, fmt, cutoff)
+            stats["archive"] = archive.path
+            while max_batches is None or stats["batches"] < max_batches:
+                with engine.begin() as conn:
+                    # 每批都是短事务, 拿不到锁时尽快失败而不是排队等待
+                    conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+                    result = conn.execute(text(_MOVE_BATCH_SQL), {
+                        "cutoff": cutoff, "batch_size": batch_size
+                    })
+                    columns = list(result.keys())
+                    rows = result.all()
+                    if not rows:
+                        break
+                    archive.write(columns, rows)
+                stats["moved"] += len(rows)
+                stats["batches"] += 1
+        finally:
+            lock_conn.execute(
+                text("SELECT pg_advisory_unlock(:key)"),
+                {"key": _ADVISORY_LOCK_KEY}
+            )
+            lock_conn.commit()
+    return stats
+
+
+async def run_periodically(engine, interval_hours: float):
+    """后台循环执行保留任务, 异常只记录日志, 不影响服务。"""
+    while True:
+        try:
+            stats = await run_in_threadpool(run_retention, engine)
+            if stats["moved"]:
+                print(f"[INFO] Retention moved {stats['moved']} usages "
+                      f"before {stats['cutoff']} to {stats['archive']}.")
+        except Exception as e:
+            print(f"[ERROR] Retention job failed: {e}")
+        await asyncio.sleep(interval_hours * 3600)
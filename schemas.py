@@ -1,7 +1,15 @@
 from __future__ import annotations
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timezone
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # 数据库中的时间列均为不带时区的UTC时间
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 
 # ==============================================================================
 # Base and Create Schemas (without relationships)
@@ -53,6 +61,17 @@ class DeviceUsageCreate(DeviceUsageBase):
     pass
 
 
+class DeviceUsageClose(BaseModel):
+    # 不指定 end_time 时由服务端取当前UTC时间
+    end_time: Optional[datetime] = None
+    energy_consumed: Optional[float] = None
+
+    @field_validator("end_time")
+    @classmethod
+    def normalize_end_time(cls, value):
+        return to_naive_utc(value)
+
+
 # SecurityEvent
 class SecurityEventBase(BaseModel):
     user_id: int
@@ -78,6 +97,80 @@ class FeedbackCreate(FeedbackBase):
     pass
 
 
+# Bulk update / delete
+class BulkFilterBase(BaseModel):
+    # 条件之间为 AND; 列表条件为 IN, 时间范围为 [start, end)
+    ids: Optional[List[int]] = None
+    user_ids: Optional[List[int]] = None
+    device_ids: Optional[List[int]] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+    @field_validator("start", "end")
+    @classmethod
+    def normalize_range(cls, value):
+        return to_naive_utc(value)
+
+
+class SecurityEventFilter(BulkFilterBase):
+    event_type: Optional[str] = None
+    event_level: Optional[str] = None
+    status: Optional[str] = None
+
+
+class SecurityEventBulkValues(BaseModel):
+    event_level: Optional[str] = None
+    location: Optional[str] = None
+    status: Optional[str] = None
+
+
+class SecurityEventBulkUpdate(BaseModel):
+    where: SecurityEventFilter
+    values: SecurityEventBulkValues
+
+
+class FeedbackFilter(BulkFilterBase):
+    feedback_type: Optional[str] = None
+    status: Optional[str] = None
+
+
+class FeedbackBulkValues(BaseModel):
+    feedback_type: Optional[str] = None
+    status: Optional[str] = None
+
+
+class FeedbackBulkUpdate(BaseModel):
+    where: FeedbackFilter
+    values: FeedbackBulkValues
+
+
+class DeviceUsageFilter(BulkFilterBase):
+    usage_type: Optional[str] = None
+    device_type: Optional[str] = None
+
+
+class DeviceUsageBulkValues(BaseModel):
+    end_time: Optional[datetime] = None
+    usage_type: Optional[str] = None
+    energy_consumed: Optional[float] = None
+
+    @field_validator("end_time")
+    @classmethod
+    def normalize_end_time(cls, value):
+        return to_naive_utc(value)
+
+
+class DeviceUsageBulkUpdate(BaseModel):
+    where: DeviceUsageFilter
+    values: DeviceUsageBulkValues
+
+
+class BulkResult(BaseModel):
+    ok: bool
+    affected: int
+    batches: int
+
+
 # ==============================================================================
 # Full Output Schemas (with relationships and forward references)
 # ==============================================================================
@@ -123,6 +216,16 @@ class DeviceUsage(DeviceUsageBase):
         from_attributes = True
 
 
+class OpenDeviceUsage(BaseModel):
+    id: int
+    user_id: int
+    device_id: int
+    start_time: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class SecurityEvent(SecurityEventBase):
     id: int
     device: Device
@@ -157,6 +260,7 @@ Device.model_rebuild()
 RoomOut.model_rebuild()
 DeviceOut.model_rebuild()
 DeviceUsage.model_rebuild()
+OpenDeviceUsage.model_rebuild()
 SecurityEvent.model_rebuild()
 Feedback.model_rebuild()
 UserOut.model_rebuild()
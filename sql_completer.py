@@ -0,0 +1,71 @@
+"""SQL 模式的自动补全 (表名、列名与关键字), 只在进入 SQL 模式时导入。"""
+from prompt_toolkit.completion import Completer, Completion
+from prompt_toolkit.document import Document
+
+
+class SQLCompleter(Completer):
+    def __init__(self, schema: dict):
+        self.all_keywords = [
+            'SELECT', 'FROM', 'WHERE', 'INSERT', 'INTO', 'VALUES', 'UPDATE',
+            'SET', 'DELETE', 'LIMIT', 'ORDER', 'BY', 'GROUP', 'ASC', 'DESC',
+            'JOIN', 'ON', 'AS', 'AND', 'OR', 'NOT', 'IN', 'LIKE', 'IS', 'NULL'
+        ]
+        self.update(schema)
+
+    def update(self, schema: dict):
+        """替换 schema (可在后台线程中调用, 各属性整体替换)。"""
+        self.tables = list(schema.keys())
+        self.columns = [col for cols in schema.values() for col in cols]
+        self.schema = schema
+
+    def get_completions(self, document: Document, complete_event):
+        text = document.text_before_cursor.upper()
+        word_before_cursor = document.get_word_before_cursor(WORD=True).upper()
+
+        suggestions = self._get_contextual_suggestions(text)
+
+        for keyword in suggestions:
+            if keyword.upper().startswith(word_before_cursor):
+                yield Completion(
+                    keyword,
+                    start_position=-len(word_before_cursor),
+                    display_meta=self.get_meta(keyword)
+                )
+
+    def _get_contextual_suggestions(self, text: str) -> list:
+        words = text.split()
+        if not words:
+            return self.all_keywords
+
+        # Very simple context detection
+        try:
+            # Pop the last word and analyze context from the one before it
+            if len(words) > 1:
+                context_word = words[-2]
+            else:
+                context_word = ''
+
+            if context_word in ['FROM', 'JOIN', 'UPDATE', 'INTO']:
+                # After FROM/JOIN etc., suggest table names
+                return self.tables
+            elif context_word in ['WHERE', 'ON', 'AND', 'OR', 'BY', 'SET',
+                                  'SELECT']:
+                # After WHERE, ON etc., suggest column names and keywords
+                suggestions = self.columns + self.all_keywords
+                return suggestions
+            elif context_word in self.tables:
+                # After a table name, suggest column names
+                return self.schema.get(context_word, [])
+            else:
+                return self.all_keywords
+        except IndexError:
+            return self.all_keywords
+
+    def get_meta(self, word: str) -> str:
+        if word.upper() in self.all_keywords:
+            return 'Keyword'
+        if word in self.tables:
+            return 'Table'
+        if word in self.columns:
+            return 'Column'
+        return ''